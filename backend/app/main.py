@@ -7,6 +7,7 @@ from datetime import timedelta
 from typing import List, Optional
 import hashlib
 import json
+import logging
 from datetime import datetime
 
 from .config import settings
@@ -15,6 +16,8 @@ from .database import get_db
 # Simple schemas for MVP
 from pydantic import BaseModel, EmailStr
 
+logger = logging.getLogger(__name__)
+
 class UserLogin(BaseModel):
     email: str
     password: str
@@ -39,11 +42,15 @@ class KnowledgePointResponse(BaseModel):
 
 class OCROMRResult(BaseModel):
     sheet_id: int
+    task_id: Optional[str] = None  # Worker 任务 ID，同一任务的重复回调只处理一次
     answers: List[dict]  # [{"question_id": 1, "answer": "A", "confidence": 0.95}]
     total_score: Optional[float] = 0
     processing_time: Optional[int] = None  # milliseconds
     error_message: Optional[str] = None
 
+class OCROMRResultBatch(BaseModel):
+    results: List[OCROMRResult]  # 同一 Worker 合并发送的多张答题卡结果
+
 class UploadResponse(BaseModel):
     session_id: str
     status: str
@@ -125,6 +132,18 @@ app.add_middleware(
 
 security = HTTPBearer(auto_error=False)
 
+@app.on_event("startup")
+def warm_up_dedup_index():
+    """后台加载题目去重索引，首个请求不必等待全量构建"""
+    from app.services.dedup_index import warm_dedup_index
+    warm_dedup_index()
+
+@app.on_event("shutdown")
+def shutdown_ingest_pool():
+    """关闭批量拆题共享进程池"""
+    from app.services.ingest_batch import shutdown_pool
+    shutdown_pool()
+
 # Password verification with bcrypt support
 def verify_password(plain_password: str, stored_password: str) -> bool:
     # Support both bcrypt hashed passwords and plain text for MVP
@@ -652,6 +671,18 @@ def export_paper(
         # 5. 生成二维码schema
         qr_schema = pdf_generator.generate_answer_sheet_qr(paper_id, "answer")
         
+        # 保存到试卷，OCR Worker 按其中的 region 定位二维码
+        try:
+            db.execute(
+                text("UPDATE papers SET qr_schema = :qr_schema WHERE id = :paper_id"),
+                {"paper_id": paper_id, "qr_schema": json.dumps(qr_schema)}
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            # 没有 qr_schema 时 OCR Worker 退回默认位置和整页搜索，导出本身不失败
+            logger.exception(f"保存试卷 {paper_id} 的二维码schema失败: {e}")
+
         # 6. 记录PDF版本
         try:
             db.execute(
@@ -751,168 +782,252 @@ def duplicate_paper(
         "message": "Paper duplicated successfully"
     }
 
-@app.post("/internal/ocr-omr/callback")
-def ocr_omr_callback(result: OCROMRResult, db: Session = Depends(get_db)):
+def _load_paper_answers(db: Session, paper_id: int):
+    """试卷每道题的正确答案和分值"""
+    from sqlalchemy import text
+    
+    paper_questions = db.execute(
+        text("""
+            SELECT pq.question_id, q.answer_json, pq.score
+            FROM paper_questions pq
+            JOIN questions q ON pq.question_id = q.id
+            WHERE pq.paper_id = :paper_id
+            ORDER BY pq.seq
+        """),
+        {"paper_id": paper_id}
+    ).fetchall()
+    
+    question_answers = {}
+    question_scores = {}
+    for qid, answer_json, score in paper_questions:
+        if answer_json:
+            correct_answer = json.loads(answer_json).get('answer', '')
+            question_answers[qid] = correct_answer
+            question_scores[qid] = score
+    return question_answers, question_scores
+
+def _apply_ocr_omr_result(db: Session, result: OCROMRResult, paper_answers: Optional[dict] = None) -> dict:
     """
-    OCR/OMR处理完成回调
-    处理识别结果，计算分数，更新数据库
+    处理一张答题卡的识别结果：判分、写入答案、更新答题卡状态和批改日志（不提交事务）
+    paper_answers 缓存同一批回调中各试卷的正确答案
     """
     from sqlalchemy import text
-    from datetime import datetime
-    import json
     
-    try:
-        # 1. 获取答题卡信息和试卷
-        sheet_result = db.execute(
+    # 1. 获取答题卡信息和试卷
+    sheet_result = db.execute(
+        text("""
+            SELECT as_.id, as_.paper_id, as_.student_id, p.name as paper_name
+            FROM answer_sheets as_
+            JOIN papers p ON as_.paper_id = p.id
+            WHERE as_.id = :sheet_id
+        """),
+        {"sheet_id": result.sheet_id}
+    ).fetchone()
+    
+    if not sheet_result:
+        raise HTTPException(status_code=404, detail="Answer sheet not found")
+    
+    sheet_id, paper_id, student_id, paper_name = sheet_result
+    
+    # 同一任务的回调只处理一次：回执与答案在同一事务中提交，并发的重复回调在主键上等待后冲突
+    if result.task_id:
+        receipt = db.execute(
             text("""
-                SELECT as_.id, as_.paper_id, as_.student_id, p.name as paper_name
-                FROM answer_sheets as_
-                JOIN papers p ON as_.paper_id = p.id
-                WHERE as_.id = :sheet_id
+                INSERT INTO task_callbacks (task_id, sheet_id)
+                VALUES (:task_id, :sheet_id)
+                ON CONFLICT (task_id) DO NOTHING
+                RETURNING task_id
             """),
-            {"sheet_id": result.sheet_id}
+            {"task_id": result.task_id, "sheet_id": sheet_id}
         ).fetchone()
-        
-        if not sheet_result:
-            raise HTTPException(status_code=404, detail="Answer sheet not found")
-        
-        sheet_id, paper_id, student_id, paper_name = sheet_result
-        
-        # 2. 获取试卷的正确答案
-        paper_questions = db.execute(
-            text("""
-                SELECT pq.question_id, q.answer_json, pq.score
-                FROM paper_questions pq
-                JOIN questions q ON pq.question_id = q.id
-                WHERE pq.paper_id = :paper_id
-                ORDER BY pq.seq
-            """),
-            {"paper_id": paper_id}
-        ).fetchall()
-        
-        question_answers = {}
-        question_scores = {}
-        for qid, answer_json, score in paper_questions:
-            if answer_json:
-                import json
-                correct_answer = json.loads(answer_json).get('answer', '')
-                question_answers[qid] = correct_answer
-                question_scores[qid] = score
-        
-        # 3. 处理每个答案
-        total_score = 0
-        processed_answers = []
-        
-        for answer_data in result.answers:
-            question_id = answer_data.get('question_id')
-            student_answer = answer_data.get('answer', '')
-            confidence = answer_data.get('confidence', 0.0)
-            
-            # 判断对错
-            correct_answer = question_answers.get(question_id, '')
-            is_correct = str(student_answer).upper() == str(correct_answer).upper()
-            
-            # 计算得分
-            max_score = question_scores.get(question_id, 0)
-            earned_score = max_score if is_correct else 0
-            total_score += earned_score
-            
-            # 插入答案记录
-            db.execute(
-                text("""
-                    INSERT INTO answers (sheet_id, question_id, raw_omr, parsed_json, 
-                                       is_correct, score, is_objective)
-                    VALUES (:sheet_id, :question_id, :raw_omr, :parsed_json, 
-                           :is_correct, :score, :is_objective)
-                """),
-                {
-                    "sheet_id": sheet_id,
-                    "question_id": question_id,
-                    "raw_omr": str(student_answer),
-                    "parsed_json": json.dumps(answer_data),
-                    "is_correct": is_correct,
-                    "score": earned_score,
-                    "is_objective": True
-                }
-            )
-            
-            processed_answers.append({
-                "question_id": question_id,
-                "student_answer": student_answer,
-                "correct_answer": correct_answer,
-                "is_correct": is_correct,
-                "score": earned_score,
-                "max_score": max_score
-            })
-        
-        # 4. 更新答题卡状态和总分
-        db.execute(
-            text("""
-                UPDATE answer_sheets 
-                SET status = 'graded', total_score = :total_score
-                WHERE id = :sheet_id
-            """),
-            {
-                "sheet_id": sheet_id,
-                "total_score": total_score
+        if not receipt:
+            return {
+                "status": "duplicate",
+                "message": "该任务的结果已处理",
+                "sheet_id": sheet_id
             }
-        )
+    
+    # 2. 获取试卷的正确答案
+    if paper_answers is None:
+        paper_answers = {}
+    if paper_id not in paper_answers:
+        paper_answers[paper_id] = _load_paper_answers(db, paper_id)
+    question_answers, question_scores = paper_answers[paper_id]
+    
+    # 3. 处理每个答案
+    total_score = 0
+    processed_answers = []
+    
+    for answer_data in result.answers:
+        question_id = answer_data.get('question_id')
+        student_answer = answer_data.get('answer', '')
+        confidence = answer_data.get('confidence', 0.0)
         
-        # 5. 记录批改日志
-        log_data = {
-            "sheet_id": sheet_id,
-            "total_questions": len(result.answers),
-            "correct_count": sum(1 for ans in processed_answers if ans['is_correct']),
-            "total_score": total_score,
-            "processing_time_ms": result.processing_time,
-            "ocr_confidence_avg": sum(ans.get('confidence', 0) for ans in result.answers) / len(result.answers) if result.answers else 0
-        }
+        # 判断对错
+        correct_answer = question_answers.get(question_id, '')
+        is_correct = str(student_answer).upper() == str(correct_answer).upper()
         
+        # 计算得分
+        max_score = question_scores.get(question_id, 0)
+        earned_score = max_score if is_correct else 0
+        total_score += earned_score
+        
+        # 插入答案记录
         db.execute(
             text("""
-                INSERT INTO grading_logs (sheet_id, grading_type, result_json, created_at)
-                VALUES (:sheet_id, 'ocr_omr', :result_json, :created_at)
+                INSERT INTO answers (sheet_id, question_id, raw_omr, parsed_json, 
+                                   is_correct, score, is_objective)
+                VALUES (:sheet_id, :question_id, :raw_omr, :parsed_json, 
+                       :is_correct, :score, :is_objective)
             """),
             {
                 "sheet_id": sheet_id,
-                "result_json": json.dumps(log_data),
-                "created_at": datetime.utcnow()
+                "question_id": question_id,
+                "raw_omr": str(student_answer),
+                "parsed_json": json.dumps(answer_data),
+                "is_correct": is_correct,
+                "score": earned_score,
+                "is_objective": True
             }
         )
         
-        db.commit()
-        
-        return {
-            "status": "success",
-            "message": "OCR/OMR结果处理完成",
+        processed_answers.append({
+            "question_id": question_id,
+            "student_answer": student_answer,
+            "correct_answer": correct_answer,
+            "is_correct": is_correct,
+            "score": earned_score,
+            "max_score": max_score
+        })
+    
+    # 4. 更新答题卡状态和总分
+    db.execute(
+        text("""
+            UPDATE answer_sheets 
+            SET status = 'graded', total_score = :total_score
+            WHERE id = :sheet_id
+        """),
+        {
             "sheet_id": sheet_id,
-            "total_score": total_score,
-            "total_questions": len(result.answers),
-            "correct_count": sum(1 for ans in processed_answers if ans['is_correct']),
-            "answers": processed_answers
+            "total_score": total_score
         }
-        
-    except Exception as e:
-        db.rollback()
-        # 记录错误日志
-        try:
+    )
+    
+    # 5. 记录批改日志
+    log_data = {
+        "sheet_id": sheet_id,
+        "total_questions": len(result.answers),
+        "correct_count": sum(1 for ans in processed_answers if ans['is_correct']),
+        "total_score": total_score,
+        "processing_time_ms": result.processing_time,
+        "ocr_confidence_avg": sum(ans.get('confidence', 0) for ans in result.answers) / len(result.answers) if result.answers else 0
+    }
+    
+    # 处理日志写入失败（如 grading_logs 表结构不同）只回滚日志本身，不影响已写入的答案和分数
+    try:
+        with db.begin_nested():
             db.execute(
                 text("""
                     INSERT INTO grading_logs (sheet_id, grading_type, result_json, created_at)
-                    VALUES (:sheet_id, 'ocr_omr_error', :result_json, :created_at)
+                    VALUES (:sheet_id, 'ocr_omr', :result_json, :created_at)
                 """),
                 {
-                    "sheet_id": result.sheet_id,
-                    "result_json": json.dumps({"error": str(e), "result": result.dict()}),
+                    "sheet_id": sheet_id,
+                    "result_json": json.dumps(log_data),
                     "created_at": datetime.utcnow()
                 }
             )
+    except Exception as log_error:
+        logger.warning(f"记录答题卡 {sheet_id} 的处理日志失败: {log_error}")
+    
+    return {
+        "status": "success",
+        "message": "OCR/OMR结果处理完成",
+        "sheet_id": sheet_id,
+        "total_score": total_score,
+        "total_questions": len(result.answers),
+        "correct_count": sum(1 for ans in processed_answers if ans['is_correct']),
+        "answers": processed_answers
+    }
+
+def _log_ocr_omr_error(db: Session, result: OCROMRResult, error: Exception):
+    """记录处理失败的识别结果（不提交事务）"""
+    from sqlalchemy import text
+    
+    db.execute(
+        text("""
+            INSERT INTO grading_logs (sheet_id, grading_type, result_json, created_at)
+            VALUES (:sheet_id, 'ocr_omr_error', :result_json, :created_at)
+        """),
+        {
+            "sheet_id": result.sheet_id,
+            "result_json": json.dumps({"error": str(error), "result": result.dict()}),
+            "created_at": datetime.utcnow()
+        }
+    )
+
+@app.post("/internal/ocr-omr/callback")
+def ocr_omr_callback(result: OCROMRResult, db: Session = Depends(get_db)):
+    """
+    OCR/OMR处理完成回调
+    处理识别结果，计算分数，更新数据库
+    """
+    try:
+        response = _apply_ocr_omr_result(db, result)
+        if response["status"] == "duplicate":
+            db.rollback()
+        else:
+            db.commit()
+        return response
+        
+    except Exception as e:
+        db.rollback()
+        # 记录错误日志
+        try:
+            _log_ocr_omr_error(db, result, e)
             db.commit()
         except:
             pass
         
         raise HTTPException(status_code=500, detail=f"OCR/OMR处理失败: {str(e)}")
 
+@app.post("/internal/ocr-omr/callback/batch")
+def ocr_omr_callback_batch(batch: OCROMRResultBatch, db: Session = Depends(get_db)):
+    """
+    批量OCR/OMR处理完成回调
+    整批答题卡在同一事务中处理；每张答题卡使用保存点，单张失败只回滚该答题卡并记录错误日志，
+    错误日志写入同样使用保存点，写入失败不会中止整个事务；results 与请求中的顺序一一对应
+    """
+    paper_answers = {}
+    results = []
+    
+    for result in batch.results:
+        try:
+            with db.begin_nested():
+                results.append(_apply_ocr_omr_result(db, result, paper_answers))
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            try:
+                with db.begin_nested():
+                    _log_ocr_omr_error(db, result, e)
+            except Exception as log_error:
+                logger.warning(f"记录答题卡 {result.sheet_id} 的错误日志失败: {log_error}")
+            results.append({"status": "failed", "message": f"OCR/OMR处理失败: {detail}", "sheet_id": result.sheet_id})
+    
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"OCR/OMR批量处理失败: {str(e)}")
+    
+    return {
+        "status": "success",
+        "processed": sum(1 for item in results if item["status"] == "success"),
+        "duplicates": sum(1 for item in results if item["status"] == "duplicate"),
+        "failed": sum(1 for item in results if item["status"] == "failed"),
+        "results": results
+    }
+
 # 3.4 回调接口（供OCR/OMR服务调用）
 @app.post("/api/callbacks/upload-progress")
 def upload_progress_callback(callback: CallbackRequest):
@@ -1238,36 +1353,10 @@ async def create_ingest_session(
                 )
             
             # 保存拆题项目
-            import json
-            for item in process_result['items']:
-                db.execute(
-                    text("""
-                        INSERT INTO ingest_items (session_id, seq, ocr_json, question_text, candidate_type, 
-                                                 candidate_kps_json, confidence, review_status)
-                        VALUES (:session_id, :seq, :ocr_json, :question_text, :candidate_type, 
-                               :candidate_kps_json, :confidence, 'pending')
-                    """),
-                    {
-                        "session_id": db_session_id,
-                        "seq": item["seq"],
-                        "ocr_json": json.dumps(item["ocr_result"]),
-                        "question_text": item["question_text"],  # 新增：直接存储格式化文本
-                        "candidate_type": item["question_type"],
-                        "candidate_kps_json": json.dumps(item["candidate_kps"]),
-                        "confidence": item["confidence"]
-                    }
-                )
-            
-            # 更新会话状态
-            total_items = len(process_result['items'])
-            db.execute(
-                text("""
-                    UPDATE ingest_sessions 
-                    SET status = 'awaiting_review', total_items = :total, processed_items = :processed 
-                    WHERE id = :id
-                """),
-                {"id": db_session_id, "total": total_items, "processed": total_items}
-            )
+            from app.services.ingest_batch import save_ingest_items
+            from app.services.ingest_text import save_session_text
+            total_items = save_ingest_items(db, db_session_id, process_result['items'])
+            save_session_text(db, db_session_id, process_result)
             
             db.commit()
             
@@ -1383,7 +1472,8 @@ def get_ingest_items(
     result = db.execute(
         text("""
             SELECT id, session_id, seq, crop_uri, ocr_json, question_text,
-                   candidate_type, candidate_kps_json, confidence, review_status, approved_question_id
+                   candidate_type, candidate_kps_json, confidence, review_status, approved_question_id,
+                   duplicate_question_id, duplicate_similarity
             FROM ingest_items
             WHERE session_id = :session_id
             ORDER BY seq
@@ -1391,8 +1481,12 @@ def get_ingest_items(
         {"session_id": items_session_id}
     )
     
+    rows = result.fetchall()
+    from app.services.ingest_batch import expand_candidate_kps
+    candidate_kps = expand_candidate_kps(db, [row[7] for row in rows])
+    
     items = []
-    for row in result:
+    for row, kps in zip(rows, candidate_kps):
         # 优先使用新的question_text字段（已格式化）
         question_text = row[5] if row[5] else ""  # question_text字段
         
@@ -1432,43 +1526,96 @@ def get_ingest_items(
             "question_text": question_text,  # 直接使用格式化文本
             "candidate_type": row[6],
             "candidate_kps_json": row[7],
+            "candidate_kps": kps,
             "confidence": float(row[8]) if row[8] else None,
             "review_status": row[9],
-            "approved_question_id": row[10]
+            "approved_question_id": row[10],
+            "duplicate_question_id": row[11],
+            "duplicate_similarity": float(row[12]) if row[12] is not None else None
         })
     
     return items
 
-@app.post("/api/ingest/items/{item_id}/approve")
-def approve_ingest_item(
-    item_id: int,
-    approval_data: dict = {},
+@app.get("/api/ingest/items/search")
+def search_ingest_items(
+    q: str,
+    session_id: Optional[int] = None,
+    review_status: Optional[str] = None,
+    limit: int = 50,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """审核通过拆题项目"""
+    """按题干子串搜索拆题项目（PostgreSQL 使用 pg_trgm 索引，SQLite 使用 FTS5 trigram 索引）"""
     from sqlalchemy import text
-    from datetime import datetime
     
-    # 验证拆题项目权限
-    result = db.execute(
-        text("""
-            SELECT ii.id, ii.ocr_json, ii.candidate_type, ii.candidate_kps_json
+    keyword = q.strip()
+    if not keyword:
+        raise HTTPException(status_code=400, detail="搜索关键词不能为空")
+    
+    params = {
+        "user_id": current_user["id"],
+        "session_id": session_id,
+        "review_status": review_status,
+        "limit": min(max(limit, 1), 200)
+    }
+    filters = """
+        ins.created_by = :user_id
+        AND (:session_id IS NULL OR ii.session_id = :session_id)
+        AND (:review_status IS NULL OR ii.review_status = :review_status)
+    """
+    
+    # trigram 分词器要求关键词至少3个字符，更短的关键词退化为 LIKE 扫描
+    if db.bind.dialect.name == "sqlite" and len(keyword) >= 3:
+        query = f"""
+            SELECT ii.id, ii.session_id, ii.seq, ii.question_text, ii.candidate_type,
+                   ii.confidence, ii.review_status
+            FROM ingest_items_fts f
+            JOIN ingest_items ii ON ii.id = f.rowid
+            JOIN ingest_sessions ins ON ii.session_id = ins.id
+            WHERE ingest_items_fts MATCH :match AND {filters}
+            ORDER BY f.rank
+            LIMIT :limit
+        """
+        params["match"] = '"' + keyword.replace('"', '""') + '"'
+    else:
+        like_op = "ILIKE" if db.bind.dialect.name == "postgresql" else "LIKE"
+        query = f"""
+            SELECT ii.id, ii.session_id, ii.seq, ii.question_text, ii.candidate_type,
+                   ii.confidence, ii.review_status
             FROM ingest_items ii
             JOIN ingest_sessions ins ON ii.session_id = ins.id
-            WHERE ii.id = :item_id AND ins.created_by = :user_id
-        """),
-        {"item_id": item_id, "user_id": current_user["id"]}
-    )
+            WHERE ii.question_text {like_op} :pattern ESCAPE '\\' AND {filters}
+            ORDER BY ii.id DESC
+            LIMIT :limit
+        """
+        escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params["pattern"] = f"%{escaped}%"
     
-    item = result.fetchone()
-    if not item:
-        raise HTTPException(status_code=404, detail="Ingest item not found")
+    result = db.execute(text(query), params)
     
-    # 从OCR结果创建题目
-    import json
-    ocr_data = json.loads(item[1]) if item[1] else {}
-    question_text = approval_data.get("stem", ocr_data.get("text", "示例题目"))
+    items = []
+    for row in result:
+        items.append({
+            "id": row[0],
+            "session_id": row[1],
+            "seq": row[2],
+            "question_text": row[3],
+            "candidate_type": row[4],
+            "confidence": float(row[5]) if row[5] else None,
+            "review_status": row[6]
+        })
+    
+    return items
+
+def _approve_item(db: Session, item_id: int, item_text: Optional[str], candidate_type: Optional[str],
+                  approval_data: dict, user_id: int, candidate_kps_json=None):
+    """根据拆题项目创建题目并标记为已通过，返回 (question_id, stem)（调用方负责提交事务）"""
+    from sqlalchemy import text
+    from datetime import datetime
+    from app.services.ingest_batch import approve_candidate_kps
+    
+    # 从拆题文本创建题目
+    question_text = approval_data.get("stem", item_text or "示例题目")
     
     # 创建题目
     question_result = db.execute(
@@ -1479,9 +1626,9 @@ def approve_ingest_item(
         """),
         {
             "stem": question_text,
-            "type": approval_data.get("type", item[2] or "single_choice"),
+            "type": approval_data.get("type", candidate_type or "single_choice"),
             "difficulty": approval_data.get("difficulty", 2),
-            "created_by": current_user["id"],
+            "created_by": user_id,
             "created_at": datetime.utcnow()
         }
     )
@@ -1491,6 +1638,16 @@ def approve_ingest_item(
         raise HTTPException(status_code=500, detail="Failed to create question")
     question_id = question_row[0]
     
+    # 关联知识点：审核时指定的优先，否则使用候选知识点（未匹配的建议此时才创建）
+    kp_ids = approval_data.get("knowledge_point_ids")
+    if kp_ids is None:
+        kp_ids = approve_candidate_kps(db, candidate_kps_json)
+    for kp_id in kp_ids:
+        db.execute(
+            text("INSERT INTO question_knowledge_map (question_id, kp_id) VALUES (:qid, :kpid)"),
+            {"qid": question_id, "kpid": kp_id}
+        )
+    
     # 更新拆题项目状态
     db.execute(
         text("""
@@ -1501,8 +1658,46 @@ def approve_ingest_item(
         {"item_id": item_id, "question_id": question_id}
     )
     
+    return question_id, question_text
+
+@app.post("/api/ingest/items/{item_id}/approve")
+def approve_ingest_item(
+    item_id: int,
+    approval_data: dict = {},
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """审核通过拆题项目"""
+    from sqlalchemy import text
+    from app.services.dedup_index import get_dedup_index
+    
+    # 验证拆题项目权限
+    result = db.execute(
+        text("""
+            SELECT ii.id, ii.question_text, ii.candidate_type, ii.candidate_kps_json
+            FROM ingest_items ii
+            JOIN ingest_sessions ins ON ii.session_id = ins.id
+            WHERE ii.id = :item_id AND ins.created_by = :user_id
+        """),
+        {"item_id": item_id, "user_id": current_user["id"]}
+    )
+    
+    item = result.fetchone()
+    if not item:
+        raise HTTPException(status_code=404, detail="Ingest item not found")
+    
+    question_id, stem = _approve_item(db, item_id, item[1], item[2], approval_data, current_user["id"], item[3])
+    
     db.commit()
     
+    # 新题目加入去重索引（增量更新）；审核已提交，索引写入失败只记录日志，重启加载时会从题库补齐
+    try:
+        dedup_index = get_dedup_index()
+        if dedup_index is not None:
+            dedup_index.add(question_id, stem)
+    except Exception as e:
+        logger.warning(f"题目 {question_id} 加入去重索引失败: {e}")
+    
     return {
         "message": "拆题项目审核通过",
         "item_id": item_id,
@@ -1547,6 +1742,142 @@ def reject_ingest_item(
         "reason": rejection_data.get("reason", "未提供原因")
     }
 
+@app.post("/api/ingest/sessions/{session_id}/approve")
+def batch_approve_ingest_items(
+    session_id: int,
+    approval_data: dict = {},
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    批量审核通过会话中的待审核项目
+    duplicate_policy: skip（驳回重复题）、merge（关联到已有题目，不新建）、keep（照常入库）
+    """
+    from sqlalchemy import text
+    from app.services.dedup_index import get_dedup_index, MinHashLSH
+    
+    duplicate_policy = approval_data.get("duplicate_policy", "skip")
+    if duplicate_policy not in ("skip", "merge", "keep"):
+        raise HTTPException(status_code=400, detail="duplicate_policy 只能是 skip、merge 或 keep")
+    threshold = float(approval_data.get("threshold", settings.dedup_similarity_threshold))
+    
+    result = db.execute(
+        text("SELECT id FROM ingest_sessions WHERE id = :session_id AND created_by = :user_id"),
+        {"session_id": session_id, "user_id": current_user["id"]}
+    )
+    if not result.fetchone():
+        raise HTTPException(status_code=404, detail="Ingest session not found")
+    
+    items = db.execute(
+        text("""
+            SELECT id, candidate_type, question_text, candidate_kps_json
+            FROM ingest_items
+            WHERE session_id = :session_id AND review_status = 'pending'
+            ORDER BY seq
+        """),
+        {"session_id": session_id}
+    ).fetchall()
+    
+    dedup_index = get_dedup_index()
+    if dedup_index is None and duplicate_policy != "keep":
+        raise HTTPException(status_code=503, detail="去重索引正在加载，请稍后重试")
+    # 本批次新建的题目在提交前不写入全局索引，用临时索引检测批次内部的重复
+    batch_index = MinHashLSH()
+    approved, skipped, merged = [], [], []
+    new_questions = []
+    
+    for item_id, candidate_type, question_text, candidate_kps_json in items:
+        duplicate = None
+        if duplicate_policy != "keep":
+            # 审核时重新查询：拆题之后新入库的题目也参与比对
+            matches = [
+                match for match in (
+                    dedup_index.query(question_text or "", min_similarity=threshold),
+                    batch_index.query(question_text or "", min_similarity=threshold)
+                ) if match
+            ]
+            duplicate = max(matches, key=lambda match: match[1]) if matches else None
+        
+        if duplicate and duplicate_policy == "skip":
+            db.execute(
+                text("UPDATE ingest_items SET review_status = 'rejected' WHERE id = :item_id"),
+                {"item_id": item_id}
+            )
+            skipped.append({"item_id": item_id, "duplicate_question_id": duplicate[0], "similarity": duplicate[1]})
+        elif duplicate and duplicate_policy == "merge":
+            db.execute(
+                text("""
+                    UPDATE ingest_items
+                    SET review_status = 'approved', approved_question_id = :question_id
+                    WHERE id = :item_id
+                """),
+                {"item_id": item_id, "question_id": duplicate[0]}
+            )
+            merged.append({"item_id": item_id, "question_id": duplicate[0], "similarity": duplicate[1]})
+        else:
+            question_id, stem = _approve_item(
+                db, item_id, question_text, candidate_type, {}, current_user["id"], candidate_kps_json
+            )
+            new_questions.append((question_id, stem))
+            batch_index.add(question_id, stem)
+            approved.append({"item_id": item_id, "question_id": question_id})
+    
+    db.commit()
+    
+    if dedup_index is not None:
+        try:
+            for question_id, stem in new_questions:
+                dedup_index.add(question_id, stem)
+        except Exception as e:
+            logger.warning(f"会话 {session_id} 的新题目加入去重索引失败: {e}")
+    
+    return {
+        "message": f"批量审核完成：通过 {len(approved)} 道，跳过重复 {len(skipped)} 道，合并重复 {len(merged)} 道",
+        "session_id": session_id,
+        "approved": approved,
+        "skipped": skipped,
+        "merged": merged
+    }
+
+@app.post("/api/ingest/sessions/{session_id}/resplit")
+def resplit_ingest_session(
+    session_id: int,
+    resplit_data: dict = {},
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    使用其他拆分策略或参数重新拆题（基于已保存的全文，不重新解析原文件）
+    strategy: auto、pattern（需指定 pattern）、question_mark、choice、page
+    """
+    from sqlalchemy import text
+    from app.services.ingest_text import resplit_session
+
+    result = db.execute(
+        text("SELECT status FROM ingest_sessions WHERE id = :session_id AND created_by = :user_id"),
+        {"session_id": session_id, "user_id": current_user["id"]}
+    ).fetchone()
+    if not result:
+        raise HTTPException(status_code=404, detail="Ingest session not found")
+    if result[0] in ('uploaded', 'parsing', 'completed'):
+        raise HTTPException(status_code=400, detail=f"会话状态为 {result[0]}，不能重新拆分")
+
+    min_length = resplit_data.get("min_length")
+    try:
+        summary = resplit_session(
+            db, session_id,
+            strategy=resplit_data.get("strategy", "auto"),
+            pattern=resplit_data.get("pattern"),
+            min_length=int(min_length) if min_length is not None else None
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    summary["message"] = f"重新拆分完成：新增 {summary['new_items']} 道待审核题目，替换 {summary['replaced_items']} 道"
+    return summary
+
 @app.post("/api/ingest/sessions/{session_id}/complete")
 def complete_ingest_session(
     session_id: int,
@@ -1577,3 +1908,153 @@ def complete_ingest_session(
         "message": "拆题会话已完成",
         "session_id": session_id
     }
+
+# 4.1 批量拆题入库
+@app.post("/api/ingest/batches")
+async def create_ingest_batch(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    name: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """批量创建拆题会话（上传zip或多个文件），每个文档一个会话，后台并行处理"""
+    from sqlalchemy import text
+    from datetime import datetime
+    import uuid
+    from app.services.ingest_batch import expand_uploads, run_batch
+    
+    uploads = []
+    for upload in files:
+        uploads.append((upload.filename or "unknown", upload.content_type, await upload.read()))
+    
+    documents, skipped = expand_uploads(uploads)
+    if not documents:
+        raise HTTPException(status_code=400, detail="没有可处理的文档，只支持PDF、图片、DOCX及其zip压缩包")
+    if len(documents) > settings.ingest_batch_max_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单个批次最多 {settings.ingest_batch_max_files} 个文档，当前 {len(documents)} 个"
+        )
+    
+    max_workers = min(concurrency or settings.ingest_batch_concurrency, settings.ingest_batch_concurrency)
+    batch_name = name or f"批量拆题 - {uploads[0][0]}"
+    
+    batch_row = db.execute(
+        text("""
+            INSERT INTO ingest_batches (name, created_by, status, total_files, concurrency, created_at)
+            VALUES (:name, :created_by, 'uploaded', :total_files, :concurrency, :created_at)
+            RETURNING id, created_at
+        """),
+        {
+            "name": batch_name,
+            "created_by": current_user["id"],
+            "total_files": len(documents),
+            "concurrency": max_workers,
+            "created_at": datetime.now()
+        }
+    ).fetchone()
+    batch_id = batch_row[0]
+    
+    jobs = []
+    for document in documents:
+        session_id_str = str(uuid.uuid4())
+        file_extension = document["filename"].rsplit('.', 1)[-1] if '.' in document["filename"] else 'pdf'
+        session_row = db.execute(
+            text("""
+                INSERT INTO ingest_sessions (file_uri, status, created_by, session_id, name, batch_id, created_at)
+                VALUES (:file_uri, 'uploaded', :created_by, :session_id, :name, :batch_id, :created_at)
+                RETURNING id
+            """),
+            {
+                "file_uri": f"/uploads/{session_id_str}.{file_extension}",
+                "created_by": current_user["id"],
+                "session_id": session_id_str,
+                "name": f"拆题会话 - {document['filename']}",
+                "batch_id": batch_id,
+                "created_at": datetime.now()
+            }
+        ).fetchone()
+        jobs.append((session_row[0], document))
+    
+    db.commit()
+    
+    background_tasks.add_task(run_batch, batch_id, jobs, max_workers)
+    
+    return {
+        "id": batch_id,
+        "name": batch_name,
+        "status": "uploaded",
+        "created_at": str(batch_row[1]),
+        "total_files": len(documents),
+        "concurrency": max_workers,
+        "session_ids": [session_id for session_id, _ in jobs],
+        "skipped": skipped,
+        "message": f"批量拆题已创建，共 {len(documents)} 个文档，正在后台处理"
+    }
+
+@app.get("/api/ingest/batches/{batch_id}")
+def get_ingest_batch(
+    batch_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """获取批量拆题进度（按会话状态聚合）"""
+    from sqlalchemy import text
+    
+    batch = db.execute(
+        text("""
+            SELECT id, name, status, total_files, concurrency, created_at, finished_at
+            FROM ingest_batches
+            WHERE id = :batch_id AND created_by = :user_id
+        """),
+        {"batch_id": batch_id, "user_id": current_user["id"]}
+    ).fetchone()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Ingest batch not found")
+    
+    result = db.execute(
+        text("""
+            SELECT id, session_id, name, status, total_items
+            FROM ingest_sessions
+            WHERE batch_id = :batch_id
+            ORDER BY id
+        """),
+        {"batch_id": batch_id}
+    )
+    
+    sessions = []
+    status_counts = {}
+    total_items = 0
+    for row in result:
+        status_counts[row[3]] = status_counts.get(row[3], 0) + 1
+        total_items += row[4] or 0
+        sessions.append({
+            "id": row[0],
+            "session_id": row[1],
+            "name": row[2],
+            "status": row[3],
+            "total_items": row[4] or 0
+        })
+    
+    finished = status_counts.get('awaiting_review', 0) + status_counts.get('failed', 0) \
+        + status_counts.get('partially_approved', 0) + status_counts.get('completed', 0)
+    
+    return {
+        "id": batch[0],
+        "name": batch[1],
+        "status": batch[2],
+        "total_files": batch[3],
+        "concurrency": batch[4],
+        "created_at": str(batch[5]) if batch[5] else None,
+        "finished_at": str(batch[6]) if batch[6] else None,
+        "progress": {
+            "finished": finished,
+            "failed": status_counts.get('failed', 0),
+            "percent": round(finished * 100 / batch[3]) if batch[3] else 100,
+            "status_counts": status_counts,
+            "total_items": total_items
+        },
+        "sessions": sessions
+    }
@@ -1,5 +1,5 @@
 # app/models.py - SQLAlchemy Models
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Numeric, JSON, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Numeric, JSON, LargeBinary, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -195,18 +195,49 @@ class StudentStat(Base):
     student = relationship("User")
     knowledge_point = relationship("KnowledgePoint")
 
+class IngestBatch(Base):
+    __tablename__ = "ingest_batches"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200))
+    created_by = Column(Integer, ForeignKey("users.id"))
+    status = Column(String(30), default="uploaded")  # uploaded, processing, completed, partially_failed, failed
+    total_files = Column(Integer, default=0)
+    concurrency = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+    
+    # Relationships
+    creator = relationship("User")
+    sessions = relationship("IngestSession", back_populates="batch")
+
 class IngestSession(Base):
     __tablename__ = "ingest_sessions"
     
     id = Column(Integer, primary_key=True, index=True)
     uploader_id = Column(Integer, ForeignKey("users.id"))
     file_uri = Column(Text, nullable=False)
-    status = Column(String(30), default="uploaded")  # uploaded, parsing, awaiting_review, partially_approved, completed
+    status = Column(String(30), default="uploaded")  # uploaded, parsing, awaiting_review, partially_approved, completed, failed
+    batch_id = Column(Integer, ForeignKey("ingest_batches.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     uploader = relationship("User")
+    batch = relationship("IngestBatch", back_populates="sessions")
     items = relationship("IngestItem", back_populates="session")
+    document_text = relationship("IngestSessionText", uselist=False, back_populates="session")
+
+class IngestSessionText(Base):
+    __tablename__ = "ingest_session_texts"
+    
+    session_id = Column(Integer, ForeignKey("ingest_sessions.id"), primary_key=True)
+    text_zlib = Column(LargeBinary, nullable=False)  # zlib 压缩的提取全文
+    page_offsets = Column(JSON)  # 每页在全文中的起始偏移
+    char_count = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    session = relationship("IngestSession", back_populates="document_text")
 
 class IngestItem(Base):
     __tablename__ = "ingest_items"
@@ -221,7 +252,10 @@ class IngestItem(Base):
     confidence = Column(Numeric(5, 2))
     review_status = Column(String(20), default="pending")  # pending, approved, rejected, edited
     approved_question_id = Column(Integer, ForeignKey("questions.id"))
+    duplicate_question_id = Column(Integer, ForeignKey("questions.id"))  # 最相似的已有题目
+    duplicate_similarity = Column(Numeric(5, 4))
     
     # Relationships
     session = relationship("IngestSession", back_populates="items")
-    approved_question = relationship("Question")
\ No newline at end of file
+    approved_question = relationship("Question", foreign_keys=[approved_question_id])
+    duplicate_question = relationship("Question", foreign_keys=[duplicate_question_id])
\ No newline at end of file
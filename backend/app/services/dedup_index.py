@@ -0,0 +1,384 @@
+"""
+题目近似重复检测 - MinHash LSH 索引
+对 questions.stem 的字符 shingle 计算 MinHash 签名，按 band 分桶实现亚毫秒级近邻查询。
+索引常驻内存，通过快照（.npz）+ 追加日志（.journal）持久化，审核通过时增量更新，无需全量重建。
+快照和日志由同一主机上的所有后端进程共享，读写时通过 {path}.lock 文件锁互斥。
+"""
+
+import fcntl
+import logging
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# 去掉题号前缀，如 "12." "3、" "(4)" "第5题："
+_NUMBERING_PATTERN = re.compile(r'^\s*(?:第\s*\d+\s*题[:：]?|\(\d+\)|（\d+）|\d+\s*[.．、)）])')
+_NON_WORD_PATTERN = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_stem(text: str) -> str:
+    """规范化题干：全角转半角、小写、去题号、去空白和标点"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    text = _NUMBERING_PATTERN.sub('', text)
+    return _NON_WORD_PATTERN.sub('', text)
+
+
+@contextmanager
+def _file_lock(path: str, exclusive: bool = True):
+    """跨进程文件锁，保护共享的快照和追加日志"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def shingles(text: str, k: int = 3) -> List[str]:
+    """字符级 k-shingle（中文题干没有天然分词边界，按字符切分）"""
+    if len(text) <= k:
+        return [text] if text else []
+    return list({text[i:i + k] for i in range(len(text) - k + 1)})
+
+
+class MinHashLSH:
+    """MinHash LSH 索引：每个 band 维护已排序的桶键数组（二分查找）和一个增量字典"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1,
+                 merge_threshold: int = 20000, snapshot_interval: int = 10000):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm 必须能被 bands 整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.seed = seed
+        self.merge_threshold = merge_threshold
+        self.snapshot_interval = snapshot_interval
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._band_mix = rng.randint(1, 1 << 63, size=self.rows, dtype=np.uint64) | np.uint64(1)
+
+        self._ids = np.empty(0, dtype=np.int64)
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._size = 0
+        self._row_of: Dict[int, int] = {}
+
+        self._band_keys = [np.empty(0, dtype=np.uint64) for _ in range(bands)]
+        self._band_rows = [np.empty(0, dtype=np.int32) for _ in range(bands)]
+        self._delta: List[Dict[int, List[int]]] = [dict() for _ in range(bands)]
+        self._delta_size = 0
+
+        self._path = None
+        self._journal = None
+        self._journal_records = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    @property
+    def max_question_id(self) -> int:
+        return max(self._row_of) if self._row_of else 0
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """计算题干的 MinHash 签名，空题干返回 None"""
+        grams = shingles(normalize_stem(text))
+        if not grams:
+            return None
+        hashes = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+        permuted = (np.outer(hashes, self._a) % _MERSENNE_PRIME + self._b) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+    def _band_key_values(self, signatures: np.ndarray) -> np.ndarray:
+        """将签名按 band 折叠为 64 位桶键，返回形状 (n, bands)"""
+        banded = signatures.reshape(-1, self.bands, self.rows).astype(np.uint64)
+        return (banded * self._band_mix).sum(axis=2)
+
+    def _ensure_capacity(self, extra: int):
+        needed = self._size + extra
+        if needed <= len(self._ids):
+            return
+        capacity = max(needed, len(self._ids) * 2, 1024)
+        ids = np.empty(capacity, dtype=np.int64)
+        signatures = np.empty((capacity, self.num_perm), dtype=np.uint32)
+        ids[:self._size] = self._ids[:self._size]
+        signatures[:self._size] = self._signatures[:self._size]
+        self._ids, self._signatures = ids, signatures
+
+    def _insert(self, question_id: int, sig: np.ndarray):
+        row = self._row_of.get(question_id)
+        if row is None:
+            self._ensure_capacity(1)
+            row = self._size
+            self._size += 1
+            self._ids[row] = question_id
+            self._row_of[question_id] = row
+        # 题干被修改时原位覆盖签名；旧桶键只会带来多余的候选，查询时按签名校验相似度
+        self._signatures[row] = sig
+
+        for band, key in enumerate(self._band_key_values(sig[None, :])[0]):
+            self._delta[band].setdefault(int(key), []).append(row)
+        self._delta_size += 1
+        if self._delta_size >= self.merge_threshold:
+            self._merge_delta()
+
+    def _merge_delta(self):
+        """把增量字典合并进已排序的桶键数组"""
+        if not self._delta_size:
+            return
+        for band in range(self.bands):
+            delta = self._delta[band]
+            keys = np.fromiter((k for k, rows in delta.items() for _ in rows), dtype=np.uint64)
+            rows = np.fromiter((r for rows in delta.values() for r in rows), dtype=np.int32)
+            all_keys = np.concatenate([self._band_keys[band], keys])
+            all_rows = np.concatenate([self._band_rows[band], rows])
+            order = np.argsort(all_keys, kind='stable')
+            self._band_keys[band] = all_keys[order]
+            self._band_rows[band] = all_rows[order]
+            self._delta[band] = {}
+        self._delta_size = 0
+
+    def build(self, items: List[Tuple[int, str]]):
+        """批量构建（初始化时使用）"""
+        with self._lock:
+            self._ensure_capacity(len(items))
+            for question_id, stem in items:
+                sig = self.signature(stem)
+                if sig is None:
+                    continue
+                row = self._row_of.get(question_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._ids[row] = question_id
+                    self._row_of[question_id] = row
+                self._signatures[row] = sig
+
+            signatures = self._signatures[:self._size]
+            all_keys = self._band_key_values(signatures)
+            rows = np.arange(self._size, dtype=np.int32)
+            for band in range(self.bands):
+                order = np.argsort(all_keys[:, band], kind='stable')
+                self._band_keys[band] = all_keys[order, band]
+                self._band_rows[band] = rows[order]
+            self._delta = [dict() for _ in range(self.bands)]
+            self._delta_size = 0
+
+    def add(self, question_id: int, stem: str) -> bool:
+        """增量添加（或更新）一道题目，并写入追加日志"""
+        sig = self.signature(stem)
+        if sig is None:
+            return False
+        with self._lock:
+            self._insert(question_id, sig)
+            if self._journal is not None:
+                with _file_lock(self._path):
+                    self._journal.write(np.int64(question_id).tobytes() + sig.tobytes())
+                    self._journal.flush()
+                self._journal_records += 1
+                # 日志过长时写一次快照，控制重启时的重放时间
+                if self._journal_records >= self.snapshot_interval:
+                    self.save(self._path)
+        return True
+
+    def query(self, stem: str, min_similarity: float = 0.5) -> Optional[Tuple[int, float]]:
+        """
+        查找最相似的已有题目
+
+        Returns:
+            (question_id, similarity) 或 None；similarity 为签名估计的 Jaccard 相似度
+        """
+        sig = self.signature(stem)
+        if sig is None:
+            return None
+        keys = self._band_key_values(sig[None, :])[0]
+
+        with self._lock:
+            candidates = []
+            for band, key in enumerate(keys):
+                band_keys = self._band_keys[band]
+                lo = np.searchsorted(band_keys, key, side='left')
+                hi = np.searchsorted(band_keys, key, side='right')
+                if hi > lo:
+                    candidates.append(self._band_rows[band][lo:hi])
+                delta_rows = self._delta[band].get(int(key))
+                if delta_rows:
+                    candidates.append(np.asarray(delta_rows, dtype=np.int32))
+            if not candidates:
+                return None
+
+            rows = np.unique(np.concatenate(candidates))
+            similarities = (self._signatures[rows] == sig).mean(axis=1)
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < min_similarity:
+                return None
+            return int(self._ids[rows[best]]), round(similarity, 4)
+
+    def _replay_journal(self, payload: bytes) -> int:
+        """重放追加日志记录，返回新增或变更的记录数"""
+        record_size = 8 + 4 * self.num_perm
+        replayed = 0
+        for offset in range(0, len(payload) - record_size + 1, record_size):
+            question_id = int(np.frombuffer(payload, dtype=np.int64, count=1, offset=offset)[0])
+            sig = np.frombuffer(payload, dtype=np.uint32, count=self.num_perm, offset=offset + 8).copy()
+            row = self._row_of.get(question_id)
+            if row is not None and np.array_equal(self._signatures[row], sig):
+                continue
+            self._insert(question_id, sig)
+            replayed += 1
+        return replayed
+
+    def save(self, path: str):
+        """写入快照并清空追加日志"""
+        journal_path = f"{path}.journal"
+        with self._lock, _file_lock(path):
+            # 日志中可能有其他进程追加的记录，先并入本进程索引再写快照，清空日志时不会丢失
+            if os.path.exists(journal_path):
+                with open(journal_path, 'rb') as f:
+                    self._replay_journal(f.read())
+            self._merge_delta()
+            arrays = {
+                "params": np.array([self.num_perm, self.bands, self.seed], dtype=np.int64),
+                "ids": self._ids[:self._size],
+                "signatures": self._signatures[:self._size],
+            }
+            for band in range(self.bands):
+                arrays[f"band_keys_{band}"] = self._band_keys[band]
+                arrays[f"band_rows_{band}"] = self._band_rows[band]
+
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+
+            # 各进程的日志句柄都以追加模式打开，截断后继续写在文件末尾
+            if os.path.exists(journal_path):
+                os.truncate(journal_path, 0)
+            self._journal_records = 0
+        logger.info(f"去重索引快照已保存: {path}, 共 {self._size} 道题目")
+
+    def open_journal(self, path: str):
+        """打开追加日志，之后每次 add 都会落盘"""
+        self._path = path
+        self._journal = open(f"{path}.journal", 'ab')
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> Optional['MinHashLSH']:
+        """加载快照并重放追加日志；参数不一致或文件不存在时返回 None"""
+        with _file_lock(path, exclusive=False):
+            if not os.path.exists(path):
+                return None
+            with np.load(path) as npz:
+                data = dict(npz)
+            journal_path = f"{path}.journal"
+            journal = b''
+            if os.path.exists(journal_path):
+                with open(journal_path, 'rb') as f:
+                    journal = f.read()
+
+        num_perm, bands, seed = (int(v) for v in data["params"])
+        index = cls(num_perm=num_perm, bands=bands, seed=seed, **kwargs)
+
+        index._ids = data["ids"].copy()
+        index._signatures = data["signatures"].copy()
+        index._size = len(index._ids)
+        index._row_of = {int(qid): row for row, qid in enumerate(index._ids)}
+        for band in range(bands):
+            index._band_keys[band] = data[f"band_keys_{band}"]
+            index._band_rows[band] = data[f"band_rows_{band}"]
+
+        replayed = index._replay_journal(journal)
+        if replayed:
+            logger.info(f"去重索引重放日志 {replayed} 条")
+        return index
+
+
+_index: Optional[MinHashLSH] = None
+_index_lock = threading.Lock()
+_loader: Optional[threading.Thread] = None
+
+
+def _load_index(db) -> MinHashLSH:
+    """加载磁盘快照（不存在则从 questions 表构建），并补齐快照之后新增的题目"""
+    from sqlalchemy import text
+    from app.config import settings
+
+    path = settings.dedup_index_path
+    index = MinHashLSH.load(path)
+    if index is None:
+        logger.info("去重索引快照不存在，从 questions 表构建")
+        index = MinHashLSH()
+        rows = db.execute(text("SELECT id, stem FROM questions ORDER BY id")).fetchall()
+        index.build([(row[0], row[1]) for row in rows])
+        index.save(path)
+    else:
+        _add_questions_after(db, index, index.max_question_id)
+
+    index.open_journal(path)
+    return index
+
+
+def _add_questions_after(db, index: MinHashLSH, max_id: int):
+    """补齐 id 大于 max_id 的题目（例如通过 /api/questions 直接创建的题目）"""
+    from sqlalchemy import text
+
+    rows = db.execute(
+        text("SELECT id, stem FROM questions WHERE id > :max_id ORDER BY id"),
+        {"max_id": max_id}
+    ).fetchall()
+    for row in rows:
+        index.add(row[0], row[1])
+
+
+def _load_in_background():
+    global _index
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        index = _load_index(db)
+        max_id = index.max_question_id
+        _index = index
+        # 加载期间审核通过的题目没有写入索引（当时 get_dedup_index 返回 None），就绪后再补齐一次
+        _add_questions_after(db, index, max_id)
+        logger.info(f"去重索引已就绪，共 {len(index)} 道题目")
+    except Exception as e:
+        logger.error(f"去重索引加载失败: {e}")
+    finally:
+        db.close()
+
+
+def warm_dedup_index():
+    """在后台线程加载去重索引（服务启动时调用），已就绪或正在加载时不重复启动"""
+    global _loader
+    with _index_lock:
+        if _index is not None or (_loader is not None and _loader.is_alive()):
+            return
+        _loader = threading.Thread(target=_load_in_background, name="dedup-index-loader", daemon=True)
+        _loader.start()
+
+
+def get_dedup_index() -> Optional[MinHashLSH]:
+    """
+    获取进程内共享的去重索引
+
+    索引尚未就绪时触发后台加载并返回 None，由调用方决定跳过去重或稍后重试，
+    请求线程不会阻塞在全量构建上
+    """
+    if _index is None:
+        warm_dedup_index()
+    return _index
@@ -0,0 +1,437 @@
+"""
+批量拆题入库服务
+将 zip 包或多文件上传展开为独立文档，每个文档对应一条 ingest_sessions 记录，
+在服务进程共享的进程池中并行处理（每个批次有独立的并发上限）
+"""
+
+import io
+import json
+import logging
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# 扩展名到 content_type 的映射，与单文件上传允许的类型保持一致
+SUPPORTED_EXTENSIONS = {
+    'pdf': 'application/pdf',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+ZIP_CONTENT_TYPES = {'application/zip', 'application/x-zip-compressed'}
+
+# 单个文档的最大解压大小，防止 zip 炸弹
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+# 一次上传中所有 zip 条目的解压总大小上限
+MAX_BATCH_BYTES = 500 * 1024 * 1024
+
+# 每个子进程复用一个文档处理器实例
+_processor = None
+
+# 所有批次共享的进程池，并发批次不会成倍增加进程数
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _zip_entry_name(info: zipfile.ZipInfo) -> str:
+    """解码 zip 条目名称（Windows 下打包的中文文件名通常是 GBK 编码）"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('gbk')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def _content_type_for(filename: str) -> str:
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return SUPPORTED_EXTENSIONS.get(extension)
+
+
+def expand_uploads(files: List[Tuple[str, str, bytes]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    """
+    展开上传的文件列表
+
+    Args:
+        files: [(filename, content_type, content)]
+
+    Returns:
+        (documents, skipped): 可处理的文档列表，以及被跳过的文件和原因
+    """
+    documents = []
+    skipped = []
+    total_bytes = 0
+
+    for filename, content_type, content in files:
+        is_zip = content_type in ZIP_CONTENT_TYPES or filename.lower().endswith('.zip')
+        if not is_zip:
+            doc_type = content_type if content_type in SUPPORTED_EXTENSIONS.values() else _content_type_for(filename)
+            if not doc_type:
+                skipped.append({"filename": filename, "reason": f"不支持的文件类型: {content_type}"})
+                continue
+            documents.append({"filename": filename, "content_type": doc_type, "content": content})
+            continue
+
+        try:
+            with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                for info in archive.infolist():
+                    entry_name = _zip_entry_name(info)
+                    base_name = entry_name.rsplit('/', 1)[-1]
+                    if info.is_dir() or entry_name.startswith('__MACOSX/') or base_name.startswith('.'):
+                        continue
+
+                    doc_type = _content_type_for(base_name)
+                    if not doc_type:
+                        skipped.append({"filename": entry_name, "reason": "不支持的文件类型"})
+                        continue
+                    if info.file_size > MAX_DOCUMENT_BYTES:
+                        skipped.append({"filename": entry_name, "reason": "文件过大"})
+                        continue
+                    if total_bytes + info.file_size > MAX_BATCH_BYTES:
+                        skipped.append({"filename": entry_name, "reason": "超出批次解压总大小上限"})
+                        continue
+
+                    try:
+                        entry_content = archive.read(info)
+                    except (RuntimeError, NotImplementedError) as e:
+                        # 加密条目抛 RuntimeError，不支持的压缩方式抛 NotImplementedError
+                        skipped.append({"filename": entry_name, "reason": f"无法解压: {e}"})
+                        continue
+                    total_bytes += len(entry_content)
+                    documents.append({
+                        "filename": base_name,
+                        "content_type": doc_type,
+                        "content": entry_content
+                    })
+        except zipfile.BadZipFile:
+            skipped.append({"filename": filename, "reason": "无效的zip文件"})
+
+    return documents, skipped
+
+
+def process_document(content: bytes, content_type: str, filename: str) -> Dict[str, Any]:
+    """在子进程中提取文本并拆题"""
+    global _processor
+    if _processor is None:
+        from app.services.real_document_processor import DocumentProcessor
+        _processor = DocumentProcessor()
+    return _processor.process_document(content, content_type, filename)
+
+
+# ocr_json 中与独立列重复的字段（题干存 question_text，题型、置信度存各自的列）；options 保留。
+# migrations/compact_ingest_items*.sql 回填旧数据时去掉同样的键，修改时两处一起改
+_REDUNDANT_OCR_KEYS = ('text', 'stem', 'type', 'confidence')
+
+
+def compact_ocr_json(ocr_result: Dict[str, Any]) -> Optional[str]:
+    """只保留带位置框的 OCR 结果（worker 识别的扫描件），纯文本拆题的结果不再重复存储"""
+    if not ocr_result or 'bbox' not in ocr_result:
+        return None
+    return json.dumps({k: v for k, v in ocr_result.items() if k not in _REDUNDANT_OCR_KEYS}, ensure_ascii=False)
+
+
+def _find_knowledge_point(db, key: tuple) -> Optional[int]:
+    """按 (subject, module, point) 查找知识点 id"""
+    row = db.execute(
+        text("""
+            SELECT id FROM knowledge_points
+            WHERE subject = :subject
+              AND (module = :module OR (module IS NULL AND :module IS NULL))
+              AND (point = :point OR (point IS NULL AND :point IS NULL))
+            ORDER BY id LIMIT 1
+        """),
+        {"subject": key[0], "module": key[1], "point": key[2]}
+    ).fetchone()
+    return row[0] if row else None
+
+
+def resolve_candidate_kps(db, candidate_kps: List[Any], kp_ids: Dict[tuple, Optional[int]] = None) -> List[Any]:
+    """
+    将候选知识点转换为紧凑的 [kp_id, confidence] 对
+
+    候选项可以是 {"id": ..}（worker 分类结果）、{"subject", "module", "point"}（关键词匹配）
+    或纯字符串（AI 建议的知识点名称）；后两者按名称匹配 knowledge_points。
+    匹配不到的保留为 {"subject", "module", "point", "confidence"}，审核通过时才创建知识点，
+    未经审核的 AI 建议不会写入知识点表。
+
+    Args:
+        kp_ids: 调用方在同一事务内复用的 名称 -> id 缓存
+    """
+    if kp_ids is None:
+        kp_ids = {}
+    pairs = []
+    for kp in candidate_kps or []:
+        if isinstance(kp, str):
+            kp = {'subject': '通用', 'module': None, 'point': kp, 'confidence': 0.8}
+        if not isinstance(kp, dict):
+            continue
+        confidence = round(float(kp.get('confidence', 0.5)), 2)
+        if kp.get('id') is not None:
+            pairs.append([int(kp['id']), confidence])
+            continue
+
+        key = (kp.get('subject') or '通用', kp.get('module'), kp.get('point'))
+        if key not in kp_ids:
+            kp_ids[key] = _find_knowledge_point(db, key)
+        if kp_ids[key] is None:
+            suggestion = {'subject': key[0], 'module': key[1], 'point': key[2], 'confidence': confidence}
+            pairs.append({k: v for k, v in suggestion.items() if v is not None})
+        else:
+            pairs.append([kp_ids[key], confidence])
+    return pairs
+
+
+def approve_candidate_kps(db, candidate_kps_json: Any) -> List[int]:
+    """
+    审核通过时确定题目的知识点 id（调用方负责提交事务）
+
+    已匹配的 [kp_id, confidence] 直接使用，未匹配的建议此时才创建为知识点
+    """
+    candidate_kps = json.loads(candidate_kps_json) if isinstance(candidate_kps_json, str) else (candidate_kps_json or [])
+    kp_ids = []
+    for kp in candidate_kps:
+        if isinstance(kp, list):
+            kp_id = kp[0]
+        elif isinstance(kp, dict) and kp.get('id') is not None:
+            kp_id = kp['id']
+        elif isinstance(kp, dict) and kp.get('point'):
+            key = (kp.get('subject') or '通用', kp.get('module'), kp['point'])
+            kp_id = _find_knowledge_point(db, key)
+            if kp_id is None:
+                kp_id = db.execute(
+                    text("""
+                        INSERT INTO knowledge_points (subject, module, point)
+                        VALUES (:subject, :module, :point)
+                        RETURNING id
+                    """),
+                    {"subject": key[0], "module": key[1], "point": key[2]}
+                ).scalar()
+        else:
+            continue
+        if int(kp_id) not in kp_ids:
+            kp_ids.append(int(kp_id))
+    return kp_ids
+
+
+def expand_candidate_kps(db, kps_columns: List[Any]) -> List[List[Dict[str, Any]]]:
+    """把多行 candidate_kps_json 的 [kp_id, confidence] 对展开为知识点详情（一次查询）"""
+    parsed = [json.loads(value) if isinstance(value, str) else (value or []) for value in kps_columns]
+    # 未匹配的知识点建议和尚未回填的旧格式（知识点字典）原样返回
+    ids = sorted({pair[0] for pairs in parsed for pair in pairs if isinstance(pair, list)})
+    details = {}
+    if ids:
+        params = {f"id{i}": kp_id for i, kp_id in enumerate(ids)}
+        rows = db.execute(
+            text(f"SELECT id, subject, module, point, code FROM knowledge_points "
+                 f"WHERE id IN ({', '.join(':' + name for name in params)})"),
+            params
+        ).fetchall()
+        details = {row[0]: {"id": row[0], "subject": row[1], "module": row[2], "point": row[3], "code": row[4]}
+                   for row in rows}
+
+    return [
+        [dict(details.get(pair[0], {"id": pair[0]}), confidence=pair[1]) if isinstance(pair, list) else pair
+         for pair in pairs]
+        for pairs in parsed
+    ]
+
+
+def save_ingest_items(db, session_id: int, items: List[Dict[str, Any]]) -> int:
+    """保存拆题项目并更新会话状态（调用方负责提交事务）"""
+    try:
+        from app.services.dedup_index import get_dedup_index
+        dedup_index = get_dedup_index()
+    except Exception as e:
+        logger.warning(f"去重索引不可用，跳过重复检测: {e}")
+        dedup_index = None
+
+    if dedup_index is None:
+        logger.info(f"去重索引尚未就绪，会话 {session_id} 跳过重复检测")
+
+    kp_ids = {}
+    for item in items:
+        # 标注题库中最相似的已有题目
+        duplicate = dedup_index.query(item["question_text"]) if dedup_index else None
+        db.execute(
+            text("""
+                INSERT INTO ingest_items (session_id, seq, ocr_json, question_text, candidate_type,
+                                         candidate_kps_json, confidence, review_status,
+                                         duplicate_question_id, duplicate_similarity)
+                VALUES (:session_id, :seq, :ocr_json, :question_text, :candidate_type,
+                       :candidate_kps_json, :confidence, 'pending',
+                       :duplicate_question_id, :duplicate_similarity)
+            """),
+            {
+                "session_id": session_id,
+                "seq": item["seq"],
+                "ocr_json": compact_ocr_json(item.get("ocr_result")),
+                "question_text": item["question_text"],
+                "candidate_type": item["question_type"],
+                "candidate_kps_json": json.dumps(resolve_candidate_kps(db, item["candidate_kps"], kp_ids)),
+                "confidence": item["confidence"],
+                "duplicate_question_id": duplicate[0] if duplicate else None,
+                "duplicate_similarity": duplicate[1] if duplicate else None
+            }
+        )
+
+    total_items = len(items)
+    db.execute(
+        text("""
+            UPDATE ingest_sessions
+            SET status = 'awaiting_review', total_items = :total, processed_items = :processed
+            WHERE id = :id
+        """),
+        {"id": session_id, "total": total_items, "processed": total_items}
+    )
+    return total_items
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """获取共享进程池（首次使用时创建）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from app.config import settings
+            # 使用 spawn，避免在多线程的服务进程中 fork
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.ingest_pool_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def _submit(*args):
+    """提交到共享进程池；子进程异常退出会使进程池损坏，此时重建进程池后重试一次"""
+    global _pool
+    pool = _get_pool()
+    try:
+        return pool.submit(process_document, *args)
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        pool.shutdown(wait=False)
+        logger.warning("拆题进程池已损坏，重建进程池")
+        return _get_pool().submit(process_document, *args)
+
+
+def shutdown_pool():
+    """关闭共享进程池（服务退出时调用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _finish_session(db, session_id: int, result: Dict[str, Any]):
+    """写入单个文档的处理结果"""
+    try:
+        if not result.get('success'):
+            raise ValueError(result.get('error', '未知错误'))
+        from app.services.ingest_text import save_session_text
+        save_ingest_items(db, session_id, result['items'])
+        save_session_text(db, session_id, result)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"拆题会话 {session_id} 处理失败: {e}")
+        db.execute(
+            text("UPDATE ingest_sessions SET status = 'failed' WHERE id = :id"),
+            {"id": session_id}
+        )
+        db.commit()
+
+
+def run_batch(batch_id: int, jobs: List[Tuple[int, Dict[str, Any]]], max_workers: int):
+    """
+    并行处理一个批次中的所有文档
+
+    Args:
+        batch_id: ingest_batches.id
+        jobs: [(ingest_sessions.id, document)]
+        max_workers: 本批次的并发上限
+    """
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    started = datetime.now()
+    try:
+        db.execute(
+            text("UPDATE ingest_batches SET status = 'processing' WHERE id = :id"),
+            {"id": batch_id}
+        )
+        db.execute(
+            text("UPDATE ingest_sessions SET status = 'parsing' WHERE batch_id = :id"),
+            {"id": batch_id}
+        )
+        db.commit()
+
+        workers = max(1, min(max_workers, len(jobs)))
+        # 本批次同时在共享进程池中排队的文档不超过 workers 个，其余批次可以交替使用进程池
+        pending_jobs = iter(jobs)
+        futures = {}
+        while True:
+            for session_id, doc in pending_jobs:
+                try:
+                    future = _submit(doc["content"], doc["content_type"], doc["filename"])
+                except BrokenProcessPool as e:
+                    _finish_session(db, session_id, {'success': False, 'error': str(e), 'items': []})
+                    continue
+                futures[future] = session_id
+                if len(futures) >= workers:
+                    break
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'success': False, 'error': str(e), 'items': []}
+                _finish_session(db, futures.pop(future), result)
+
+        failed = db.execute(
+            text("SELECT COUNT(*) FROM ingest_sessions WHERE batch_id = :id AND status = 'failed'"),
+            {"id": batch_id}
+        ).scalar() or 0
+        if failed == 0:
+            batch_status = 'completed'
+        elif failed < len(jobs):
+            batch_status = 'partially_failed'
+        else:
+            batch_status = 'failed'
+
+        db.execute(
+            text("UPDATE ingest_batches SET status = :status, finished_at = :finished_at WHERE id = :id"),
+            {"id": batch_id, "status": batch_status, "finished_at": datetime.now()}
+        )
+        db.commit()
+        logger.info(
+            f"拆题批次 {batch_id} 处理完成: {len(jobs)} 个文档, {failed} 个失败, "
+            f"并发 {workers}, 耗时 {(datetime.now() - started).total_seconds():.1f}s"
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"拆题批次 {batch_id} 处理失败: {e}")
+        db.execute(
+            text("UPDATE ingest_sessions SET status = 'failed' WHERE batch_id = :id AND status = 'parsing'"),
+            {"id": batch_id}
+        )
+        db.execute(
+            text("UPDATE ingest_batches SET status = 'failed', finished_at = :finished_at WHERE id = :id"),
+            {"id": batch_id, "finished_at": datetime.now()}
+        )
+        db.commit()
+    finally:
+        db.close()
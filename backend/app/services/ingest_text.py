@@ -0,0 +1,127 @@
+"""
+拆题会话原文存储与重新拆分
+首次解析时把提取后的全文（zlib 压缩）和分页偏移写入 ingest_session_texts，
+调整拆分策略或参数时直接基于存储的全文重新拆题，无需重新上传和解析原文件
+"""
+
+import json
+import logging
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+def save_session_text(db, session_id: int, result: Dict[str, Any]):
+    """保存文档处理结果中的全文和分页偏移（调用方负责提交事务）"""
+    full_text = result.get('text')
+    if not full_text:
+        return
+    page_offsets = result.get('page_offsets') or [0]
+    db.execute(
+        text("""
+            INSERT INTO ingest_session_texts (session_id, text_zlib, page_offsets, char_count)
+            VALUES (:session_id, :text_zlib, :page_offsets, :char_count)
+            ON CONFLICT (session_id) DO UPDATE
+            SET text_zlib = excluded.text_zlib, page_offsets = excluded.page_offsets,
+                char_count = excluded.char_count
+        """),
+        {
+            "session_id": session_id,
+            "text_zlib": zlib.compress(full_text.encode('utf-8'), 6),
+            "page_offsets": json.dumps(page_offsets),
+            "char_count": len(full_text)
+        }
+    )
+
+
+def load_session_text(db, session_id: int) -> Optional[Tuple[str, List[int]]]:
+    """读取会话全文，返回 (全文, 分页偏移)；旧会话没有存储全文时返回 None"""
+    row = db.execute(
+        text("SELECT text_zlib, page_offsets FROM ingest_session_texts WHERE session_id = :session_id"),
+        {"session_id": session_id}
+    ).fetchone()
+    if not row:
+        return None
+    page_offsets = row[1] if isinstance(row[1], list) else json.loads(row[1] or '[0]')
+    return zlib.decompress(bytes(row[0])).decode('utf-8'), page_offsets
+
+
+def resplit_session(db, session_id: int, strategy: str = 'auto', pattern: str = None,
+                    min_length: int = None) -> Dict[str, Any]:
+    """
+    基于存储的全文重新拆题，并原子替换会话中的待审核项目
+
+    已审核（通过/驳回/编辑）的项目保留不动，新拆出的题目中与之重复的不再插入；
+    新项目的 seq 接在保留项目的最大 seq 之后，会话内 seq 不重复。
+
+    Raises:
+        LookupError: 会话没有存储全文
+        ValueError: 拆分策略或参数无效
+    """
+    from app.services.dedup_index import normalize_stem
+    from app.services.ingest_batch import save_ingest_items
+    from app.services.real_document_processor import DocumentProcessor
+
+    stored = load_session_text(db, session_id)
+    if stored is None:
+        raise LookupError("该会话没有保存原文，请重新上传文件")
+    full_text, page_offsets = stored
+
+    started = time.perf_counter()
+    processor = DocumentProcessor()
+    items = processor.split_text(full_text, strategy=strategy, page_offsets=page_offsets,
+                                 pattern=pattern, min_length=min_length)
+    split_ms = (time.perf_counter() - started) * 1000
+
+    reviewed = db.execute(
+        text("""
+            SELECT question_text, seq FROM ingest_items
+            WHERE session_id = :session_id AND review_status != 'pending'
+        """),
+        {"session_id": session_id}
+    ).fetchall()
+    reviewed_stems = {normalize_stem(row[0]) for row in reviewed if row[0]}
+    new_items = [item for item in items if normalize_stem(item['question_text']) not in reviewed_stems]
+    # split_text 从 1 开始编号，保留的已审核项目占用了其中的部分 seq
+    last_seq = max((row[1] or 0 for row in reviewed), default=0)
+    for offset, item in enumerate(new_items, start=1):
+        item['seq'] = last_seq + offset
+
+    # 删除旧的待审核项目与插入新项目在同一事务中完成，审核端不会看到中间状态
+    try:
+        replaced = db.execute(
+            text("DELETE FROM ingest_items WHERE session_id = :session_id AND review_status = 'pending'"),
+            {"session_id": session_id}
+        ).rowcount
+        save_ingest_items(db, session_id, new_items)
+        total = db.execute(
+            text("SELECT COUNT(*) FROM ingest_items WHERE session_id = :session_id"),
+            {"session_id": session_id}
+        ).scalar() or 0
+        db.execute(
+            text("UPDATE ingest_sessions SET total_items = :total, processed_items = :total WHERE id = :id"),
+            {"id": session_id, "total": total}
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info(
+        f"拆题会话 {session_id} 重新拆分完成: 策略 {strategy}, 替换 {replaced} 项, "
+        f"新增 {len(new_items)} 项, 拆分耗时 {split_ms:.1f}ms"
+    )
+    return {
+        "session_id": session_id,
+        "strategy": strategy,
+        "replaced_items": replaced,
+        "new_items": len(new_items),
+        "kept_reviewed_items": len(reviewed),
+        "skipped_reviewed_duplicates": len(items) - len(new_items),
+        "total_items": total,
+        "split_ms": round(split_ms, 1)
+    }
@@ -2,6 +2,7 @@
 PDF试卷生成服务 - 简化版本
 """
 import os
+import sys
 import tempfile
 from datetime import datetime
 from typing import List, Dict, Any, Optional
@@ -14,6 +15,13 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 
+try:
+    from shared.qr_payload import QR_REGION, encode_qr_payload
+except ImportError:
+    # 在 backend 目录下运行时仓库根目录不在 sys.path 中（容器内 shared 挂载到 /app/shared）
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+    from shared.qr_payload import QR_REGION, encode_qr_payload
+
 class PDFGenerator:
     def __init__(self):
         self.styles = getSampleStyleSheet()
@@ -182,20 +190,27 @@ class PDFGenerator:
         
         return pdf_path
     
-    def generate_answer_sheet_qr(self, paper_id: int, area: str = "answer") -> Dict[str, Any]:
+    def generate_answer_sheet_qr(self, paper_id: int, area: str = "answer",
+                                 student_id: Optional[str] = None, page: int = 1) -> Dict[str, Any]:
         """
         生成答题卡二维码schema
         
         Args:
             paper_id: 试卷ID
             area: 区域标识
+            student_id: 学生标识（按学生打印答题卡时填写）
+            page: 页码
             
         Returns:
-            二维码schema数据
+            二维码schema数据：payload 为印在二维码中的内容，region 为二维码在页面中的位置（相对页面宽高的比例），
+            识别端先在 region 内解码，失败时再搜索整页
         """
         return {
             "paper_id": paper_id,
-            "page": 1,
+            "student_id": student_id,
+            "page": page,
             "area": area,
+            "payload": encode_qr_payload(paper_id, student_id, page),
+            "region": dict(QR_REGION),
             "timestamp": datetime.now().isoformat()
         }
\ No newline at end of file
@@ -14,6 +14,23 @@ from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# 改进的题号匹配模式，保持原始格式
+QUESTION_NUMBER_PATTERNS = {
+    # 最精确的模式，保留空格和换行：1. / 1．
+    'dot': r'(?:^|\n)\s*([1-9]\d*)[.\uff0e]\s*([^\n]+(?:\n(?!\s*\d+[.\uff0e]|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*\d+[.\uff0e]|\n\s*[一二三四五六七八九十]、|$)',
+    # 1、
+    'comma': r'(?:^|\n)\s*([1-9]\d*)、\s*([^\n]+(?:\n(?!\s*\d+、|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*\d+、|\n\s*[一二三四五六七八九十]、|$)',
+    # 第1题
+    'ti': r'(?:^|\n)\s*第\s*([1-9]\d*)\s*题[\uff1a:\s]*([^\n]+(?:\n(?!\s*第\s*\d+\s*题|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*第\s*\d+\s*题|\n\s*[一二三四五六七八九十]、|$)',
+    # 1)
+    'paren_right': r'(?:^|\n)\s*([1-9]\d*)\)\s*([^\n]+(?:\n(?!\s*\d+\)|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*\d+\)|\n\s*[一二三四五六七八九十]、|$)',
+    # (1)
+    'paren': r'(?:^|\n)\s*\(([1-9]\d*)\)\s*([^\n]+(?:\n(?!\s*\(\d+\)|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*\(\d+\)|\n\s*[一二三四五六七八九十]、|$)',
+}
+
+# 重新拆分时可选的策略
+SPLIT_STRATEGIES = ('auto', 'pattern', 'question_mark', 'choice', 'page')
+
 class DocumentProcessor:
     """智能文档处理器 - 支持AI增强识别"""
     
@@ -44,6 +61,7 @@ class DocumentProcessor:
         self.ai_api_key = None  # AI API密钥
         self.min_confidence_threshold = 0.6  # 最低置信度阈值
         self.min_questions_threshold = 3  # 最少题目数量阈值
+        self.min_question_length = 15  # 有效题目的最小长度
         
         # 检查依赖
         self.has_pdf = self._check_pdf_support()
@@ -246,13 +264,7 @@ class DocumentProcessor:
         try:
             processor = self.supported_types[content_type]
             result = processor(file_content, filename)
-            
-            # 为每个题目添加元数据
-            for i, item in enumerate(result['items']):
-                item['seq'] = i + 1
-                item['id'] = str(uuid.uuid4())
-                item['source_file'] = filename
-                
+            self._assign_item_metadata(result['items'], filename)
             return result
             
         except Exception as e:
@@ -263,6 +275,49 @@ class DocumentProcessor:
                 'items': []
             }
     
+    def split_text(self, text: str, strategy: str = 'auto', page_offsets: List[int] = None,
+                   pattern: str = None, min_length: int = None, source_file: str = None) -> List[Dict[str, Any]]:
+        """
+        对已提取的文本重新拆题（不重新解析原文件）
+        
+        Args:
+            text: 提取后的全文
+            strategy: auto（与首次拆题相同）、pattern（指定题号模式）、question_mark、choice、page（按页）
+            page_offsets: 每页在全文中的起始偏移，page 策略使用
+            pattern: strategy=pattern 时的题号模式名称，见 QUESTION_NUMBER_PATTERNS
+            min_length: 有效题目的最小长度，默认 15
+        """
+        if strategy not in SPLIT_STRATEGIES:
+            raise ValueError(f"不支持的拆分策略: {strategy}")
+        if strategy == 'pattern' and pattern not in QUESTION_NUMBER_PATTERNS:
+            raise ValueError(f"不支持的题号模式: {pattern}")
+        
+        if min_length is not None:
+            self.min_question_length = min_length
+        
+        if strategy == 'auto':
+            questions = self._smart_split_text(text)
+        elif strategy == 'page':
+            questions = self._split_by_page(text, page_offsets)
+        else:
+            cleaned_text = self._clean_text_preserve_format(text)
+            if strategy == 'pattern':
+                questions = self._regex_split_text(cleaned_text, [pattern])
+            elif strategy == 'question_mark':
+                questions = self._split_by_question_mark(cleaned_text)
+            else:
+                questions = self._split_by_choices(cleaned_text)
+        
+        self._assign_item_metadata(questions, source_file)
+        return questions
+    
+    def _assign_item_metadata(self, items: List[Dict[str, Any]], filename: str):
+        """为每个题目添加元数据"""
+        for i, item in enumerate(items):
+            item['seq'] = i + 1
+            item['id'] = str(uuid.uuid4())
+            item['source_file'] = filename
+    
     def _process_pdf(self, file_content: bytes, filename: str) -> Dict[str, Any]:
         """处理PDF文件"""
         if not self.has_pdf:
@@ -274,6 +329,7 @@ class DocumentProcessor:
             
             pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
             full_text = ""
+            page_offsets = []  # 每页在全文中的起始偏移，重新拆分时使用
             page_count = len(pdf_reader.pages)
             
             for i, page in enumerate(pdf_reader.pages):
@@ -284,9 +340,13 @@ class DocumentProcessor:
                         # 在页面之间添加适当的分隔
                         if i > 0:
                             full_text += '\n\n'
+                        page_offsets.append(len(full_text))
                         full_text += self._preserve_pdf_format(page_text)
+                    else:
+                        page_offsets.append(len(full_text))  # 空白页长度为0，保持页码对齐
                 except Exception as e:
                     logger.warning(f"第{i+1}页文本提取失败: {e}")
+                    page_offsets.append(len(full_text))
                     continue
             
             if not full_text.strip():
@@ -302,6 +362,8 @@ class DocumentProcessor:
                 'success': True,
                 'file_type': 'pdf',
                 'total_pages': page_count,
+                'text': full_text,
+                'page_offsets': page_offsets,
                 'items': questions,
                 'message': f'从PDF中提取了 {len(questions)} 道题目'
             }
@@ -358,6 +420,8 @@ class DocumentProcessor:
             return {
                 'success': True,
                 'file_type': 'docx',
+                'text': full_text,
+                'page_offsets': [0],
                 'items': questions,
                 'message': f'从DOCX中提取了 {len(questions)} 道题目'
             }
@@ -388,6 +452,8 @@ A. 1  B. 3  C. 6  D. 7
             return {
                 'success': True,
                 'file_type': 'image',
+                'text': mock_text,
+                'page_offsets': [0],
                 'items': questions,
                 'message': f'从图片中识别了 {len(questions)} 道题目（模拟）'
             }
@@ -425,19 +491,11 @@ A. 1  B. 3  C. 6  D. 7
         
         return regex_questions
     
-    def _regex_split_text(self, cleaned_text: str) -> List[Dict[str, Any]]:
-        """传统正则表达式拆分"""
+    def _regex_split_text(self, cleaned_text: str, pattern_names: List[str] = None) -> List[Dict[str, Any]]:
+        """传统正则表达式拆分（pattern_names 为空时尝试全部题号模式，取题目数最多的结果）"""
         questions = []
         
-        # 改进的题号匹配模式，保持原始格式
-        patterns = [
-            # 最精确的模式，保留空格和换行
-            r'(?:^|\n)\s*([1-9]\d*)[.\uff0e]\s*([^\n]+(?:\n(?!\s*\d+[.\uff0e]|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*\d+[.\uff0e]|\n\s*[一二三四五六七八九十]、|$)',
-            r'(?:^|\n)\s*([1-9]\d*)、\s*([^\n]+(?:\n(?!\s*\d+、|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*\d+、|\n\s*[一二三四五六七八九十]、|$)',
-            r'(?:^|\n)\s*第\s*([1-9]\d*)\s*题[\uff1a:\s]*([^\n]+(?:\n(?!\s*第\s*\d+\s*题|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*第\s*\d+\s*题|\n\s*[一二三四五六七八九十]、|$)',
-            r'(?:^|\n)\s*([1-9]\d*)\)\s*([^\n]+(?:\n(?!\s*\d+\)|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*\d+\)|\n\s*[一二三四五六七八九十]、|$)',
-            r'(?:^|\n)\s*\(([1-9]\d*)\)\s*([^\n]+(?:\n(?!\s*\(\d+\)|\s*[一二三四五六七八九十]、)[^\n]*)*?)(?=\n\s*\(\d+\)|\n\s*[一二三四五六七八九十]、|$)',
-        ]
+        patterns = [QUESTION_NUMBER_PATTERNS[name] for name in (pattern_names or QUESTION_NUMBER_PATTERNS)]
         
         best_questions = []
         best_pattern = None
@@ -657,7 +715,7 @@ A. 1  B. 3  C. 6  D. 7
         content = content.strip()
         
         # 长度检查
-        if len(content) < 15:  # 提高最小长度要求
+        if len(content) < self.min_question_length:  # 提高最小长度要求
             return False
         
         # 排除纯格式内容
@@ -694,27 +752,14 @@ A. 1  B. 3  C. 6  D. 7
         """备用拆分策略"""
         logger.info("使用备用拆分策略")
         
-        questions = []
-        
         # 策略1：基于问号分割
-        question_parts = re.split(r'[?？]\s*(?=\n|$)', text)
-        for i, part in enumerate(question_parts[:-1]):  # 最后一部分通常是不完整的
-            part = part.strip()
-            if self._is_valid_question(part + '？'):
-                questions.append(self._create_question_item(part + '？', i + 1))
-        
+        questions = self._split_by_question_mark(text)
         if questions:
             logger.info(f"问号分割策略找到 {len(questions)} 道题目")
             return questions
         
         # 策略2：基于选择题特征分割
-        choice_pattern = r'([^\n]*[A-D][.\uff0e][^\n]*(?:\n[^\n]*[A-D][.\uff0e][^\n]*)*(?:\n[^\n]*[A-D][.\uff0e][^\n]*)*(?:\n[^\n]*[A-D][.\uff0e][^\n]*)*)'
-        choice_matches = re.findall(choice_pattern, text, re.MULTILINE)
-        
-        for i, match in enumerate(choice_matches):
-            if self._is_valid_question(match):
-                questions.append(self._create_question_item(match.strip(), i + 1))
-        
+        questions = self._split_by_choices(text)
         if questions:
             logger.info(f"选择题特征分割找到 {len(questions)} 道题目")
             return questions
@@ -726,6 +771,37 @@ A. 1  B. 3  C. 6  D. 7
         
         return questions
     
+    def _split_by_question_mark(self, text: str) -> List[Dict[str, Any]]:
+        """基于问号分割"""
+        questions = []
+        question_parts = re.split(r'[?？]\s*(?=\n|$)', text)
+        for i, part in enumerate(question_parts[:-1]):  # 最后一部分通常是不完整的
+            part = part.strip()
+            if self._is_valid_question(part + '？'):
+                questions.append(self._create_question_item(part + '？', i + 1))
+        return questions
+    
+    def _split_by_choices(self, text: str) -> List[Dict[str, Any]]:
+        """基于选择题特征分割"""
+        questions = []
+        choice_pattern = r'([^\n]*[A-D][.\uff0e][^\n]*(?:\n[^\n]*[A-D][.\uff0e][^\n]*)*(?:\n[^\n]*[A-D][.\uff0e][^\n]*)*(?:\n[^\n]*[A-D][.\uff0e][^\n]*)*)'
+        choice_matches = re.findall(choice_pattern, text, re.MULTILINE)
+        
+        for i, match in enumerate(choice_matches):
+            if self._is_valid_question(match):
+                questions.append(self._create_question_item(match.strip(), i + 1))
+        return questions
+    
+    def _split_by_page(self, text: str, page_offsets: List[int]) -> List[Dict[str, Any]]:
+        """按页拆分：每页作为一道题目（整页为一道大题的试卷，如作文、阅读材料）"""
+        questions = []
+        boundaries = list(page_offsets or [0]) + [len(text)]
+        for i in range(len(boundaries) - 1):
+            page_text = self._clean_text_preserve_format(text[boundaries[i]:boundaries[i + 1]])
+            if len(page_text) >= self.min_question_length:
+                questions.append(self._create_question_item(page_text, i + 1))
+        return questions
+    
     def _create_question_item(self, question_text: str, seq: int) -> Dict[str, Any]:
         """创建题目项"""
         question_type = self._detect_question_type(question_text)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+拆题入库存储基准测试（SQLite）
+
+用法:
+    python benchmark_ingest.py search [--rows 20000]
+    python benchmark_ingest.py dedup [--stems 100000]
+    python benchmark_ingest.py storage [--rows 20000]
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+SCHEMA_FILE = ROOT_DIR / "schema_sqlite.sql"
+FTS_MIGRATION = ROOT_DIR / "migrations" / "add_ingest_items_fts_sqlite.sql"
+COMPACT_MIGRATION = ROOT_DIR / "migrations" / "compact_ingest_items_sqlite.sql"
+
+PHRASES = [
+    "下列哪个选项是正确的", "根据勾股定理", "直角三角形的两直角边", "一元二次方程", "判别式",
+    "计算下列各式的值", "阅读下面的文字", "完成下列句子", "请简述相关概念和原理", "函数的单调性",
+    "已知集合", "求实数的取值范围", "正方形的四条边都相等", "质数", "概率与统计",
+    "The past tense of", "物体的运动状态", "化学反应方程式", "细胞的结构", "文言文阅读",
+]
+KEYWORDS = ["勾股定理", "判别式", "单调性", "取值范围", "文言文", "化学反应"]
+
+
+def make_question_text(rng: random.Random) -> str:
+    """生成长度不一的题干（含少量超长题干，如阅读材料）"""
+    length = rng.choice([3, 5, 8, 12, 20, 40, 200])
+    parts = [rng.choice(PHRASES) for _ in range(length)]
+    text = "，".join(parts) + "？"
+    if rng.random() < 0.3:
+        text += "\nA. 选项一  B. 选项二  C. 选项三  D. 选项四"
+    return f"{rng.randint(1, 30)}. {text}"
+
+
+def create_database(path: str, use_fts: bool) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    schema = SCHEMA_FILE.read_text(encoding="utf-8")
+    # 基线：去掉 FTS 部分，换成旧迁移中的 B-tree 索引
+    schema = schema.split("-- 题干全文索引")[0] + schema.split("END;")[-1]
+    conn.executescript(schema)
+    if use_fts:
+        conn.executescript(FTS_MIGRATION.read_text(encoding="utf-8"))
+    else:
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ingest_items_question_text "
+            "ON ingest_items(question_text) WHERE question_text IS NOT NULL"
+        )
+    conn.execute(
+        "INSERT INTO ingest_sessions (name, created_by, file_uri, status) VALUES ('bench', 1, '/uploads/bench.pdf', 'awaiting_review')"
+    )
+    conn.commit()
+    return conn
+
+
+def bench_search(rows: int, queries: int):
+    rng = random.Random(42)
+    texts = [make_question_text(rng) for _ in range(rows)]
+    text_bytes = sum(len(t.encode("utf-8")) for t in texts)
+
+    print(f"=== question_text 索引基准: {rows} 行, 题干总计 {text_bytes / 1024 / 1024:.1f} MB ===")
+    for label, use_fts in (("B-tree（旧）", False), ("FTS5 trigram（新）", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            conn = create_database(db_path, use_fts)
+            size_before = os.path.getsize(db_path)
+
+            start = time.perf_counter()
+            for i in range(0, rows, 500):
+                conn.executemany(
+                    "INSERT INTO ingest_items (session_id, seq, question_text, candidate_type, review_status) "
+                    "VALUES (1, ?, ?, 'single', 'pending')",
+                    [(i + j + 1, t) for j, t in enumerate(texts[i:i + 500])]
+                )
+                conn.commit()
+            insert_seconds = time.perf_counter() - start
+            written = os.path.getsize(db_path) - size_before
+
+            latencies = []
+            hits = 0
+            for q in range(queries):
+                keyword = KEYWORDS[q % len(KEYWORDS)]
+                start = time.perf_counter()
+                if use_fts:
+                    result = conn.execute(
+                        "SELECT ii.id FROM ingest_items_fts f JOIN ingest_items ii ON ii.id = f.rowid "
+                        "WHERE ingest_items_fts MATCH ? LIMIT 50",
+                        (f'"{keyword}"',)
+                    ).fetchall()
+                else:
+                    result = conn.execute(
+                        "SELECT id FROM ingest_items WHERE question_text LIKE ? LIMIT 50",
+                        (f"%{keyword}%",)
+                    ).fetchall()
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits += len(result)
+
+            # 使用罕见关键词测量最坏情况（需要扫描全部数据才能确定无结果）
+            start = time.perf_counter()
+            if use_fts:
+                conn.execute("SELECT rowid FROM ingest_items_fts WHERE ingest_items_fts MATCH '\"不存在的关键词\"'").fetchall()
+            else:
+                conn.execute("SELECT id FROM ingest_items WHERE question_text LIKE '%不存在的关键词%'").fetchall()
+            miss_ms = (time.perf_counter() - start) * 1000
+            conn.close()
+
+            latencies.sort()
+            print(f"\n[{label}]")
+            print(f"  写入: {rows / insert_seconds:,.0f} 行/秒, 磁盘写入 {written / 1024 / 1024:.1f} MB "
+                  f"(写放大 {written / text_bytes:.2f}x 题干字节)")
+            print(f"  命中查询: p50 {latencies[len(latencies) // 2]:.2f} ms, "
+                  f"p95 {latencies[int(len(latencies) * 0.95)]:.2f} ms, 平均命中 {hits / queries:.0f} 行")
+            print(f"  未命中查询: {miss_ms:.2f} ms")
+
+
+CJK_CHARS = "天地玄黄宇宙洪荒日月盈昃辰宿列张寒来暑往秋收冬藏闰余成岁律吕调阳云腾致雨露结为霜金生丽水玉出昆冈"
+
+
+def make_stem(rng: random.Random, i: int) -> str:
+    """模板化短语 + 具体内容片段，模拟题库中句式相近但内容不同的题干"""
+    parts = [rng.choice(PHRASES) for _ in range(rng.randint(2, 4))]
+    detail = "".join(rng.choice(CJK_CHARS) for _ in range(rng.randint(10, 30)))
+    return f"{i}. " + "，".join(parts) + f"：{detail}，其中 a={rng.randint(1, 999)}，b={rng.randint(1, 999)}？"
+
+
+def bench_dedup(stems: int, queries: int):
+    from app.services.dedup_index import MinHashLSH
+
+    rng = random.Random(7)
+    corpus = [(i + 1, make_stem(rng, i + 1)) for i in range(stems)]
+    print(f"=== MinHash LSH 去重索引基准: {stems:,} 道题干 ===")
+
+    index = MinHashLSH()
+    start = time.perf_counter()
+    index.build(corpus)
+    build_seconds = time.perf_counter() - start
+    memory = index._signatures[:index._size].nbytes + sum(k.nbytes + r.nbytes for k, r in zip(index._band_keys, index._band_rows))
+    print(f"构建: {build_seconds:.1f}s ({stems / build_seconds:,.0f} 题/秒), 数组内存 {memory / 1024 / 1024:.0f} MB")
+
+    def run(label, texts):
+        latencies, found = [], 0
+        for text in texts:
+            start = time.perf_counter()
+            match = index.query(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found += match is not None
+        latencies.sort()
+        print(f"{label}: p50 {latencies[len(latencies) // 2]:.3f} ms, p99 {latencies[int(len(latencies) * 0.99)]:.3f} ms, "
+              f"命中 {found}/{len(texts)}")
+
+    samples = rng.sample(corpus, queries)
+    # 近似重复：去掉题号、改一处标点并追加后缀
+    near_duplicates = [
+        text.replace("，", ",", 1).split(". ", 1)[1] + "（改编）" for _, text in samples
+    ]
+    run("近似重复查询", near_duplicates)
+    run("新题查询", ["阅读材料：" + "".join(rng.choice("天地玄黄宇宙洪荒日月盈昃辰宿列张") for _ in range(60)) for _ in range(queries)])
+
+    start = time.perf_counter()
+    for i in range(queries):
+        index.add(stems + i + 1, make_stem(rng, stems + i + 1))
+    print(f"增量添加: {(time.perf_counter() - start) * 1000 / queries:.3f} ms/题（无需重建）")
+
+
+LEGACY_KPS = [
+    {'subject': '数学', 'module': '代数', 'point': '方程'},
+    {'subject': '数学', 'module': '几何', 'point': '三角形'},
+    {'subject': '语文', 'module': '阅读理解', 'point': '现代文'},
+    {'subject': '英语', 'module': '语法', 'point': '时态'},
+    {'subject': '通用', 'module': '基础', 'point': '综合'},
+]
+
+
+def bench_storage(rows: int, page_size: int):
+    """旧格式（题干双份 + 完整知识点字典）与紧凑格式的存储和列表吞吐对比"""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+    from app.services.ingest_batch import expand_candidate_kps
+
+    rng = random.Random(3)
+    sessions = max(1, rows // page_size)
+    print(f"=== ingest_items 存储基准: {rows:,} 项, {sessions} 个会话 ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript(SCHEMA_FILE.read_text(encoding="utf-8"))
+        conn.executemany(
+            "INSERT INTO ingest_sessions (name, created_by, file_uri, status) VALUES (?, 1, '/uploads/bench.pdf', 'awaiting_review')",
+            [(f"bench-{i}",) for i in range(sessions)]
+        )
+        legacy_rows = []
+        for i in range(rows):
+            question_text = make_question_text(rng)
+            kps = [dict(kp, confidence=0.8) for kp in rng.sample(LEGACY_KPS, rng.randint(1, 2))]
+            ocr_result = {'text': question_text, 'type': 'single', 'confidence': 0.85}
+            legacy_rows.append((i % sessions + 1, i // sessions + 1, json.dumps(ocr_result), question_text,
+                                json.dumps(kps), 0.85))
+        conn.executemany(
+            "INSERT INTO ingest_items (session_id, seq, ocr_json, question_text, candidate_type, candidate_kps_json, "
+            "confidence, review_status) VALUES (?, ?, ?, ?, 'single', ?, ?, 'pending')",
+            legacy_rows
+        )
+        conn.commit()
+        conn.close()
+
+        db = sessionmaker(bind=create_engine(f"sqlite:///{db_path}"))()
+
+        def measure(label):
+            db.execute(text("VACUUM"))
+            payload = db.execute(text(
+                "SELECT SUM(LENGTH(COALESCE(ocr_json, '')) + LENGTH(CAST(question_text AS BLOB)) "
+                "+ LENGTH(COALESCE(candidate_kps_json, ''))) FROM ingest_items"
+            )).scalar()
+
+            # 与 /api/ingest/sessions/{id}/items 相同的查询、知识点展开和 JSON 序列化
+            start = time.perf_counter()
+            response_bytes = 0
+            for session_id in range(1, sessions + 1):
+                result = db.execute(
+                    text("""
+                        SELECT id, session_id, seq, crop_uri, ocr_json, question_text,
+                               candidate_type, candidate_kps_json, confidence, review_status
+                        FROM ingest_items WHERE session_id = :session_id ORDER BY seq
+                    """),
+                    {"session_id": session_id}
+                ).fetchall()
+                candidate_kps = expand_candidate_kps(db, [row[7] for row in result])
+                items = [{
+                    "id": row[0], "session_id": row[1], "seq": row[2], "crop_uri": row[3],
+                    "ocr_json": row[4], "question_text": row[5], "candidate_type": row[6],
+                    "candidate_kps_json": row[7], "candidate_kps": kps,
+                    "confidence": row[8], "review_status": row[9]
+                } for row, kps in zip(result, candidate_kps)]
+                response_bytes += len(json.dumps(items, ensure_ascii=False).encode("utf-8"))
+            seconds = time.perf_counter() - start
+
+            print(f"\n[{label}]")
+            print(f"  数据库文件: {os.path.getsize(db_path) / rows:,.0f} 字节/项, "
+                  f"ocr_json+题干+知识点列: {payload / rows:,.0f} 字节/项")
+            print(f"  列表吞吐: {rows / seconds:,.0f} 项/秒 (每页 {page_size} 项), 响应 {response_bytes / rows:,.0f} 字节/项")
+
+        measure("旧格式")
+        start = time.perf_counter()
+        db.connection().connection.executescript(COMPACT_MIGRATION.read_text(encoding="utf-8"))
+        print(f"\n回填迁移耗时: {time.perf_counter() - start:.2f}s")
+        measure("紧凑格式")
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="拆题入库存储基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    search_parser = subparsers.add_parser("search", help="question_text 索引：写放大与子串搜索延迟")
+    search_parser.add_argument("--rows", type=int, default=20000)
+    search_parser.add_argument("--queries", type=int, default=200)
+
+    dedup_parser = subparsers.add_parser("dedup", help="MinHash LSH 去重索引：构建、查询、增量更新")
+    dedup_parser.add_argument("--stems", type=int, default=100000)
+    dedup_parser.add_argument("--queries", type=int, default=1000)
+
+    storage_parser = subparsers.add_parser("storage", help="ingest_items 紧凑存储：每项字节数与列表吞吐")
+    storage_parser.add_argument("--rows", type=int, default=20000)
+    storage_parser.add_argument("--page-size", type=int, default=50)
+
+    args = parser.parse_args()
+    if args.command == "search":
+        bench_search(args.rows, args.queries)
+    elif args.command == "dedup":
+        bench_dedup(args.stems, args.queries)
+    elif args.command == "storage":
+        bench_storage(args.rows, args.page_size)
+
+
+if __name__ == "__main__":
+    main()
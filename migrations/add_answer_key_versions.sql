@@ -0,0 +1,56 @@
+-- 数据库迁移：新增 answer_key_versions 表及触发器，供判分 Worker 的标准答案缓存失效使用
+-- paper_questions 增删改、questions 的 answer_json/type 修改时递增对应试卷的版本号，
+-- 并发送 NOTIFY answer_key_changed（payload 为 paper_id）
+-- 不对 papers 建外键：删除试卷时级联删除 paper_questions 仍会触发版本递增
+
+CREATE TABLE IF NOT EXISTS answer_key_versions (
+  paper_id BIGINT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 1,
+  updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE answer_key_versions IS '试卷标准答案版本号（判分缓存失效用）';
+
+CREATE OR REPLACE FUNCTION bump_answer_key_version(p_paper_id BIGINT)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO answer_key_versions (paper_id) VALUES (p_paper_id)
+    ON CONFLICT (paper_id) DO UPDATE
+    SET version = answer_key_versions.version + 1, updated_at = NOW();
+    PERFORM pg_notify('answer_key_changed', p_paper_id::text);
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION paper_questions_answer_key_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_answer_key_version(OLD.paper_id);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.paper_id IS DISTINCT FROM OLD.paper_id) THEN
+        PERFORM bump_answer_key_version(NEW.paper_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION questions_answer_key_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM bump_answer_key_version(pq.paper_id)
+    FROM (SELECT DISTINCT paper_id FROM paper_questions WHERE question_id = NEW.id) pq;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS paper_questions_answer_key_version ON paper_questions;
+CREATE TRIGGER paper_questions_answer_key_version
+    AFTER INSERT OR UPDATE OR DELETE ON paper_questions
+    FOR EACH ROW EXECUTE FUNCTION paper_questions_answer_key_changed();
+
+DROP TRIGGER IF EXISTS questions_answer_key_version ON questions;
+CREATE TRIGGER questions_answer_key_version
+    AFTER UPDATE OF answer_json, type ON questions
+    FOR EACH ROW
+    WHEN (OLD.answer_json IS DISTINCT FROM NEW.answer_json OR OLD.type IS DISTINCT FROM NEW.type)
+    EXECUTE FUNCTION questions_answer_key_changed();
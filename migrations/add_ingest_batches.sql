@@ -0,0 +1,27 @@
+-- 数据库迁移：新增 ingest_batches 表，支持 zip / 多文件批量拆题
+-- 每个批次下的每个文档对应一条 ingest_sessions 记录
+
+CREATE TABLE IF NOT EXISTS ingest_batches (
+  id BIGSERIAL PRIMARY KEY,
+  name VARCHAR(200),
+  created_by BIGINT REFERENCES users(id),
+  status VARCHAR(30) NOT NULL DEFAULT 'uploaded' CHECK (status IN ('uploaded','processing','completed','partially_failed','failed')),
+  total_files INT NOT NULL DEFAULT 0,
+  concurrency INT,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingest_batches_created_by ON ingest_batches(created_by);
+
+-- 会话关联到所属批次（单文件上传的会话 batch_id 为空）
+ALTER TABLE ingest_sessions ADD COLUMN IF NOT EXISTS batch_id BIGINT REFERENCES ingest_batches(id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS idx_ingest_sessions_batch ON ingest_sessions(batch_id);
+
+-- 批次中处理失败的文档标记为 failed
+ALTER TABLE ingest_sessions DROP CONSTRAINT IF EXISTS ingest_sessions_status_check;
+ALTER TABLE ingest_sessions ADD CONSTRAINT ingest_sessions_status_check
+  CHECK (status IN ('uploaded','parsing','awaiting_review','partially_approved','completed','failed'));
+
+COMMENT ON COLUMN ingest_sessions.batch_id IS '所属批量拆题批次';
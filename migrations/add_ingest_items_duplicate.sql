@@ -0,0 +1,10 @@
+-- 数据库迁移：为 ingest_items 添加近似重复标注字段
+-- 拆题时由 MinHash LSH 索引标注题库中最相似的已有题目，批量审核时据此跳过或合并重复题
+
+ALTER TABLE ingest_items ADD COLUMN IF NOT EXISTS duplicate_question_id BIGINT REFERENCES questions(id);
+ALTER TABLE ingest_items ADD COLUMN IF NOT EXISTS duplicate_similarity NUMERIC(5,4);
+
+CREATE INDEX IF NOT EXISTS idx_ingest_items_duplicate ON ingest_items(duplicate_question_id) WHERE duplicate_question_id IS NOT NULL;
+
+COMMENT ON COLUMN ingest_items.duplicate_question_id IS '题库中最相似的已有题目';
+COMMENT ON COLUMN ingest_items.duplicate_similarity IS '与该题目的估计 Jaccard 相似度';
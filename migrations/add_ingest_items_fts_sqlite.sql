@@ -0,0 +1,28 @@
+-- 数据库迁移（SQLite）：为 ingest_items.question_text 建立 FTS5 全文索引
+-- 使用 trigram 分词器，中文题干无需分词即可做子串搜索（需要 SQLite 3.34+）
+-- 采用外部内容表（content='ingest_items'），文本只存一份，由触发器保持同步
+
+DROP INDEX IF EXISTS idx_ingest_items_question_text;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS ingest_items_fts USING fts5(
+  question_text,
+  content='ingest_items',
+  content_rowid='id',
+  tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS ingest_items_fts_insert AFTER INSERT ON ingest_items BEGIN
+  INSERT INTO ingest_items_fts(rowid, question_text) VALUES (new.id, new.question_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ingest_items_fts_delete AFTER DELETE ON ingest_items BEGIN
+  INSERT INTO ingest_items_fts(ingest_items_fts, rowid, question_text) VALUES ('delete', old.id, old.question_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ingest_items_fts_update AFTER UPDATE OF question_text ON ingest_items BEGIN
+  INSERT INTO ingest_items_fts(ingest_items_fts, rowid, question_text) VALUES ('delete', old.id, old.question_text);
+  INSERT INTO ingest_items_fts(rowid, question_text) VALUES (new.id, new.question_text);
+END;
+
+-- 为已有数据建立索引
+INSERT INTO ingest_items_fts(ingest_items_fts) VALUES ('rebuild');
@@ -0,0 +1,14 @@
+-- 数据库迁移：新增 ingest_session_texts 表，保存拆题会话的提取全文
+-- 全文经 zlib 压缩后存储，page_offsets 为每页在全文中的起始偏移；
+-- 调整拆分策略时基于该表重新拆题，无需重新上传和解析原文件
+
+CREATE TABLE IF NOT EXISTS ingest_session_texts (
+  session_id BIGINT PRIMARY KEY REFERENCES ingest_sessions(id) ON DELETE CASCADE,
+  text_zlib BYTEA NOT NULL,
+  page_offsets JSONB,
+  char_count INT,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE ingest_session_texts IS '拆题会话的提取全文（zlib 压缩）';
+COMMENT ON COLUMN ingest_session_texts.page_offsets IS '每页在全文中的起始字符偏移';
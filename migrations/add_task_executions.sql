@@ -0,0 +1,30 @@
+-- 数据库迁移：新增 task_executions / task_callbacks 表，Worker 按 task_id 幂等执行任务
+-- broker 重连、延迟重试和死信回放造成的重复投递：结果已写入的任务直接确认，不再重新识别、判分或拆题；
+-- OCR/OMR 回调按 task_id 去重，同一任务的答案只写入一次
+
+CREATE TABLE IF NOT EXISTS task_executions (
+  task_id VARCHAR(64) PRIMARY KEY,
+  task_type VARCHAR(30) NOT NULL,
+  status VARCHAR(20) NOT NULL CHECK (status IN ('running','completed','failed')),
+  attempts INT NOT NULL DEFAULT 1,
+  duplicate_deliveries INT NOT NULL DEFAULT 0,
+  started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  lease_until TIMESTAMP NOT NULL,
+  finished_at TIMESTAMP,
+  duration_ms INT,
+  result_json JSONB,
+  expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_task_executions_expires ON task_executions(expires_at);
+
+CREATE TABLE IF NOT EXISTS task_callbacks (
+  task_id VARCHAR(64) PRIMARY KEY,
+  sheet_id BIGINT REFERENCES answer_sheets(id) ON DELETE CASCADE,
+  received_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE task_executions IS 'Worker 任务幂等记录（按 task_id 认领，结果与完成状态同一事务写入）';
+COMMENT ON COLUMN task_executions.lease_until IS '认领有效期（任务的 timeout_seconds），过期后其他投递可重新认领';
+COMMENT ON COLUMN task_executions.duplicate_deliveries IS '结果写入后又收到的重复投递次数';
+COMMENT ON TABLE task_callbacks IS 'OCR/OMR 回调回执，重复回调不再写入答案';
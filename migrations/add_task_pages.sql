@@ -0,0 +1,12 @@
+-- 数据库迁移：新增 task_pages 表，多页文档（PDF、多页 TIFF）逐页保存处理结果
+-- 任务中途失败或超时后重试时，已保存的页不再重新解码和识别；任务记录清理时一并删除
+
+CREATE TABLE IF NOT EXISTS task_pages (
+  task_id VARCHAR(64) NOT NULL REFERENCES task_executions(task_id) ON DELETE CASCADE,
+  page_no INT NOT NULL,
+  result_json JSONB,
+  completed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (task_id, page_no)
+);
+
+COMMENT ON TABLE task_pages IS '多页文档任务的逐页结果（与该页的识别/拆题结果同一事务写入）';
@@ -0,0 +1,75 @@
+-- 数据库迁移：精简 ingest_items 的存储（回填已有数据）
+-- 1) 题干只存一份：question_text（旧行中只存在于 ocr_json.text / ocr_json.stem 的文本回填过来）
+-- 2) candidate_kps_json 由完整的知识点字典改为 [[kp_id, confidence], ...]，详情从 knowledge_points 关联；
+--    题库中没有的知识点保留为 {subject, module, point, confidence}，审核通过时才创建
+-- 3) ocr_json 只保留 worker 识别结果中的位置框、选项等结构化信息，纯文本拆题的 ocr_json 置空
+-- 执行后建议运行 VACUUM FULL ingest_items 回收空间
+
+BEGIN;
+
+-- 1. 回填题干（worker 结果的选项拼接到题干之后）
+UPDATE ingest_items
+SET question_text = COALESCE(
+  NULLIF(ocr_json->>'text', ''),
+  (ocr_json->>'stem') || COALESCE((
+    SELECT string_agg(E'\n' || o.key || '. ' || o.value, '' ORDER BY o.key)
+    FROM jsonb_each_text(CASE WHEN jsonb_typeof(ocr_json->'options') = 'object' THEN ocr_json->'options' END) o
+  ), '')
+)
+WHERE (question_text IS NULL OR question_text = '') AND ocr_json IS NOT NULL;
+
+-- 2. 展开旧格式的候选知识点
+CREATE TEMP TABLE legacy_kps AS
+SELECT ii.id AS item_id,
+       e.ord,
+       (e.kp->>'id')::BIGINT AS kp_id,
+       CASE WHEN jsonb_typeof(e.kp) = 'string' THEN '通用' ELSE COALESCE(e.kp->>'subject', '通用') END AS subject,
+       CASE WHEN jsonb_typeof(e.kp) = 'string' THEN NULL ELSE e.kp->>'module' END AS module,
+       CASE WHEN jsonb_typeof(e.kp) = 'string' THEN e.kp #>> '{}' ELSE e.kp->>'point' END AS point,
+       ROUND(COALESCE((e.kp->>'confidence')::NUMERIC,
+                      CASE WHEN jsonb_typeof(e.kp) = 'string' THEN 0.8 ELSE 0.5 END), 2) AS confidence
+FROM ingest_items ii
+CROSS JOIN LATERAL jsonb_array_elements(ii.candidate_kps_json) WITH ORDINALITY AS e(kp, ord)
+WHERE jsonb_typeof(ii.candidate_kps_json) = 'array'
+  AND jsonb_typeof(e.kp) IN ('object', 'string');
+
+CREATE INDEX legacy_kps_item ON legacy_kps(item_id, ord);
+
+UPDATE legacy_kps l
+SET kp_id = (
+  SELECT MIN(k.id) FROM knowledge_points k
+  WHERE k.subject = l.subject
+    AND k.module IS NOT DISTINCT FROM l.module
+    AND k.point IS NOT DISTINCT FROM l.point
+)
+WHERE l.kp_id IS NULL;
+
+UPDATE ingest_items ii
+SET candidate_kps_json = agg.pairs
+FROM (
+  SELECT item_id,
+         jsonb_agg(CASE WHEN kp_id IS NULL
+                        THEN jsonb_strip_nulls(jsonb_build_object('subject', subject, 'module', module,
+                                                                  'point', point, 'confidence', confidence))
+                        ELSE jsonb_build_array(kp_id, confidence) END
+                   ORDER BY ord) AS pairs
+  FROM legacy_kps
+  GROUP BY item_id
+) agg
+WHERE ii.id = agg.item_id;
+
+DROP TABLE legacy_kps;
+
+-- 3. ocr_json 只保留位置框等信息
+UPDATE ingest_items SET ocr_json = NULL
+WHERE ocr_json IS NOT NULL AND NOT (ocr_json ? 'bbox');
+
+-- 去掉的键与写入路径一致（backend/app/services/ingest_batch.py 的 _REDUNDANT_OCR_KEYS）；
+-- options 保留：第 1 步只在 question_text 为空时把选项拼进题干，已有题干（如审核时编辑过）的行选项只在这里
+UPDATE ingest_items SET ocr_json = ocr_json - 'text' - 'stem' - 'type' - 'confidence'
+WHERE ocr_json ? 'bbox';
+
+COMMENT ON COLUMN ingest_items.ocr_json IS '仅 worker 识别结果：位置框等结构化信息（题干见 question_text）';
+COMMENT ON COLUMN ingest_items.candidate_kps_json IS '候选知识点 [[kp_id, confidence], ...]，未匹配的为 {subject, module, point, confidence}';
+
+COMMIT;
@@ -0,0 +1,68 @@
+-- 数据库迁移（SQLite）：精简 ingest_items 的存储（回填已有数据）
+-- 与 compact_ingest_items.sql 相同的转换，使用 SQLite JSON1 函数实现
+-- 执行后建议运行 VACUUM 回收空间
+
+BEGIN;
+
+-- 1. 回填题干（worker 结果的选项拼接到题干之后）
+UPDATE ingest_items
+SET question_text = COALESCE(
+  NULLIF(json_extract(ocr_json, '$.text'), ''),
+  json_extract(ocr_json, '$.stem') || COALESCE((
+    SELECT group_concat(char(10) || o.key || '. ' || o.value, '')
+    FROM (SELECT key, value FROM json_each(ingest_items.ocr_json, '$.options') ORDER BY key) o
+  ), '')
+)
+WHERE (question_text IS NULL OR question_text = '')
+  AND json_valid(ocr_json) AND json_type(ocr_json) = 'object';
+
+-- 2. 展开旧格式的候选知识点
+CREATE TEMP TABLE legacy_kps AS
+SELECT ii.id AS item_id,
+       e.key AS ord,
+       CASE WHEN e.type = 'object' THEN json_extract(e.value, '$.id') END AS kp_id,
+       CASE WHEN e.type = 'text' THEN '通用' ELSE COALESCE(json_extract(e.value, '$.subject'), '通用') END AS subject,
+       CASE WHEN e.type = 'text' THEN NULL ELSE json_extract(e.value, '$.module') END AS module,
+       CASE WHEN e.type = 'text' THEN e.value ELSE json_extract(e.value, '$.point') END AS point,
+       ROUND(COALESCE(CASE WHEN e.type = 'object' THEN json_extract(e.value, '$.confidence') END,
+                      CASE WHEN e.type = 'text' THEN 0.8 ELSE 0.5 END), 2) AS confidence
+FROM ingest_items ii, json_each(ii.candidate_kps_json) e
+WHERE json_valid(ii.candidate_kps_json)
+  AND json_type(ii.candidate_kps_json) = 'array'
+  AND e.type IN ('object', 'text');
+
+CREATE INDEX legacy_kps_item ON legacy_kps(item_id, ord);
+
+-- 题库中没有的知识点保留为 {subject, module, point, confidence}，审核通过时才创建
+UPDATE legacy_kps
+SET kp_id = (
+  SELECT MIN(k.id) FROM knowledge_points k
+  WHERE k.subject = legacy_kps.subject AND k.module IS legacy_kps.module AND k.point IS legacy_kps.point
+)
+WHERE kp_id IS NULL;
+
+UPDATE ingest_items
+SET candidate_kps_json = (
+  SELECT json_group_array(CASE WHEN kp_id IS NULL
+                              -- json_patch 去掉值为 null 的键
+                              THEN json_patch('{}', json_object('subject', subject, 'module', module,
+                                                                'point', point, 'confidence', confidence))
+                              ELSE json_array(kp_id, confidence) END)
+  FROM (SELECT kp_id, subject, module, point, confidence FROM legacy_kps WHERE item_id = ingest_items.id ORDER BY ord)
+)
+WHERE id IN (SELECT item_id FROM legacy_kps);
+
+DROP TABLE legacy_kps;
+
+-- 3. ocr_json 只保留位置框等信息
+UPDATE ingest_items SET ocr_json = NULL
+WHERE ocr_json IS NOT NULL
+  AND (NOT json_valid(ocr_json) OR json_type(ocr_json, '$.bbox') IS NULL);
+
+-- 去掉的键与写入路径一致（backend/app/services/ingest_batch.py 的 _REDUNDANT_OCR_KEYS）；
+-- options 保留：第 1 步只在 question_text 为空时把选项拼进题干，已有题干（如审核时编辑过）的行选项只在这里
+UPDATE ingest_items
+SET ocr_json = json_remove(ocr_json, '$.text', '$.stem', '$.type', '$.confidence')
+WHERE ocr_json IS NOT NULL;
+
+COMMIT;
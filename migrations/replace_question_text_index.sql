@@ -0,0 +1,12 @@
+-- 数据库迁移：将 ingest_items.question_text 上的 B-tree 索引替换为 pg_trgm 三元组索引
+-- B-tree 对超长文本行会写入失败（超过索引行大小上限），且对审核时常用的子串搜索（ILIKE '%关键词%'）无效
+-- GIN 三元组索引支持任意位置的子串匹配，中文题干同样适用
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 删除旧的 B-tree 索引（由 add_question_text_field.sql 创建）
+DROP INDEX IF EXISTS idx_ingest_items_question_text;
+
+-- 创建三元组索引，供 /api/ingest/items/search 使用
+CREATE INDEX IF NOT EXISTS idx_ingest_items_question_text_trgm
+  ON ingest_items USING gin (question_text gin_trgm_ops);
@@ -189,36 +189,66 @@ CREATE INDEX IF NOT EXISTS idx_wrong_book_student ON wrong_book(student_id);
 CREATE INDEX IF NOT EXISTS idx_wrong_book_question ON wrong_book(question_id);
 CREATE INDEX IF NOT EXISTS idx_wrong_book_last_result ON wrong_book(last_result);
 
+-- Ingest Batches (zip / multi-file upload, one session per document)
+CREATE TABLE IF NOT EXISTS ingest_batches (
+  id BIGSERIAL PRIMARY KEY,
+  name VARCHAR(200),
+  created_by BIGINT REFERENCES users(id),
+  status VARCHAR(30) NOT NULL DEFAULT 'uploaded' CHECK (status IN ('uploaded','processing','completed','partially_failed','failed')),
+  total_files INT NOT NULL DEFAULT 0,
+  concurrency INT,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingest_batches_created_by ON ingest_batches(created_by);
+
 -- Ingest Sessions (Reverse Paper → Question Bank)
 CREATE TABLE IF NOT EXISTS ingest_sessions (
   id BIGSERIAL PRIMARY KEY,
   uploader_id BIGINT REFERENCES users(id),
   file_uri TEXT NOT NULL,
-  status VARCHAR(30) NOT NULL DEFAULT 'uploaded' CHECK (status IN ('uploaded','parsing','awaiting_review','partially_approved','completed')),
+  status VARCHAR(30) NOT NULL DEFAULT 'uploaded' CHECK (status IN ('uploaded','parsing','awaiting_review','partially_approved','completed','failed')),
+  batch_id BIGINT REFERENCES ingest_batches(id) ON DELETE CASCADE,
   created_at TIMESTAMP NOT NULL DEFAULT NOW()
 );
 
 CREATE INDEX IF NOT EXISTS idx_ingest_sessions_uploader ON ingest_sessions(uploader_id);
 CREATE INDEX IF NOT EXISTS idx_ingest_sessions_status ON ingest_sessions(status);
 CREATE INDEX IF NOT EXISTS idx_ingest_sessions_created_at ON ingest_sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_ingest_sessions_batch ON ingest_sessions(batch_id);
 
 CREATE TABLE IF NOT EXISTS ingest_items (
   id BIGSERIAL PRIMARY KEY,
   session_id BIGINT REFERENCES ingest_sessions(id) ON DELETE CASCADE,
   seq INT,
   crop_uri TEXT,
-  ocr_json JSONB,
+  ocr_json JSONB,  -- 仅 worker 识别结果的位置框等结构化信息，题干只存 question_text
   question_text TEXT,  -- 新增：保存格式化后的题目文本
   candidate_type VARCHAR(20),
-  candidate_kps_json JSONB,
+  candidate_kps_json JSONB,  -- [[kp_id, confidence], ...]，未匹配的知识点为 {subject, module, point, confidence}
   confidence NUMERIC(5,2),
   review_status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (review_status IN ('pending','approved','rejected','edited')),
-  approved_question_id BIGINT REFERENCES questions(id)
+  approved_question_id BIGINT REFERENCES questions(id),
+  duplicate_question_id BIGINT REFERENCES questions(id),  -- 题库中最相似的已有题目（MinHash LSH）
+  duplicate_similarity NUMERIC(5,4)
 );
 
 CREATE INDEX IF NOT EXISTS idx_ingest_items_session ON ingest_items(session_id);
 CREATE INDEX IF NOT EXISTS idx_ingest_items_review_status ON ingest_items(review_status);
 CREATE INDEX IF NOT EXISTS idx_ingest_items_confidence ON ingest_items(confidence) WHERE confidence IS NOT NULL;
+-- 题干子串搜索使用三元组索引（B-tree 对长文本无效且会写入失败）
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_ingest_items_question_text_trgm ON ingest_items USING gin (question_text gin_trgm_ops);
+
+-- 拆题会话提取全文（zlib 压缩，用于重新拆分）
+CREATE TABLE IF NOT EXISTS ingest_session_texts (
+  session_id BIGINT PRIMARY KEY REFERENCES ingest_sessions(id) ON DELETE CASCADE,
+  text_zlib BYTEA NOT NULL,
+  page_offsets JSONB,  -- 每页在全文中的起始偏移
+  char_count INT,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
 
 -- Additional indexes for performance optimization
 CREATE INDEX IF NOT EXISTS idx_answer_sheets_student_paper ON answer_sheets(student_id, paper_id);
@@ -251,6 +281,92 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_student_stats_updated_at BEFORE UPDATE ON student_stats
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
+-- 标准答案版本号：paper_questions / questions.answer_json 变化时递增并 NOTIFY answer_key_changed，
+-- 判分 Worker 据此淘汰缓存的标准答案（不对 papers 建外键，删除试卷的级联删除也会触发）
+CREATE TABLE IF NOT EXISTS answer_key_versions (
+  paper_id BIGINT PRIMARY KEY,
+  version BIGINT NOT NULL DEFAULT 1,
+  updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION bump_answer_key_version(p_paper_id BIGINT)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO answer_key_versions (paper_id) VALUES (p_paper_id)
+    ON CONFLICT (paper_id) DO UPDATE
+    SET version = answer_key_versions.version + 1, updated_at = NOW();
+    PERFORM pg_notify('answer_key_changed', p_paper_id::text);
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION paper_questions_answer_key_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_answer_key_version(OLD.paper_id);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.paper_id IS DISTINCT FROM OLD.paper_id) THEN
+        PERFORM bump_answer_key_version(NEW.paper_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION questions_answer_key_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM bump_answer_key_version(pq.paper_id)
+    FROM (SELECT DISTINCT paper_id FROM paper_questions WHERE question_id = NEW.id) pq;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS paper_questions_answer_key_version ON paper_questions;
+CREATE TRIGGER paper_questions_answer_key_version
+    AFTER INSERT OR UPDATE OR DELETE ON paper_questions
+    FOR EACH ROW EXECUTE FUNCTION paper_questions_answer_key_changed();
+
+DROP TRIGGER IF EXISTS questions_answer_key_version ON questions;
+CREATE TRIGGER questions_answer_key_version
+    AFTER UPDATE OF answer_json, type ON questions
+    FOR EACH ROW
+    WHEN (OLD.answer_json IS DISTINCT FROM NEW.answer_json OR OLD.type IS DISTINCT FROM NEW.type)
+    EXECUTE FUNCTION questions_answer_key_changed();
+
+-- 任务幂等记录：Worker 按 task_id 认领任务，结果与 completed 状态在同一事务中写入，
+-- 重复投递的任务直接确认、不再重新计算；过期记录（expires_at）由 Worker 定期清理
+CREATE TABLE IF NOT EXISTS task_executions (
+  task_id VARCHAR(64) PRIMARY KEY,
+  task_type VARCHAR(30) NOT NULL,
+  status VARCHAR(20) NOT NULL CHECK (status IN ('running','completed','failed')),
+  attempts INT NOT NULL DEFAULT 1,
+  duplicate_deliveries INT NOT NULL DEFAULT 0,
+  started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  lease_until TIMESTAMP NOT NULL,
+  finished_at TIMESTAMP,
+  duration_ms INT,
+  result_json JSONB,
+  expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_task_executions_expires ON task_executions(expires_at);
+
+-- OCR/OMR 回调回执：同一 task_id 的回调只写入一次答案
+CREATE TABLE IF NOT EXISTS task_callbacks (
+  task_id VARCHAR(64) PRIMARY KEY,
+  sheet_id BIGINT REFERENCES answer_sheets(id) ON DELETE CASCADE,
+  received_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- 多页文档任务的逐页结果：重试时已保存的页不再重新处理
+CREATE TABLE IF NOT EXISTS task_pages (
+  task_id VARCHAR(64) NOT NULL REFERENCES task_executions(task_id) ON DELETE CASCADE,
+  page_no INT NOT NULL,
+  result_json JSONB,
+  completed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (task_id, page_no)
+);
+
 -- Initial data for testing (MVP)
 INSERT INTO users (email, password_hash, name, role) VALUES 
 ('admin@example.com', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj.hGKc8m/EO', 'Administrator', 'admin'),
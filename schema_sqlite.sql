@@ -37,6 +37,18 @@ CREATE TABLE IF NOT EXISTS questions (
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+-- 批量拆题表（一个批次包含多个拆题会话）
+CREATE TABLE IF NOT EXISTS ingest_batches (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name VARCHAR(200),
+  created_by INTEGER REFERENCES users(id),
+  status VARCHAR(30) NOT NULL DEFAULT 'uploaded' CHECK (status IN ('uploaded','processing','completed','partially_failed','failed')),
+  total_files INTEGER DEFAULT 0,
+  concurrency INTEGER,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  finished_at DATETIME
+);
+
 -- 拆题会话表
 CREATE TABLE IF NOT EXISTS ingest_sessions (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -47,6 +59,7 @@ CREATE TABLE IF NOT EXISTS ingest_sessions (
   status VARCHAR(30) NOT NULL DEFAULT 'uploaded' CHECK (status IN ('uploaded','parsing','awaiting_review','partially_approved','completed','failed')),
   total_items INTEGER DEFAULT 0,
   processed_items INTEGER DEFAULT 0,
+  batch_id INTEGER REFERENCES ingest_batches(id) ON DELETE CASCADE,
   created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -56,13 +69,24 @@ CREATE TABLE IF NOT EXISTS ingest_items (
   session_id INTEGER REFERENCES ingest_sessions(id) ON DELETE CASCADE,
   seq INTEGER,
   crop_uri TEXT,
-  ocr_json TEXT,
+  ocr_json TEXT,  -- 仅 worker 识别结果的位置框等结构化信息，题干只存 question_text
   question_text TEXT,  -- 新增：保存格式化后的题目文本
   candidate_type VARCHAR(20),
-  candidate_kps_json TEXT,
+  candidate_kps_json TEXT,  -- [[kp_id, confidence], ...]，未匹配的知识点为 {subject, module, point, confidence}
   confidence REAL,
   review_status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (review_status IN ('pending','approved','rejected','edited')),
-  approved_question_id INTEGER REFERENCES questions(id)
+  approved_question_id INTEGER REFERENCES questions(id),
+  duplicate_question_id INTEGER REFERENCES questions(id),  -- 题库中最相似的已有题目（MinHash LSH）
+  duplicate_similarity REAL
+);
+
+-- 拆题会话提取全文（zlib 压缩，用于重新拆分）
+CREATE TABLE IF NOT EXISTS ingest_session_texts (
+  session_id INTEGER PRIMARY KEY REFERENCES ingest_sessions(id) ON DELETE CASCADE,
+  text_zlib BLOB NOT NULL,
+  page_offsets TEXT,  -- 每页在全文中的起始偏移（JSON数组）
+  char_count INTEGER,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
 -- 创建索引
@@ -70,9 +94,32 @@ CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_questions_type ON questions(type);
 CREATE INDEX IF NOT EXISTS idx_questions_created_by ON questions(created_by);
 CREATE INDEX IF NOT EXISTS idx_ingest_sessions_created_by ON ingest_sessions(created_by);
+CREATE INDEX IF NOT EXISTS idx_ingest_sessions_batch_id ON ingest_sessions(batch_id);
+CREATE INDEX IF NOT EXISTS idx_ingest_batches_created_by ON ingest_batches(created_by);
 CREATE INDEX IF NOT EXISTS idx_ingest_items_session_id ON ingest_items(session_id);
 CREATE INDEX IF NOT EXISTS idx_ingest_items_review_status ON ingest_items(review_status);
 
+-- 题干全文索引（FTS5 trigram，外部内容表，由触发器同步）
+CREATE VIRTUAL TABLE IF NOT EXISTS ingest_items_fts USING fts5(
+  question_text,
+  content='ingest_items',
+  content_rowid='id',
+  tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS ingest_items_fts_insert AFTER INSERT ON ingest_items BEGIN
+  INSERT INTO ingest_items_fts(rowid, question_text) VALUES (new.id, new.question_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ingest_items_fts_delete AFTER DELETE ON ingest_items BEGIN
+  INSERT INTO ingest_items_fts(ingest_items_fts, rowid, question_text) VALUES ('delete', old.id, old.question_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS ingest_items_fts_update AFTER UPDATE OF question_text ON ingest_items BEGIN
+  INSERT INTO ingest_items_fts(ingest_items_fts, rowid, question_text) VALUES ('delete', old.id, old.question_text);
+  INSERT INTO ingest_items_fts(rowid, question_text) VALUES (new.id, new.question_text);
+END;
+
 -- 插入测试数据
 INSERT OR IGNORE INTO users (email, password_hash, name, role) VALUES 
 ('admin@example.com', 'password', 'Administrator', 'admin'),
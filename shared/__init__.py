@@ -0,0 +1 @@
+"""后端与 worker 共用的纯 Python 定义（只依赖标准库）"""
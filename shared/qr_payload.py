@@ -0,0 +1,42 @@
+# shared/qr_payload.py - 答题卡二维码内容格式，后端生成、worker 识别共用这一份定义
+"""
+二维码内容格式：
+
+    sx1?p=<paper_id>&pg=<页码>&s=<学生标识>
+
+QR_REGION 为二维码在页面中的默认位置（右上角，相对页面宽高的比例）。
+"""
+
+import json
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlencode
+
+QR_PAYLOAD_PREFIX = "sx1"
+QR_REGION = {"x": 0.78, "y": 0.02, "width": 0.15, "height": 0.1}
+
+
+def encode_qr_payload(paper_id: int, student_id: Optional[str] = None, page: int = 1) -> str:
+    query = {"p": paper_id, "pg": page}
+    if student_id:
+        query["s"] = student_id
+    return f"{QR_PAYLOAD_PREFIX}?{urlencode(query)}"
+
+
+def parse_qr_payload(text: str) -> Optional[Dict[str, Any]]:
+    """解析二维码内容，返回 {"paper_id", "student_id", "page"}；兼容直接编码整个 qr_schema 的 JSON"""
+    if not text:
+        return None
+    try:
+        if text.startswith(QR_PAYLOAD_PREFIX + "?"):
+            query = {key: values[0] for key, values in parse_qs(text[len(QR_PAYLOAD_PREFIX) + 1:]).items()}
+            paper_id, student_id, page = query.get("p"), query.get("s"), query.get("pg", 1)
+        else:
+            data = json.loads(text)
+            if not isinstance(data, dict):
+                return None
+            paper_id, student_id, page = data.get("paper_id"), data.get("student_id"), data.get("page", 1)
+        if paper_id is None:
+            return None
+        return {"paper_id": int(paper_id), "student_id": student_id, "page": int(page)}
+    except (ValueError, TypeError):
+        return None
@@ -0,0 +1,227 @@
+# workers/answer_key_cache.py - 判分 Worker 的标准答案缓存
+import os
+import json
+import select
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import psycopg2
+from psycopg2 import errors
+
+logger = logging.getLogger(__name__)
+
+# 与 migrations/add_answer_key_versions.sql 中触发器使用的通道名一致
+NOTIFY_CHANNEL = "answer_key_changed"
+
+OBJECTIVE_TYPES = ('single', 'multiple', 'judge', 'fill')
+JUDGE_TRUE = {'true', 't', '1', 'y', 'yes', '对', '正确', '√', '是'}
+
+
+def normalize_correct_answer(q_type: str, answer_json: Any) -> Any:
+    """
+    把 answer_json 规整为判分直接可比较的形式
+
+    单选：大写选项字母；多选：排序后的选项元组；判断：bool；填空：去掉首尾空白的答案元组；主观题：None
+    兼容 {"correct": ...} 和 {"answer": ...} 两种写法
+    """
+    if isinstance(answer_json, (str, bytes)):
+        answer_json = json.loads(answer_json) if answer_json else {}
+    value = answer_json
+    if isinstance(answer_json, dict):
+        value = answer_json.get('correct', answer_json.get('answer'))
+    if value is None or q_type not in OBJECTIVE_TYPES:
+        return None
+
+    if q_type == 'single':
+        return str(value).strip().upper()
+    if q_type == 'multiple':
+        options = value if isinstance(value, (list, tuple)) else list(str(value).replace(',', ''))
+        return tuple(sorted({str(option).strip().upper() for option in options if str(option).strip()}))
+    if q_type == 'judge':
+        return value if isinstance(value, bool) else str(value).strip().lower() in JUDGE_TRUE
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return tuple(str(v).strip() for v in values)
+
+
+class AnswerKeyCache:
+    """
+    按 paper_id 缓存编译好的标准答案（LRU）
+
+    失效机制：
+    - answer_key_versions 表记录每份试卷的版本号，paper_questions 或 questions.answer_json/type 变化时
+      由触发器递增并发送 NOTIFY answer_key_changed；监听线程收到通知后立即淘汰对应试卷
+    - 监听连接不可用时（如迁移未执行、网络中断），每次取用都先比对版本号；
+      监听正常时只在条目超过 revalidate_seconds 后比对一次，作为漏收通知的兜底
+    """
+
+    def __init__(
+        self,
+        db_pool,
+        max_size: Optional[int] = None,
+        revalidate_seconds: Optional[float] = None,
+        listen: Optional[bool] = None
+    ):
+        self.db_pool = db_pool
+        self.max_size = max_size or int(os.getenv("ANSWER_KEY_CACHE_SIZE", "256"))
+        self.revalidate_seconds = (
+            revalidate_seconds if revalidate_seconds is not None
+            else float(os.getenv("ANSWER_KEY_REVALIDATE_SECONDS", "300"))
+        )
+        self.listen = listen if listen is not None else os.getenv("ANSWER_KEY_LISTEN", "1") == "1"
+        # paper_id -> (答案, 版本号, 加载时间)
+        self._entries: "OrderedDict[int, Tuple[Dict[str, Any], Optional[int], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._listening = False
+        self._versions_available = True
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+
+    def get(self, paper_id: int) -> Dict[str, Any]:
+        """获取试卷的标准答案，未缓存或已失效时从数据库加载"""
+        self._ensure_listener()
+        with self._lock:
+            entry = self._entries.get(paper_id)
+            if entry is not None:
+                self._entries.move_to_end(paper_id)
+
+        if entry is not None:
+            answers, version, loaded_at = entry
+            fresh = time.monotonic() - loaded_at < self.revalidate_seconds
+            if self._listening and fresh:
+                valid = True
+            elif self._versions_available and version is not None:
+                valid = self._current_version(paper_id) == version
+                if valid:
+                    with self._lock:
+                        if paper_id in self._entries:
+                            self._entries[paper_id] = (answers, version, time.monotonic())
+            else:
+                # 没有版本表时只能按时间过期
+                valid = fresh
+            if valid:
+                with self._lock:
+                    self.hits += 1
+                return answers
+
+        with self._lock:
+            self.misses += 1
+        answers, version = self._load(paper_id)
+        if answers:
+            with self._lock:
+                self._entries[paper_id] = (answers, version, time.monotonic())
+                self._entries.move_to_end(paper_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return answers
+
+    def invalidate(self, paper_id: Optional[int] = None):
+        """淘汰指定试卷，paper_id 为 None 时清空缓存"""
+        with self._lock:
+            if paper_id is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(paper_id, None) is not None:
+                self.invalidations += 1
+
+    def _query_version(self, cur, paper_id: int) -> Optional[int]:
+        if not self._versions_available:
+            return None
+        try:
+            cur.execute("SELECT version FROM answer_key_versions WHERE paper_id = %s", (paper_id,))
+        except errors.UndefinedTable:
+            cur.connection.rollback()
+            self._versions_available = False
+            logger.warning("answer_key_versions 表不存在，标准答案缓存只按 revalidate 周期过期")
+            return None
+        row = cur.fetchone()
+        return row[0] if row else 0
+
+    def _current_version(self, paper_id: int) -> Optional[int]:
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            version = self._query_version(cur, paper_id)
+            cur.close()
+        return version
+
+    def _load(self, paper_id: int) -> Tuple[Dict[str, Any], Optional[int]]:
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            # 先读版本号再读答案：两者之间发生的修改会让缓存的版本号偏旧，下次比对时重新加载
+            version = self._query_version(cur, paper_id)
+            cur.execute(
+                """
+                SELECT pq.question_id, pq.score, q.type, q.answer_json
+                FROM paper_questions pq
+                JOIN questions q ON pq.question_id = q.id
+                WHERE pq.paper_id = %s
+                ORDER BY pq.seq
+                """,
+                (paper_id,)
+            )
+
+            paper_answers = {}
+            for question_id, score, q_type, answer_json in cur:
+                if isinstance(answer_json, (str, bytes)):
+                    answer_json = json.loads(answer_json) if answer_json else {}
+                paper_answers[str(question_id)] = {
+                    "type": q_type,
+                    "score": float(score),
+                    "correct_answer": answer_json or {},
+                    "correct": normalize_correct_answer(q_type, answer_json),
+                    "is_objective": q_type in OBJECTIVE_TYPES
+                }
+            cur.close()
+        with self._lock:
+            self.loads += 1
+        logger.info(f"获取试卷 {paper_id} 的 {len(paper_answers)} 道题的标准答案（版本 {version}）")
+        return paper_answers, version
+
+    def _ensure_listener(self):
+        if not self.listen or self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen_loop, name="answer-key-listener", daemon=True)
+                self._listener.start()
+
+    def _listen_loop(self):
+        """LISTEN 需要独占一条连接，不占用连接池"""
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.db_pool.dsn)
+                conn.set_session(autocommit=True)
+                conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # 重连期间可能漏收通知，全部淘汰
+                self.invalidate()
+                self._listening = True
+                backoff = 1
+                logger.info("标准答案缓存已开始监听变更通知")
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self.invalidate(int(notify.payload))
+                        except ValueError:
+                            self.invalidate()
+            except Exception as e:
+                self._listening = False
+                logger.warning(f"标准答案变更监听中断，{backoff}s 后重连: {e}")
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# workers/benchmark_workers.py - Worker 运行时基准测试的命令行入口（各基准的实现在 benchmarks/ 中）
+"""
+用法:
+    python benchmark_workers.py concurrency [--tasks 200] [--pool-sizes 1,2,4,8,16]
+    python benchmark_workers.py heartbeat [--tasks 60] [--slow-ratio 0.3] [--slow-ms 800] [--heartbeat-ms 500]
+    python benchmark_workers.py db [--tasks 20] [--questions 50] [--connect-ms 5]
+    python benchmark_workers.py grading [--sheets 1000] [--questions 50] [--batch 100]
+    python benchmark_workers.py answer-keys [--sheets 2000] [--papers 4] [--questions 50]
+    python benchmark_workers.py omr [--sheets 200] [--questions 100]
+    python benchmark_workers.py transfer [--tasks 50]
+    python benchmark_workers.py layout [--sheets 10] [--dpis 150,200,300,400]
+    python benchmark_workers.py alignment [--sheets 50] [--max-rotation 3] [--dpi 300]
+    python benchmark_workers.py qr [--sheets 100] [--dpi 300] [--moved-ratio 0.1]
+    python benchmark_workers.py retry [--tasks 200] [--outage-ms 2000] [--base-delay-ms 500]
+    python benchmark_workers.py priority [--bulk 2000] [--interactive-rate 20] [--work-ms 10]
+    python benchmark_workers.py timeout [--tasks 200] [--hang-ratio 0.05] [--hang-ms 5000] [--timeout 1]
+    python benchmark_workers.py idempotency [--tasks 500] [--duplicate-ratio 0.2] [--questions 50]
+    python benchmark_workers.py publish [--tasks 10000] [--rtt-ms 1] [--nack-rate 0.01]
+    python benchmark_workers.py callbacks [--sheets 1000] [--questions 20] [--concurrency 8]
+    python benchmark_workers.py autoscale [--cpus 4] [--burst 2000] [--rate 2]
+    python benchmark_workers.py backends [--tasks 2000] [--work-ms 2] [--concurrency 4]
+    python benchmark_workers.py crops [--pages 20] [--upload-ms 20] [--in-flight 1,4,8] [--fail-rate 0.05]
+    python benchmark_workers.py pages [--pages 40] [--dpi 200] [--concurrency 1,2,4]
+"""
+
+import argparse
+import logging
+
+from benchmarks import (
+    alignment, answer_keys, autoscale, backends, callbacks, concurrency, crops, db, grading, heartbeat, idempotent,
+    layout, omr, pages, priority, publish, qr, retry, timeout, transfer
+)
+
+logging.basicConfig(level=logging.WARNING)
+logging.getLogger("task_manager").setLevel(logging.WARNING)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker 运行时基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    concurrency_parser = subparsers.add_parser("concurrency", help="并发消费：吞吐随线程池/进程池大小的变化")
+    concurrency_parser.add_argument("--tasks", type=int, default=200)
+    concurrency_parser.add_argument("--pool-sizes", default="1,2,4,8,16")
+    concurrency_parser.add_argument("--io-ms", type=float, default=40)
+    concurrency_parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+
+    heartbeat_parser = subparsers.add_parser("heartbeat", help="长任务与心跳：连接线程内执行 vs 独立线程执行的重复投递")
+    heartbeat_parser.add_argument("--tasks", type=int, default=60)
+    heartbeat_parser.add_argument("--slow-ratio", type=float, default=0.3)
+    heartbeat_parser.add_argument("--slow-ms", type=float, default=800)
+    heartbeat_parser.add_argument("--heartbeat-ms", type=float, default=500)
+
+    db_parser = subparsers.add_parser("db", help="连接池：每个判分任务建立的数据库连接数")
+    db_parser.add_argument("--tasks", type=int, default=20)
+    db_parser.add_argument("--questions", type=int, default=50)
+    db_parser.add_argument("--connect-ms", type=float, default=5)
+
+    grading_parser = subparsers.add_parser("grading", help="判分结果写入：逐题 UPDATE vs UPDATE ... FROM (VALUES)")
+    grading_parser.add_argument("--sheets", type=int, default=1000)
+    grading_parser.add_argument("--questions", type=int, default=50)
+    grading_parser.add_argument("--batch", type=int, default=100)
+
+    answer_keys_parser = subparsers.add_parser("answer-keys", help="标准答案缓存：每张答题卡的答案查询次数")
+    answer_keys_parser.add_argument("--sheets", type=int, default=2000)
+    answer_keys_parser.add_argument("--papers", type=int, default=4)
+    answer_keys_parser.add_argument("--questions", type=int, default=50)
+
+    omr_parser = subparsers.add_parser("omr", help="OMR 涂卡识别：每张合成答题卡的耗时和准确率")
+    omr_parser.add_argument("--sheets", type=int, default=200)
+    omr_parser.add_argument("--questions", type=int, default=100)
+
+    transfer_parser = subparsers.add_parser("transfer", help="对象传输：临时文件 vs 内存中下载、解码、编码、上传")
+    transfer_parser.add_argument("--tasks", type=int, default=50)
+
+    layout_parser = subparsers.add_parser("layout", help="版面检测：全分辨率 vs 图像金字塔，不同扫描分辨率下的每张耗时")
+    layout_parser.add_argument("--sheets", type=int, default=10)
+    layout_parser.add_argument("--dpis", default="150,200,300,400")
+
+    alignment_parser = subparsers.add_parser("alignment", help="透视校正：裁剪缩放 vs 定位标记单应变换下的气泡偏移和识别错误")
+    alignment_parser.add_argument("--sheets", type=int, default=50)
+    alignment_parser.add_argument("--max-rotation", type=float, default=3)
+    alignment_parser.add_argument("--dpi", type=int, default=300)
+
+    qr_parser = subparsers.add_parser("qr", help="二维码识别：区域内解码的耗时和整页回退率")
+    qr_parser.add_argument("--sheets", type=int, default=100)
+    qr_parser.add_argument("--dpi", type=int, default=300)
+    qr_parser.add_argument("--moved-ratio", type=float, default=0.1)
+
+    retry_parser = subparsers.add_parser("retry", help="失败重试：立即重试 vs 指数退避延迟队列，以及死信回放")
+    retry_parser.add_argument("--tasks", type=int, default=200)
+    retry_parser.add_argument("--outage-ms", type=float, default=2000)
+    retry_parser.add_argument("--base-delay-ms", type=float, default=500)
+
+    priority_parser = subparsers.add_parser("priority", help="优先级通道：批量积压下的交互任务延迟，以及批量任务的保底份额")
+    priority_parser.add_argument("--bulk", type=int, default=2000)
+    priority_parser.add_argument("--interactive-rate", type=float, default=20)
+    priority_parser.add_argument("--work-ms", type=float, default=10)
+
+    timeout_parser = subparsers.add_parser("timeout", help="任务超时：卡住的任务占用执行槽 vs 看门狗超时重试")
+    timeout_parser.add_argument("--tasks", type=int, default=200)
+    timeout_parser.add_argument("--hang-ratio", type=float, default=0.05)
+    timeout_parser.add_argument("--hang-ms", type=float, default=5000)
+    timeout_parser.add_argument("--timeout", type=float, default=1)
+    timeout_parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+
+    idempotency_parser = subparsers.add_parser("idempotency", help="幂等执行：重复投递的任务是否被重新判分")
+    idempotency_parser.add_argument("--tasks", type=int, default=500)
+    idempotency_parser.add_argument("--duplicate-ratio", type=float, default=0.2)
+    idempotency_parser.add_argument("--questions", type=int, default=50)
+
+    publish_parser = subparsers.add_parser("publish", help="批量发布：publisher confirms 的确认窗口和通道池对吞吐的影响")
+    publish_parser.add_argument("--tasks", type=int, default=10000)
+    publish_parser.add_argument("--rtt-ms", type=float, default=1)
+    publish_parser.add_argument("--nack-rate", type=float, default=0.01)
+
+    callbacks_parser = subparsers.add_parser("callbacks", help="结果回调：每次新建连接 vs 持久连接 vs 批量回调的吞吐和后端 CPU")
+    callbacks_parser.add_argument("--sheets", type=int, default=1000)
+    callbacks_parser.add_argument("--questions", type=int, default=20)
+    callbacks_parser.add_argument("--concurrency", type=int, default=8)
+
+    autoscale_parser = subparsers.add_parser("autoscale", help="Worker 扩缩容：固定进程数 vs 按队列积压扩缩容的等待时间和进程占用")
+    autoscale_parser.add_argument("--cpus", type=int, default=4)
+    autoscale_parser.add_argument("--burst", type=int, default=2000)
+    autoscale_parser.add_argument("--rate", type=float, default=2)
+
+    crops_parser = subparsers.add_parser("crops", help="拆题切图：逐张编码上传 vs 并行编码、限制并发数上传")
+    crops_parser.add_argument("--pages", type=int, default=20)
+    crops_parser.add_argument("--upload-ms", type=float, default=20)
+    crops_parser.add_argument("--in-flight", default="1,4,8", help="逗号分隔的同时上传数上限")
+    crops_parser.add_argument("--fail-rate", type=float, default=0.05)
+
+    pages_parser = subparsers.add_parser("pages", help="多页 PDF/TIFF：整份解码 vs 逐页解码并行处理的耗时和峰值内存，失败后按页续跑")
+    pages_parser.add_argument("--pages", type=int, default=40)
+    pages_parser.add_argument("--dpi", type=int, default=200)
+    pages_parser.add_argument("--concurrency", default="1,2,4", help="逗号分隔的同时处理页数")
+
+    backends_parser = subparsers.add_parser("backends", help="本地队列后端：进程内队列和 SQLite 队列的吞吐、多进程认领和崩溃恢复")
+    backends_parser.add_argument("--tasks", type=int, default=2000)
+    backends_parser.add_argument("--work-ms", type=float, default=2)
+    backends_parser.add_argument("--concurrency", type=int, default=4)
+
+    # callbacks 基准的服务端子进程
+    server_parser = subparsers.add_parser("callback-server")
+    server_parser.add_argument("--port", type=int, required=True)
+    server_parser.add_argument("--db", required=True)
+
+    args = parser.parse_args()
+    if args.command == "concurrency":
+        concurrency.bench_concurrency(args.tasks, [int(v) for v in args.pool_sizes.split(",")], args.io_ms, args.executor)
+    elif args.command == "heartbeat":
+        heartbeat.bench_heartbeat(args.tasks, args.slow_ratio, args.slow_ms, args.heartbeat_ms)
+    elif args.command == "db":
+        db.bench_db(args.tasks, args.questions, args.connect_ms)
+    elif args.command == "grading":
+        grading.bench_grading(args.sheets, args.questions, args.batch)
+    elif args.command == "answer-keys":
+        answer_keys.bench_answer_keys(args.sheets, args.papers, args.questions)
+    elif args.command == "omr":
+        omr.bench_omr(args.sheets, args.questions)
+    elif args.command == "transfer":
+        transfer.bench_transfer(args.tasks)
+    elif args.command == "layout":
+        layout.bench_layout(args.sheets, [int(v) for v in args.dpis.split(",")])
+    elif args.command == "alignment":
+        alignment.bench_alignment(args.sheets, args.max_rotation, args.dpi)
+    elif args.command == "qr":
+        qr.bench_qr(args.sheets, args.dpi, args.moved_ratio)
+    elif args.command == "retry":
+        retry.bench_retry(args.tasks, args.outage_ms, args.base_delay_ms)
+    elif args.command == "priority":
+        priority.bench_priority(args.bulk, args.interactive_rate, args.work_ms)
+    elif args.command == "timeout":
+        timeout.bench_timeout(args.tasks, args.hang_ratio, args.hang_ms, args.timeout, args.executor)
+    elif args.command == "idempotency":
+        idempotent.bench_idempotency(args.tasks, args.duplicate_ratio, args.questions)
+    elif args.command == "publish":
+        publish.bench_publish(args.tasks, args.rtt_ms, args.nack_rate)
+    elif args.command == "callbacks":
+        callbacks.bench_callbacks(args.sheets, args.questions, args.concurrency)
+    elif args.command == "autoscale":
+        autoscale.bench_autoscale(args.cpus, args.burst, args.rate)
+    elif args.command == "crops":
+        crops.bench_crops(args.pages, args.upload_ms, [int(n) for n in args.in_flight.split(",")], args.fail_rate)
+    elif args.command == "pages":
+        pages.bench_pages(args.pages, args.dpi, [int(n) for n in args.concurrency.split(",")])
+    elif args.command == "backends":
+        backends.bench_backends(args.tasks, args.work_ms, args.concurrency)
+    elif args.command == "callback-server":
+        callbacks.serve_backend(args.port, args.db)
+
+
+if __name__ == "__main__":
+    main()
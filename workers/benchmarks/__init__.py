@@ -0,0 +1,6 @@
+# workers/benchmarks - Worker 运行时基准测试，每个模块对应 benchmark_workers.py 的一个子命令
+"""
+队列基准（concurrency、heartbeat、retry、priority、timeout、idempotency、publish）使用 common.BenchBroker：
+local_queue 的进程内队列加上心跳断连、publisher confirms 等 RabbitMQ 行为的模拟，无需真实 broker；
+数据库基准使用 local_postgres 的 PostgreSQL 替身，图像基准使用 synthetic_sheets 生成的合成答题卡。
+"""
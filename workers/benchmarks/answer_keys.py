@@ -0,0 +1,44 @@
+# workers/benchmarks/answer_keys.py - 标准答案缓存：每张答题卡的答案查询次数
+
+import logging
+import time
+
+from answer_key_cache import AnswerKeyCache
+from db_pool import ConnectionPool
+from idempotency import IdempotencyStore
+from local_postgres import LocalDatabase
+from task_manager import create_auto_grade_task
+
+
+def bench_answer_keys(sheets: int, papers: int, questions: int):
+    from omr_worker import AutoGradeProcessor
+
+    logging.getLogger("omr_worker").setLevel(logging.WARNING)
+    logging.getLogger("answer_key_cache").setLevel(logging.WARNING)
+    answers = [{"question_id": i + 1, "parsed_json": ["A"]} for i in range(questions)]
+    print(f"=== 标准答案缓存基准: {sheets} 张答题卡, {papers} 份试卷 x {questions} 道题 ===")
+
+    for label, listening in (("监听变更通知", True), ("仅比对版本号（监听不可用）", False)):
+        db = LocalDatabase(questions, connect_ms=0)
+        db.papers = papers
+        processor = AutoGradeProcessor()
+        processor.db_pool = ConnectionPool(dsn="local://", connect=db.connect)
+        processor.answer_keys = AnswerKeyCache(processor.db_pool, listen=False)
+        processor.idempotency = IdempotencyStore(processor.db_pool)
+        # 模拟监听线程已连接；通知到达时调用 invalidate
+        processor.answer_keys._listening = listening
+
+        start = time.perf_counter()
+        for i in range(sheets):
+            if i == sheets // 2:
+                # 中途修改第 1 份试卷的答案：触发器递增版本号并发送通知
+                db.answer_key_versions[1] += 1
+                if listening:
+                    processor.answer_keys.invalidate(1)
+            processor.process_task(create_auto_grade_task(i + 1, answers))
+        seconds = time.perf_counter() - start
+        cache = processor.answer_keys
+        print(
+            f"  {label}: 答案查询 {db.answer_key_queries} 次（改造前 {sheets} 次）, "
+            f"版本号查询 {db.version_queries} 次, 命中 {cache.hits} / 未命中 {cache.misses}, {seconds:.2f}s"
+        )
@@ -0,0 +1,107 @@
+# workers/benchmarks/autoscale.py - Worker 扩缩容：固定进程数 vs 按队列积压扩缩容的等待时间和进程占用（模拟时钟）
+
+import logging
+
+from task_manager import TaskType
+from worker_launcher import WorkerPool, WorkerSupervisor
+
+
+class SimulatedWorker:
+    """
+    autoscale 基准中的 Worker 进程：启动 STARTUP_SECONDS 秒后（加载模型、建立连接）每秒完成 rate 个任务；
+    收到 SIGTERM 后完成手上的任务（1 秒）再退出
+    """
+
+    STARTUP_SECONDS = 10
+
+    def __init__(self, pid: int, rate: float, now: int):
+        self.pid = pid
+        self.rate = rate
+        self.now = now
+        self.ready_at = now + self.STARTUP_SECONDS
+        self.exit_at = None
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def send_signal(self, signum):
+        self.exit_at = self.now + 1
+
+    def kill(self):
+        self.returncode = -9
+
+
+class SimulatedBacklog:
+    """autoscale 基准的队列积压（按模拟时钟推进）"""
+
+    def __init__(self):
+        self.backlog = 0.0
+
+    def depth(self, task_type):
+        return int(self.backlog)
+
+    def close(self):
+        pass
+
+
+def _simulate_autoscale(min_procs: int, max_procs: int, cpus: int, arrivals, duration: int, rate: float):
+    """按秒推进的模拟：返回 (平均等待秒数, 最大积压, 进程·秒, 最多进程数)"""
+    backlog = SimulatedBacklog()
+    workers = []
+
+    clock = {"now": 0}
+
+    def spawn(pool):
+        worker = SimulatedWorker(len(workers) + 1, rate, clock["now"])
+        workers.append(worker)
+        return worker
+
+    pool = WorkerPool(TaskType.OCR_OMR, min_procs=min_procs, max_procs=max_procs)
+    supervisor = WorkerSupervisor(
+        [pool], backlog, max_procs=cpus, interval=5, scale_up_backlog=10, scale_down_delay=60, drain_timeout=30,
+        spawn=spawn
+    )
+    waiting = 0.0
+    peak = 0.0
+    process_seconds = 0
+    peak_procs = 0
+    for now in range(duration):
+        clock["now"] = now
+        backlog.backlog += arrivals(now)
+        for worker in workers:
+            worker.now = now
+            if worker.returncode is None and worker.exit_at is not None and now >= worker.exit_at:
+                worker.returncode = 0
+        if now % supervisor.interval == 0:
+            supervisor.reconcile(now)
+        alive = [worker for worker in pool.processes]
+        process_seconds += len(alive) + len(pool.draining)
+        peak_procs = max(peak_procs, len(alive))
+        backlog.backlog = max(backlog.backlog - sum(worker.rate for worker in alive if now >= worker.ready_at), 0.0)
+        waiting += backlog.backlog
+        peak = max(peak, backlog.backlog)
+    total = sum(arrivals(now) for now in range(duration))
+    return waiting / total, peak, process_seconds, peak_procs
+
+
+def bench_autoscale(cpus: int, burst: int, rate: float, duration: int = 3600):
+    print(
+        f"=== Worker 扩缩容基准（模拟时钟 {duration}s）: 平时每秒 0.2 个任务，第 300s 和 1800s 各上传 {burst} 张答题卡，"
+        f"每个进程每秒完成 {rate} 个任务，{cpus} 核 ==="
+    )
+    logging.getLogger("worker_launcher").setLevel(logging.WARNING)
+
+    def arrivals(now):
+        return 0.2 + (burst if now in (300, 1800) else 0)
+
+    for label, min_procs, max_procs in (
+        ("固定 1 个进程（原单线程）", 1, 1),
+        (f"固定 {cpus} 个进程", cpus, cpus),
+        (f"按积压扩缩容 1-{cpus}", 1, cpus),
+    ):
+        wait, peak, process_seconds, peak_procs = _simulate_autoscale(min_procs, max_procs, cpus, arrivals, duration, rate)
+        print(
+            f"  {label:<16}: 平均等待 {wait:6.1f}s, 最大积压 {peak:5.0f}, 最多 {peak_procs} 个进程, "
+            f"占用 {process_seconds / duration:4.2f} 个进程（平均）"
+        )
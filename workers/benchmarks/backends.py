@@ -0,0 +1,108 @@
+# workers/benchmarks/backends.py - 本地队列后端：进程内队列和 SQLite 队列的吞吐、多进程认领和崩溃恢复
+
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from task_manager import TaskQueue, TaskType, create_ocr_omr_task, open_connection, queue_names
+
+
+def _queue_depth(url: str) -> int:
+    connection = open_connection(url)
+    try:
+        names = queue_names(TaskType.OCR_OMR)
+        return sum(connection.queue_declare(queue=names[lane], passive=True).method.message_count
+                   for lane in ("interactive", "bulk"))
+    finally:
+        connection.close()
+
+
+def _consume_local_queue(url: str, work_ms: float, concurrency: int, out_path: str, idle_seconds: float):
+    """backends 基准的消费进程：完成的 task_id 逐行追加到 out_path，队列持续 idle_seconds 秒为空后退出"""
+    logging.getLogger("task_manager").setLevel(logging.CRITICAL)
+    queue = TaskQueue(url)
+    out = open(out_path, "a", buffering=1)
+
+    def work(task):
+        time.sleep(work_ms / 1000)
+        out.write(task.task_id + "\n")
+        return True
+
+    def watch():
+        idle_since = None
+        while True:
+            time.sleep(0.2)
+            if _queue_depth(url):
+                idle_since = None
+            elif idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= idle_seconds:
+                queue.request_stop()
+                return
+
+    threading.Thread(target=watch, daemon=True).start()
+    # task_timeout=1：SQLite 队列的认领期限（确认超时）为 4s，崩溃进程的消息 4s 后可被重新认领
+    queue.consume_tasks(TaskType.OCR_OMR, work, concurrency=concurrency, task_timeout=1)
+    queue.close()
+    out.close()
+
+
+def bench_backends(tasks: int, work_ms: float, concurrency: int):
+    print(f"=== 本地队列后端基准: {tasks} 个任务（每个 {work_ms}ms），每个消费进程并发 {concurrency}，无需 RabbitMQ ===")
+    logging.getLogger("task_manager").setLevel(logging.CRITICAL)
+    context = multiprocessing.get_context("fork")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, url, processes, crash_after in (
+            ("进程内队列 memory://", "memory://bench", 0, None),
+            ("SQLite 队列，1 个进程", f"sqlite:///{tmp}/one.db", 1, None),
+            ("SQLite 队列，2 个进程", f"sqlite:///{tmp}/two.db", 2, None),
+            ("SQLite 队列，2 个进程（1 个被 kill）", f"sqlite:///{tmp}/crash.db", 2, 1.0),
+        ):
+            publisher = TaskQueue(url)
+            published = [create_ocr_omr_task(i, f"minio://smart-exam/sheets/{i}.jpg", 1, i, 1) for i in range(tasks)]
+            start = time.perf_counter()
+            publisher.publish_tasks(published)
+            publish_elapsed = time.perf_counter() - start
+
+            out_path = os.path.join(tmp, f"done-{processes}-{crash_after}.txt")
+            start = time.perf_counter()
+            if processes == 0:
+                done = []
+
+                def work(task):
+                    time.sleep(work_ms / 1000)
+                    done.append(task.task_id)
+                    if len(done) >= tasks:
+                        publisher.request_stop()
+                    return True
+
+                publisher.consume_tasks(TaskType.OCR_OMR, work, concurrency=concurrency)
+                elapsed = time.perf_counter() - start
+                executed = done
+            else:
+                idle_seconds = 6 if crash_after else 0.5
+                workers = [
+                    context.Process(target=_consume_local_queue, args=(url, work_ms, concurrency, out_path, idle_seconds))
+                    for _ in range(processes)
+                ]
+                for worker in workers:
+                    worker.start()
+                if crash_after:
+                    time.sleep(crash_after)
+                    workers[0].kill()
+                for worker in workers:
+                    worker.join()
+                with open(out_path) as f:
+                    executed = f.read().split()
+                # 减去最后的空闲等待时间
+                elapsed = time.perf_counter() - start - idle_seconds
+            publisher.close()
+
+            completed = len(set(executed) & {task.task_id for task in published})
+            print(
+                f"  {label:<24}: 发布 {tasks / publish_elapsed:7.0f} 条/s, 处理 {tasks / elapsed:6.0f} 个/s, "
+                f"完成 {completed}/{tasks}, 重复执行 {len(executed) - len(set(executed))}"
+            )
@@ -0,0 +1,162 @@
+# workers/benchmarks/callbacks.py - 结果回调：每次新建连接 vs 持久连接 vs 批量回调的吞吐和后端 CPU
+
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from callback_client import CallbackClient
+
+
+WORKERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(WORKERS_DIR, "..", "backend")
+
+
+# 回调基准的 SQLite 库：只包含回调端点用到的表和列
+CALLBACK_SCHEMA = """
+CREATE TABLE papers (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE questions (id INTEGER PRIMARY KEY, answer_json TEXT);
+CREATE TABLE paper_questions (paper_id INTEGER, question_id INTEGER, seq INTEGER, score NUMERIC,
+                              PRIMARY KEY (paper_id, question_id));
+CREATE TABLE answer_sheets (id INTEGER PRIMARY KEY, paper_id INTEGER, student_id INTEGER,
+                            status TEXT DEFAULT 'uploaded', total_score NUMERIC);
+CREATE TABLE answers (id INTEGER PRIMARY KEY AUTOINCREMENT, sheet_id INTEGER, question_id INTEGER, raw_omr TEXT,
+                      parsed_json TEXT, is_correct BOOLEAN, score NUMERIC, is_objective BOOLEAN);
+CREATE TABLE grading_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, sheet_id INTEGER, grading_type TEXT,
+                           result_json TEXT, created_at TIMESTAMP);
+CREATE TABLE task_callbacks (task_id TEXT PRIMARY KEY, sheet_id INTEGER, received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+"""
+
+
+def serve_backend(port: int, db_path: str):
+    """在 SQLite 库上运行后端应用（回调基准的服务端子进程）"""
+    sys.path.insert(0, BACKEND_DIR)
+    import uvicorn
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from app.database import get_db
+    from app.main import app
+
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False, "timeout": 30})
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, record):
+        # 事务由 SQLAlchemy 发出 BEGIN，保存点才能正常工作
+        dbapi_connection.isolation_level = None
+        dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+
+    def get_local_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_local_db
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def _process_cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def bench_callbacks(sheets: int, questions: int, concurrency: int):
+    print(f"=== 结果回调基准: {sheets} 张答题卡 x {questions} 道客观题，{concurrency} 个任务线程，后端为 FastAPI + SQLite ===")
+    logging.getLogger("callback_client").setLevel(logging.WARNING)
+    modes = (
+        ("每次 requests.post（原实现）", None),
+        ("持久连接，逐条回调", 1),
+        (f"持久连接，批量回调（{concurrency} 条）", concurrency),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "callbacks.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript(CALLBACK_SCHEMA)
+        conn.execute("INSERT INTO papers VALUES (1, 'bench')")
+        conn.executemany("INSERT INTO questions VALUES (?, ?)", [(q, json.dumps({"answer": "A"})) for q in range(1, questions + 1)])
+        conn.executemany("INSERT INTO paper_questions VALUES (1, ?, ?, 2)", [(q, q) for q in range(1, questions + 1)])
+        conn.executemany("INSERT INTO answer_sheets (id, paper_id, student_id) VALUES (?, 1, ?)",
+                         [(i, i) for i in range(1, sheets * len(modes) + 1)])
+        conn.commit()
+        conn.close()
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(WORKERS_DIR, "benchmark_workers.py"), "callback-server", "--port", str(port), "--db", db_path]
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(200):
+                try:
+                    requests.get(base_url + "/docs", timeout=1)
+                    break
+                except requests.ConnectionError:
+                    time.sleep(0.1)
+
+            rng = random.Random(0)
+            for index, (label, batch_size) in enumerate(modes):
+                payloads = [
+                    {
+                        "task_id": f"bench-{index}-{i}",
+                        "sheet_id": index * sheets + i + 1,
+                        "status": "completed",
+                        "answers": [
+                            {"question_id": q, "answer": rng.choice("ABCD"), "confidence": 0.9}
+                            for q in range(1, questions + 1)
+                        ],
+                        "processing_time": 800
+                    }
+                    for i in range(sheets)
+                ]
+                if batch_size is None:
+                    client = None
+
+                    def send(payload):
+                        return requests.post(base_url + "/internal/ocr-omr/callback", json=payload, timeout=30).status_code == 200
+                else:
+                    client = CallbackClient(base_url, batch_size=batch_size, flush_interval=0.02, concurrency=concurrency)
+                    send = client.send
+
+                results = []
+
+                def worker(part):
+                    results.extend(send(payload) for payload in part)
+
+                cpu_before = _process_cpu_seconds(server.pid)
+                start = time.perf_counter()
+                threads = [threading.Thread(target=worker, args=(payloads[t::concurrency],)) for t in range(concurrency)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                cpu = _process_cpu_seconds(server.pid) - cpu_before
+                http_requests = client.stats()["requests"] if client else sheets
+                print(
+                    f"  {label:<20}: {sheets / elapsed:6.0f} 回调/s, 后端 CPU {cpu / sheets * 1000:5.2f}ms/张, "
+                    f"HTTP 请求 {http_requests}, 成功 {results.count(True)}/{sheets}"
+                )
+                if client:
+                    client.close()
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,238 @@
+# workers/benchmarks/common.py - 各基准共用的 broker、TaskQueue 和 MinIO 替身
+"""
+队列使用 local_queue 的进程内后端（memory://），与 TaskQueue(memory://...) 是同一套队列实现；
+BenchBroker 只在其上补充 RabbitMQ 的几种行为：心跳超时断连、x-delivery-limit、publisher confirms
+的往返延迟和随机 nack，以及队列排空后自动停止消费。
+"""
+
+import io
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from types import SimpleNamespace
+
+import pika
+
+from local_queue import LocalConnection
+from task_manager import TaskQueue, create_ocr_omr_task
+
+
+class BenchBroker(LocalConnection):
+    """
+    基准用的 broker 连接（同时充当 channel），消息存放在 local_queue 的进程内队列中
+
+    stop_when_idle：消费的队列中没有可取出、未到期和未确认的消息时 start_consuming 返回。
+
+    设置 heartbeat_timeout 后模拟 broker 的心跳检测：连接线程超过该时间没有处理 I/O（被任务阻塞），
+    视为连接断开，所有未确认的消息重新入队并标记 redelivered，旧 delivery_tag 上的确认被忽略；
+    delivery_limit 模拟仲裁队列的 x-delivery-limit，超过投递次数的消息进入死信。
+
+    开启 publisher confirms 后（confirm_delivery），确认在 process_data_events 中经过一个 confirm_rtt 后
+    以 multiple=True 一次送达；nack_rate 按比例随机 nack 消息（消息不入队），mandatory 消息发往未声明的队列时被退回
+    """
+
+    def __init__(self, url: str = None, stop_when_idle: bool = True, heartbeat_timeout: float = None,
+                 delivery_limit: int = 5, confirm_rtt: float = 0.0, nack_rate: float = 0.0):
+        super().__init__(url or f"memory://bench-{uuid.uuid4().hex[:8]}")
+        self.stop_when_idle = stop_when_idle
+        self.heartbeat_timeout = heartbeat_timeout
+        self.delivery_limit = delivery_limit
+        self.confirm_rtt = confirm_rtt
+        self.nack_rate = nack_rate
+        self._serviced_at = time.perf_counter()
+        self._stale_tags = set()
+        self._delivery_counts = defaultdict(int)
+        self._random = random.Random(0)
+        self._on_confirm = None
+        self._on_return = []
+        self._publish_seq = 0
+        self._unconfirmed = []
+        # 统计信息
+        self.acked = 0
+        self.nacked = 0
+        self.dead_lettered = 0
+        self.deliveries = 0
+        self.redeliveries = 0
+        self.connection_drops = 0
+        self.stale_acks = 0
+        self.returned = 0
+
+    def connect(self, **kwargs) -> "BenchBroker":
+        """同一队列存储上的另一个连接，用于发布端连接池"""
+        return BenchBroker(self.url, stop_when_idle=self.stop_when_idle, **kwargs)
+
+    def queued(self, *queues: str) -> int:
+        """队列中可取出的消息数之和"""
+        return sum(self.store.count(queue) for queue in queues)
+
+    # 心跳超时
+    def _check_heartbeat(self):
+        now = time.perf_counter()
+        if self.heartbeat_timeout and now - self._serviced_at > self.heartbeat_timeout and self.unacked:
+            self.connection_drops += 1
+            for tag, (message_id, _) in sorted(self.unacked.items()):
+                self.store.nack(message_id, self.owner, requeue=True)
+                self._stale_tags.add(tag)
+            self.unacked.clear()
+            for index in self._in_flight:
+                self._in_flight[index] = 0
+        self._serviced_at = now
+
+    def _is_stale(self, delivery_tag: int) -> bool:
+        self._check_heartbeat()
+        if delivery_tag in self._stale_tags:
+            # 连接已断开过，旧 delivery_tag 的确认无效，消息已被重新投递
+            self._stale_tags.discard(delivery_tag)
+            self.stale_acks += 1
+            return True
+        return False
+
+    def _is_idle(self) -> bool:
+        return not self.unacked and not any(self.store.pending(queue) for queue, *_ in self.consumers)
+
+    def _run_callbacks(self):
+        self._check_heartbeat()
+        super()._run_callbacks()
+        if self._consuming and self.stop_when_idle and self._is_idle():
+            self._consuming = False
+
+    def basic_consume(self, queue: str, on_message_callback, arguments=None):
+        def deliver(ch, method, properties, body):
+            self.deliveries += 1
+            self.redeliveries += method.redelivered
+            self._delivery_counts[body] += 1
+            if self.delivery_limit and self._delivery_counts[body] > self.delivery_limit:
+                self.dead_lettered += 1
+                super(BenchBroker, self).basic_nack(method.delivery_tag, requeue=False)
+                return
+            on_message_callback(ch, method, properties, body)
+            self._check_heartbeat()
+
+        super().basic_consume(queue, deliver, arguments)
+
+    def basic_ack(self, delivery_tag: int):
+        if self._is_stale(delivery_tag):
+            return
+        self.acked += 1
+        super().basic_ack(delivery_tag)
+
+    def basic_nack(self, delivery_tag: int, requeue: bool = True):
+        if self._is_stale(delivery_tag):
+            return
+        self.nacked += 1
+        self.dead_lettered += not requeue
+        super().basic_nack(delivery_tag, requeue)
+
+    # publisher confirms（_ConfirmChannel 使用底层 channel 的接口）
+    @property
+    def _impl(self):
+        return self
+
+    def confirm_delivery(self, ack_nack_callback=None, callback=None):
+        self._on_confirm = ack_nack_callback
+        if callback is not None:
+            callback(SimpleNamespace(method=pika.spec.Confirm.SelectOk()))
+
+    def add_on_return_callback(self, callback):
+        self._on_return.append(callback)
+
+    def basic_publish(self, exchange: str, routing_key: str, body, properties=None, mandatory: bool = False):
+        if self._on_confirm is None:
+            return super().basic_publish(exchange, routing_key, body, properties, mandatory)
+        self._publish_seq += 1
+        nack = self._random.random() < self.nack_rate
+        self._unconfirmed.append((self._publish_seq, nack))
+        if nack:
+            return
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        if not self.store.push(routing_key, body, properties) and mandatory:
+            self.returned += 1
+            for callback in self._on_return:
+                callback(self, SimpleNamespace(routing_key=routing_key), properties, body)
+
+    def _send_confirms(self) -> bool:
+        if not self._unconfirmed:
+            return False
+        time.sleep(self.confirm_rtt)
+        pending, self._unconfirmed = self._unconfirmed, []
+        for tag, nack in pending:
+            if nack:
+                self._on_confirm(SimpleNamespace(method=pika.spec.Basic.Nack(delivery_tag=tag)))
+        self._on_confirm(SimpleNamespace(method=pika.spec.Basic.Ack(delivery_tag=pending[-1][0], multiple=True)))
+        return True
+
+    def process_data_events(self, time_limit: float = 0):
+        # 确认送达后立即返回，与 pika 收到帧后返回一致
+        if self._send_confirms():
+            time_limit = 0
+        super().process_data_events(time_limit)
+
+
+class BenchTaskQueue(TaskQueue):
+    """连接到 BenchBroker 的 TaskQueue"""
+
+    def __init__(self, broker: BenchBroker):
+        self.broker = broker
+        super().__init__(broker.url)
+
+    def connect(self):
+        self.connection = self.broker
+        self.channel = self.broker
+        self._declare_queues()
+
+
+class LocalObjectStore:
+    """进程内的 MinIO 替身：对象存放在内存中，fget/fput 与真实客户端一样读写本地文件"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, bucket, object_name, data, length, content_type="application/octet-stream"):
+        self.objects[(bucket, object_name)] = data.read(length)
+
+    def get_object(self, bucket, object_name):
+        response = io.BytesIO(self.objects[(bucket, object_name)])
+        response.release_conn = lambda: None
+        return response
+
+    def fget_object(self, bucket, object_name, file_path):
+        with open(file_path, "wb") as f:
+            f.write(self.objects[(bucket, object_name)])
+
+    def fput_object(self, bucket, object_name, file_path):
+        with open(file_path, "rb") as f:
+            self.objects[(bucket, object_name)] = f.read()
+
+
+class RemoteObjectStore(LocalObjectStore):
+    """模拟网络延迟和偶发失败的 MinIO 替身：每次上传耗时 upload_ms，按 fail_rate 随机失败；记录同时进行的上传数峰值"""
+
+    def __init__(self, upload_ms: float, fail_rate: float = 0.0, seed: int = 0):
+        super().__init__()
+        self.upload_ms = upload_ms
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def put_object(self, bucket, object_name, data, length, content_type="application/octet-stream"):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            fail = self.rng.random() < self.fail_rate
+        try:
+            time.sleep(self.upload_ms / 1000)
+            if fail:
+                raise ConnectionError("模拟上传失败")
+            super().put_object(bucket, object_name, data, length, content_type)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+def publish_sheets(queue: TaskQueue, count: int):
+    for i in range(count):
+        queue.publish_task(create_ocr_omr_task(i + 1, f"minio://smart-exam/sheets/{i + 1}.jpg", 1, i + 1, 1))
@@ -0,0 +1,55 @@
+# workers/benchmarks/crops.py - 拆题切图：逐张编码上传 vs 并行编码、限制并发数上传
+
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.common import RemoteObjectStore
+from object_store import CropUploader
+
+
+def bench_crops(pages: int, upload_ms: float, in_flight_limits, fail_rate: float):
+    from ingest_worker import IngestProcessor
+    from object_store import upload_image
+
+    logging.getLogger("ingest_worker").setLevel(logging.ERROR)
+    logging.getLogger("object_store").setLevel(logging.ERROR)
+    rng = np.random.default_rng(0)
+    page = cv2.GaussianBlur(rng.integers(0, 255, size=(3508, 2480, 3), dtype=np.uint8), (9, 9), 0)
+    layout_info = {"detected_regions": []}
+    print(f"=== 切图上传基准: {pages} 页（2480x3508，每页 10 张切图），每次上传 {upload_ms}ms，失败率 {fail_rate:.0%} ===")
+
+    # 改造前：循环内逐张编码、逐张上传
+    store = RemoteObjectStore(upload_ms, fail_rate)
+    start = time.perf_counter()
+    failed = 0
+    for _ in range(pages):
+        height, width = page.shape[:2]
+        top, step = int(height * 0.1), int(height * 0.8) // 10
+        for i in range(10):
+            try:
+                upload_image(store, page[top + i * step:top + (i + 1) * step, 0:width], "ingest")
+            except Exception:
+                failed += 1
+    seconds = time.perf_counter() - start
+    print(f"  逐张编码上传（原实现）: {seconds / pages * 1000:6.1f} ms/页, 上传失败 {failed} 张")
+
+    for limit in in_flight_limits:
+        store = RemoteObjectStore(upload_ms, fail_rate)
+        processor = IngestProcessor.__new__(IngestProcessor)
+        processor.minio_client = store
+        processor.crop_uploader = CropUploader(store, max_in_flight=limit)
+        start = time.perf_counter()
+        failed = kept = 0
+        for _ in range(pages):
+            questions = processor.segment_questions(page, layout_info)
+            failed += sum(1 for q in questions if q["crop_uri"] is None)
+            kept += len(questions)
+        seconds = time.perf_counter() - start
+        processor.crop_uploader.close()
+        print(
+            f"  并行编码，上传上限 {limit:<2}: {seconds / pages * 1000:6.1f} ms/页, 同时上传峰值 {store.peak_in_flight}, "
+            f"上传失败 {failed} 张（题目仍保留 {kept}/{pages * 10}）"
+        )
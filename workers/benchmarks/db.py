@@ -0,0 +1,37 @@
+# workers/benchmarks/db.py - 连接池：每个判分任务建立的数据库连接数
+
+import logging
+import time
+
+from answer_key_cache import AnswerKeyCache
+from db_pool import ConnectionPool
+from idempotency import IdempotencyStore
+from local_postgres import LocalDatabase
+from task_manager import create_auto_grade_task
+
+
+def bench_db(tasks: int, questions: int, connect_ms: float):
+    from omr_worker import AutoGradeProcessor
+
+    logging.getLogger("omr_worker").setLevel(logging.WARNING)
+    db = LocalDatabase(questions, connect_ms)
+    processor = AutoGradeProcessor()
+    processor.db_pool = ConnectionPool(dsn="local://", connect=db.connect)
+    processor.answer_keys = AnswerKeyCache(processor.db_pool, listen=False)
+    processor.idempotency = IdempotencyStore(processor.db_pool)
+    answers = [{"question_id": i + 1, "parsed_json": ["A" if i % 3 else "B"]} for i in range(questions)]
+    print(f"=== 数据库连接基准: {tasks} 张答题卡 x {questions} 道客观题, 建连耗时 {connect_ms:.0f} ms ===")
+
+    total_seconds = 0.0
+    for i in range(tasks):
+        connects, checkouts = db.connects, processor.db_pool.checkouts
+        start = time.perf_counter()
+        processor.process_task(create_auto_grade_task(i + 1, answers))
+        seconds = time.perf_counter() - start
+        total_seconds += seconds
+        if i < 3 or i == tasks - 1:
+            print(
+                f"  任务 {i + 1:>3}: 建立连接 {db.connects - connects}, "
+                f"取用连接 {processor.db_pool.checkouts - checkouts}, {seconds * 1000:.1f} ms"
+            )
+    print(f"  合计: 建立连接 {db.connects}, 取用连接 {processor.db_pool.checkouts}, 总耗时 {total_seconds:.2f}s")
@@ -0,0 +1,115 @@
+# workers/benchmarks/grading.py - 判分结果写入：逐题 UPDATE vs UPDATE ... FROM (VALUES)
+
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from db_pool import ConnectionPool
+from local_postgres import LocalDatabase
+
+
+def _grading_db(path: str, sheets: int, questions: int):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE answer_sheets (id INTEGER PRIMARY KEY, status TEXT NOT NULL DEFAULT 'processed');
+        CREATE TABLE answers (
+            id INTEGER PRIMARY KEY, sheet_id INTEGER, question_id INTEGER,
+            is_correct BOOLEAN, score NUMERIC(6,2)
+        );
+        CREATE INDEX idx_answers_sheet_qid ON answers(sheet_id, question_id);
+    """)
+    conn.executemany("INSERT INTO answer_sheets (id) VALUES (?)", [(i + 1,) for i in range(sheets)])
+    conn.executemany(
+        "INSERT INTO answers (sheet_id, question_id) VALUES (?, ?)",
+        [(i + 1, q + 1) for i in range(sheets) for q in range(questions)]
+    )
+    conn.commit()
+    return conn
+
+
+def _write_per_answer(conn, sheet_grades):
+    """改造前：每道题一条 UPDATE 并单独提交，答题卡状态再单独提交"""
+    for sheet_id, grades in sheet_grades.items():
+        for question_id, is_correct, score in grades:
+            conn.execute(
+                "UPDATE answers SET is_correct = ?, score = ? WHERE sheet_id = ? AND question_id = ?",
+                (is_correct, score, sheet_id, question_id)
+            )
+            conn.commit()
+        conn.execute("UPDATE answer_sheets SET status = 'graded' WHERE id = ?", (sheet_id,))
+        conn.commit()
+
+
+def _write_set_based(conn, sheet_grades, page_size: int):
+    """与 AutoGradeProcessor.save_grades 相同的语句形态：UPDATE ... FROM (VALUES ...) + 状态更新，一个事务"""
+    rows = [
+        (sheet_id, question_id, is_correct, score)
+        for sheet_id, grades in sheet_grades.items()
+        for question_id, is_correct, score in grades
+    ]
+    for start in range(0, len(rows), page_size):
+        page = rows[start:start + page_size]
+        conn.execute(
+            f"""
+            UPDATE answers AS a SET is_correct = v.is_correct, score = v.score
+            FROM (SELECT column1 AS sheet_id, column2 AS question_id, column3 AS is_correct, column4 AS score
+                  FROM (VALUES {",".join(["(?, ?, ?, ?)"] * len(page))})) AS v
+            WHERE a.sheet_id = v.sheet_id AND a.question_id = v.question_id
+            """,
+            [value for row in page for value in row]
+        )
+    sheet_ids = list(sheet_grades)
+    conn.execute(
+        f"UPDATE answer_sheets SET status = 'graded' WHERE id IN ({','.join('?' * len(sheet_ids))})",
+        sheet_ids
+    )
+    conn.commit()
+
+
+def bench_grading(sheets: int, questions: int, batch: int):
+    from omr_worker import AutoGradeProcessor, GRADE_PAGE_SIZE
+
+    logging.getLogger("omr_worker").setLevel(logging.WARNING)
+    processor = AutoGradeProcessor()
+    answers = [{"question_id": q + 1, "parsed_json": ["A" if q % 3 else "B"]} for q in range(questions)]
+    grades = processor.grade_answers(answers)
+    all_grades = {sheet_id: grades for sheet_id in range(1, sheets + 1)}
+    print(f"=== 判分结果写入基准: {sheets} 张答题卡 x {questions} 道题 ===")
+
+    # PostgreSQL 语句往返与提交次数（进程内替身统计）
+    db = LocalDatabase(questions, connect_ms=0)
+    processor.db_pool = ConnectionPool(dsn="local://", connect=db.connect)
+    processor.save_grades({1: grades})
+    print(
+        f"  save_grades 单张: {db.statements} 条语句 / {db.commits} 次提交"
+        f"（改造前 {questions + 1} 条语句 / {questions + 1} 次提交 / {questions + 1} 次建连）"
+    )
+
+    # SQLite 文件库上的实际写入耗时（每次提交都落盘，近似 PostgreSQL 的 WAL 同步提交）
+    strategies = (
+        ("逐题 UPDATE + 逐题提交", lambda conn: _write_per_answer(conn, all_grades)),
+        ("单张 UPDATE ... FROM (VALUES)", lambda conn: [
+            _write_set_based(conn, {sheet_id: grades}, GRADE_PAGE_SIZE) for sheet_id in all_grades
+        ]),
+        (f"每 {batch} 张一批", lambda conn: [
+            _write_set_based(conn, {sheet_id: grades for sheet_id in range(first, min(first + batch, sheets + 1))},
+                             GRADE_PAGE_SIZE)
+            for first in range(1, sheets + 1, batch)
+        ]),
+    )
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, (label, write) in enumerate(strategies):
+            conn = _grading_db(os.path.join(tmp, f"grading_{index}.db"), sheets, questions)
+            start = time.perf_counter()
+            write(conn)
+            seconds = time.perf_counter() - start
+            graded = conn.execute("SELECT COUNT(*) FROM answers WHERE score IS NOT NULL").fetchone()[0]
+            conn.close()
+            baseline = baseline or seconds
+            print(
+                f"  {label:<28}: {seconds:7.2f}s, {sheets / seconds:8.0f} 张/秒 "
+                f"(x{baseline / seconds:.0f}), 已写入 {graded} 题"
+            )
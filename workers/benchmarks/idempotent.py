@@ -0,0 +1,63 @@
+# workers/benchmarks/idempotent.py - 幂等执行：重复投递的任务是否被重新判分
+
+import logging
+import random
+import time
+
+from answer_key_cache import AnswerKeyCache
+from benchmarks.common import BenchBroker, BenchTaskQueue
+from db_pool import ConnectionPool
+from idempotency import CLAIMED, Claim, IdempotencyStore
+from local_postgres import LocalDatabase
+from task_manager import TaskType, create_auto_grade_task
+
+
+class NoIdempotencyStore:
+    """原实现：不记录 task_id，每次投递都重新处理"""
+
+    def claim(self, task):
+        return Claim(CLAIMED)
+
+    def complete(self, cur, task, result=None):
+        pass
+
+    def release(self, task):
+        pass
+
+
+def bench_idempotency(tasks: int, duplicate_ratio: float, questions: int, concurrency: int = 4):
+    from omr_worker import AutoGradeProcessor
+
+    duplicates = int(tasks * duplicate_ratio)
+    print(
+        f"=== 幂等执行基准: {tasks} 个判分任务 x {questions} 道题，其中 {duplicates} 个被重复投递"
+        f"（broker 重连/重复发布），并发 {concurrency} ==="
+    )
+    logging.getLogger("omr_worker").setLevel(logging.WARNING)
+    logging.getLogger("idempotency").setLevel(logging.WARNING)
+    answers = [{"question_id": i + 1, "parsed_json": ["A"]} for i in range(questions)]
+    for label, store_factory in (("不记录 task_id（原实现）", lambda pool: NoIdempotencyStore()),
+                                 ("task_executions 认领", IdempotencyStore)):
+        db = LocalDatabase(questions, connect_ms=0)
+        processor = AutoGradeProcessor()
+        processor.db_pool = ConnectionPool(dsn="local://", connect=db.connect)
+        processor.answer_keys = AnswerKeyCache(processor.db_pool, listen=False)
+        processor.idempotency = store_factory(processor.db_pool)
+        broker = BenchBroker()
+        queue = BenchTaskQueue(broker)
+        published = [create_auto_grade_task(i + 1, answers) for i in range(tasks)]
+        for task in published:
+            queue.publish_task(task)
+        # 重复投递的消息与原消息 task_id 相同
+        for task in random.Random(0).sample(published, duplicates):
+            queue.publish_task(task)
+
+        start = time.perf_counter()
+        queue.consume_tasks(TaskType.AUTO_GRADE, processor.process_task, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        graded = db.answer_updates // questions
+        stats = processor.idempotency.stats() if hasattr(processor.idempotency, "stats") else {}
+        print(
+            f"  {label:<16}: 判分写入 {graded} 次（{tasks} 张答题卡，重复 {graded - tasks} 次）, "
+            f"跳过重复投递 {stats.get('duplicates_skipped', 0)}, 确认 {broker.acked}, 耗时 {elapsed:5.2f}s"
+        )
@@ -0,0 +1,99 @@
+# workers/benchmarks/pages.py - 多页 PDF/TIFF：整份解码 vs 逐页解码并行处理的耗时和峰值内存，失败后按页续跑
+
+import logging
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from benchmarks.common import LocalObjectStore
+from db_pool import ConnectionPool
+from document_pages import HAS_PDFIUM, iter_pages, map_pages
+from idempotency import IdempotencyStore
+from local_postgres import LocalDatabase
+from object_store import CropUploader
+from task_manager import create_ingest_task
+
+
+def _ingest_processor(store: LocalObjectStore, db: LocalDatabase):
+    from ingest_worker import IngestProcessor
+
+    processor = IngestProcessor.__new__(IngestProcessor)
+    processor.minio_client = store
+    processor.crop_uploader = CropUploader(store)
+    processor.db_pool = ConnectionPool(dsn="local://", connect=db.connect)
+    processor.idempotency = IdempotencyStore(processor.db_pool)
+    return processor
+
+
+def bench_pages(pages: int, dpi: int, concurrency_levels):
+    from synthetic_sheets import scanned_document
+
+    for name in ("ingest_worker", "object_store", "document_pages", "idempotency"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+    kinds = ["tiff", "pdf"] if HAS_PDFIUM else ["tiff"]
+    print(f"=== 多页文档基准: {pages} 页 A4 扫描件（{dpi}dpi），拆题流程（版面分析、分割、切图编码上传） ===")
+    if not HAS_PDFIUM:
+        print("  未安装 pypdfium2，只测试 TIFF")
+    store = LocalObjectStore()
+    db = LocalDatabase(questions=0, connect_ms=0)
+    processor = _ingest_processor(store, db)
+    for kind in kinds:
+        data = scanned_document(kind, pages, dpi)
+        print(f"  --- {kind.upper()}（{len(data) / 1024 / 1024:.1f} MB）---")
+
+        # 整份解码后逐页处理：内存中同时保留所有页面图像
+        tracemalloc.start()
+        start = time.perf_counter()
+        if kind == "tiff":
+            ok, images = cv2.imdecodemulti(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        else:
+            images = [page.image for page in iter_pages(data, dpi=dpi)]
+        questions = sum(len(processor.process_page(SimpleNamespace(number=i + 1, image=image)))
+                        for i, image in enumerate(images))
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        images = None
+        print(f"  整份解码后处理   : {seconds:6.2f}s, 峰值内存 {peak / 1024 / 1024:7.1f} MB, 题目 {questions}")
+
+        for concurrency in concurrency_levels:
+            tracemalloc.start()
+            start = time.perf_counter()
+            questions = sum(len(result) for _, result, _ in
+                            map_pages(iter_pages(data, dpi=dpi), processor.process_page, concurrency))
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  逐页解码，并行 {concurrency} 页: {seconds:6.2f}s, 峰值内存 {peak / 1024 / 1024:7.1f} MB, 题目 {questions}")
+
+    # 中途失败后重试：已保存的页不再处理，seq 在整份文档内连续
+    data = scanned_document("tiff", pages, dpi)
+    store.objects[("smart-exam", "document.tiff")] = data
+    failing_page = pages * 2 // 3
+    processed = []
+    failures = []
+    process_page = processor.process_page
+
+    def flaky_process_page(page):
+        processed.append(page.number)
+        if page.number == failing_page and not failures:
+            failures.append(page.number)
+            raise ConnectionError("模拟 OCR 服务中断")
+        return process_page(page)
+
+    processor.process_page = flaky_process_page
+    task = create_ingest_task(1, "minio://smart-exam/document.tiff", 1)
+    first = processor.process_task(task)
+    first_pages, saved = len(processed), len(db.ingest_items)
+    processed.clear()
+    second = processor.process_task(task)
+    seqs = sorted(seq for _, seq in db.ingest_items)
+    print(
+        f"  第 {failing_page} 页失败后重试: 第一次 {'成功' if first else '失败'}（处理 {first_pages} 页，保存 {saved} 道题）, "
+        f"重试{'成功' if second else '失败'}（处理 {len(processed)} 页）, "
+        f"共 {len(seqs)} 道题, seq 连续且不重复: {seqs == list(range(1, pages * 10 + 1))}"
+    )
+    processor.crop_uploader.close()
@@ -0,0 +1,101 @@
+# workers/benchmarks/priority.py - 优先级通道：批量积压下的交互任务延迟，以及批量任务的保底份额
+
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.common import BenchBroker, BenchTaskQueue
+from task_manager import TaskClass, TaskMessage, TaskType, create_ocr_omr_task, queue_names
+
+
+class SingleLaneTaskQueue(BenchTaskQueue):
+    """旧版发布方式：所有任务按先进先出进入同一个工作队列，priority 字段不起作用"""
+
+    def publish_task(self, task):
+        self.channel.basic_publish(
+            exchange='', routing_key=queue_names(task.task_type)["interactive"], body=task.to_json(),
+            properties=SimpleNamespace(message_id=task.task_id, priority=None)
+        )
+        return True
+
+
+class LatencyProcessor:
+    """记录每类任务从发布到处理完成的延迟，全部完成后停止消费"""
+
+    def __init__(self, broker: BenchBroker, total: int, work_ms: float):
+        self.broker = broker
+        self.total = total
+        self.work_seconds = work_ms / 1000
+        self.latencies = defaultdict(list)
+        self.finished_at = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def process_task(self, task: TaskMessage) -> bool:
+        time.sleep(self.work_seconds)
+        now = time.perf_counter()
+        with self._lock:
+            task_class = task.payload["task_class"]
+            self.latencies[task_class].append((now - task.payload["published_at"]) * 1000)
+            self.finished_at[task_class].append(now)
+            if sum(len(v) for v in self.latencies.values()) == self.total:
+                self.broker.add_callback_threadsafe(self.broker.stop_consuming)
+        return True
+
+
+def _priority_task(i: int, task_class: TaskClass) -> TaskMessage:
+    task = create_ocr_omr_task(i, f"minio://smart-exam/sheets/{i}.jpg", 1, i, 1, task_class=task_class)
+    task.payload.update(task_class=task_class.value, published_at=time.perf_counter())
+    return task
+
+
+def bench_priority(bulk: int, interactive_rate: float, work_ms: float, concurrency: int = 4):
+    drain_seconds = bulk * work_ms / 1000 / concurrency
+    interactive = int(interactive_rate * drain_seconds * 0.6)
+    print(
+        f"=== 优先级通道基准: {bulk} 个批量任务先入队（排空约 {drain_seconds:.1f}s），"
+        f"期间每秒 {interactive_rate:g} 个交互任务共 {interactive} 个，每个任务 {work_ms:g} ms，并发 {concurrency} ==="
+    )
+    for label, queue_class in (("单队列 FIFO（原实现）", SingleLaneTaskQueue), ("优先级通道", BenchTaskQueue)):
+        broker = BenchBroker(stop_when_idle=False)
+        queue = queue_class(broker)
+        processor = LatencyProcessor(broker, bulk + interactive, work_ms)
+        for i in range(bulk):
+            queue.publish_task(_priority_task(i, TaskClass.BULK))
+
+        def publish_interactive():
+            for i in range(interactive):
+                time.sleep(1 / interactive_rate)
+                queue.publish_task(_priority_task(bulk + i, TaskClass.INTERACTIVE))
+
+        publisher = threading.Thread(target=publish_interactive)
+        start = time.perf_counter()
+        publisher.start()
+        queue.consume_tasks(TaskType.OCR_OMR, processor.process_task, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        publisher.join()
+        latencies = processor.latencies[TaskClass.INTERACTIVE.value]
+        print(
+            f"  {label:<14}: 交互任务延迟 p50 {np.percentile(latencies, 50):7.1f} ms, "
+            f"p95 {np.percentile(latencies, 95):7.1f} ms; 全部完成 {elapsed:5.2f}s"
+        )
+
+    # 交互任务积压时批量任务是否被饿死：两类任务同时大量入队
+    flood = bulk // 4
+    print(f"  --- 交互任务积压: {flood} 个交互任务和 {flood} 个批量任务同时入队 ---")
+    for bulk_share in (0.0, 0.2):
+        broker = BenchBroker(stop_when_idle=False)
+        queue = BenchTaskQueue(broker)
+        processor = LatencyProcessor(broker, 2 * flood, work_ms)
+        for i in range(flood):
+            queue.publish_task(_priority_task(i, TaskClass.INTERACTIVE))
+            queue.publish_task(_priority_task(flood + i, TaskClass.BULK))
+        queue.consume_tasks(TaskType.OCR_OMR, processor.process_task, concurrency=concurrency, bulk_share=bulk_share)
+        interactive_done = max(processor.finished_at[TaskClass.INTERACTIVE.value])
+        bulk_during = sum(t < interactive_done for t in processor.finished_at[TaskClass.BULK.value])
+        print(
+            f"  bulk_share={bulk_share:<4}: 交互积压期间完成批量任务 {bulk_during}/{flood}, "
+            f"交互任务 p95 {np.percentile(processor.latencies[TaskClass.INTERACTIVE.value], 95):7.1f} ms"
+        )
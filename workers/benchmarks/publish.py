@@ -0,0 +1,53 @@
+# workers/benchmarks/publish.py - 批量发布：publisher confirms 的确认窗口和通道池对吞吐的影响
+
+import logging
+import time
+
+from benchmarks.common import BenchBroker, BenchTaskQueue
+from task_manager import TaskPublisher, TaskType, create_ocr_omr_task, queue_names
+
+
+def bench_publish(tasks: int, rtt_ms: float, nack_rate: float):
+    print(f"=== 批量发布基准: {tasks} 个任务，broker 确认往返 {rtt_ms}ms ===")
+    logging.getLogger("task_manager").setLevel(logging.CRITICAL)
+    published = [create_ocr_omr_task(i, f"minio://smart-exam/sheets/{i}.jpg", 1, i, 1) for i in range(tasks)]
+
+    def queued(broker):
+        names = queue_names(TaskType.OCR_OMR)
+        return broker.queued(names["interactive"], names["bulk"])
+
+    broker = BenchBroker(confirm_rtt=rtt_ms / 1000)
+    queue = BenchTaskQueue(broker)
+    start = time.perf_counter()
+    for task in published:
+        queue.publish_task(task)
+    elapsed = time.perf_counter() - start
+    print(f"  {'publish_task 逐条（无确认）':<24}: {tasks / elapsed:8.0f} 条/s, 入队 {queued(broker)}, 没有送达保证")
+
+    for label, window, pool_size, rate in (
+        ("逐条确认（window=1）", 1, 1, 0.0),
+        ("window=100", 100, 1, 0.0),
+        ("window=500", 500, 1, 0.0),
+        ("window=500, 2 个通道", 500, 2, 0.0),
+        (f"window=500, nack {nack_rate:.0%}", 500, 1, nack_rate),
+    ):
+        broker = BenchBroker()
+        BenchTaskQueue(broker)
+        publisher = TaskPublisher(
+            pool_size=pool_size, window=window,
+            connect=lambda: broker.connect(confirm_rtt=rtt_ms / 1000, nack_rate=rate)
+        )
+        start = time.perf_counter()
+        results = publisher.publish(published)
+        elapsed = time.perf_counter() - start
+        line = (
+            f"  {label:<24}: {tasks / elapsed:8.0f} 条/s, 确认 {results.count(True)}, "
+            f"失败 {results.count(False)}, 入队 {queued(broker)}"
+        )
+        if rate:
+            # 只重发未确认的任务
+            retry = [task for task, ok in zip(published, results) if not ok]
+            retried = TaskPublisher(window=window, connect=lambda: broker.connect(confirm_rtt=rtt_ms / 1000)).publish(retry)
+            line += f", 重发失败任务后确认 {retried.count(True)}/{len(retry)}, 入队 {queued(broker)}"
+        print(line)
+        publisher.close()
@@ -0,0 +1,78 @@
+# workers/benchmarks/retry.py - 失败重试：立即重试 vs 指数退避延迟队列，以及死信回放
+
+import logging
+import threading
+import time
+
+from benchmarks.common import BenchBroker, BenchTaskQueue
+from task_manager import TaskMessage, TaskType, create_ocr_omr_task
+
+
+class ImmediateRetryTaskQueue(BenchTaskQueue):
+    """旧版重试方式：失败后立即重新发布到工作队列"""
+
+    def publish_retry(self, task):
+        return 0.0 if self.publish_task(task) else None
+
+
+class OutageProcessor:
+    """模拟依赖（如 MinIO）在开始后的一段时间内不可用：期间所有任务失败"""
+
+    def __init__(self, outage_seconds: float, work_ms: float = 5):
+        self.outage_seconds = outage_seconds
+        self.work_seconds = work_ms / 1000
+        self.started_at = None
+        self.attempts = 0
+        self.failed_attempts = 0
+        self.completed = set()
+        self._lock = threading.Lock()
+
+    def process_task(self, task: TaskMessage) -> bool:
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.perf_counter()
+            self.attempts += 1
+            failing = time.perf_counter() - self.started_at < self.outage_seconds
+            self.failed_attempts += failing
+        time.sleep(self.work_seconds)
+        if not failing:
+            with self._lock:
+                self.completed.add(task.task_id)
+        return not failing
+
+
+def bench_retry(tasks: int, outage_ms: float, base_delay_ms: float, concurrency: int = 4):
+    print(
+        f"=== 失败重试基准: {tasks} 个任务，依赖在开始后 {outage_ms / 1000:.1f}s 内不可用，"
+        f"max_retries=3，并发 {concurrency} ==="
+    )
+    logging.getLogger("task_manager").setLevel(logging.CRITICAL)
+    for label, queue_class in (("立即重试（原实现）", ImmediateRetryTaskQueue), ("延迟重试队列", BenchTaskQueue)):
+        broker = BenchBroker()
+        queue = queue_class(broker)
+        queue.retry_base_delay = base_delay_ms / 1000
+        queue.retry_max_delay = base_delay_ms / 1000 * 8
+        processor = OutageProcessor(outage_ms / 1000)
+        task_ids = set()
+        for i in range(tasks):
+            task = create_ocr_omr_task(i, f"minio://smart-exam/sheets/{i}.jpg", 1, i, 1)
+            task_ids.add(task.task_id)
+            queue.publish_task(task)
+
+        start = time.perf_counter()
+        queue.consume_tasks(TaskType.OCR_OMR, processor.process_task, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        dead = queue.channel.queue_declare(queue="ocr_omr_dlq", passive=True).method.message_count
+        print(
+            f"  {label:<10}: 耗时 {elapsed:5.2f}s, 处理 {processor.attempts} 次（故障期间失败 {processor.failed_attempts} 次）, "
+            f"完成 {len(processor.completed)}, 进入死信 {dead}"
+        )
+
+        if dead:
+            # 依赖恢复后分批回放死信队列，task_id 不变
+            stats = queue.replay_dead_letters(TaskType.OCR_OMR, batch_size=50, interval=0)
+            queue.consume_tasks(TaskType.OCR_OMR, processor.process_task, concurrency=concurrency)
+            print(
+                f"  {'':<10}  回放死信 {stats['replayed']} 条后完成 {len(processor.completed)}, "
+                f"task_id 保持不变: {processor.completed <= task_ids}"
+            )
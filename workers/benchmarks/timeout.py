@@ -0,0 +1,56 @@
+# workers/benchmarks/timeout.py - 任务超时：卡住的任务占用执行槽 vs 看门狗超时重试
+
+import functools
+import logging
+import time
+
+from benchmarks.common import BenchBroker, BenchTaskQueue
+from task_manager import TaskMessage, TaskType, create_ocr_omr_task
+
+
+class HangingProcessor:
+    """按比例模拟卡住的任务（如无响应的 HTTP 回调）：首次处理时阻塞 hang_ms，重试时正常完成"""
+
+    def __init__(self, hang_ms: float, work_ms: float = 20):
+        self.hang_seconds = hang_ms / 1000
+        self.work_seconds = work_ms / 1000
+
+    def process_task(self, task: TaskMessage) -> bool:
+        if task.payload.get("hang") and task.retry_count == 0:
+            time.sleep(self.hang_seconds)
+        else:
+            time.sleep(self.work_seconds)
+        return True
+
+
+def bench_timeout(tasks: int, hang_ratio: float, hang_ms: float, timeout: float, executor: str,
+                  concurrency: int = 4, work_ms: float = 20):
+    hanging = int(tasks * hang_ratio)
+    print(
+        f"=== 任务超时基准: {tasks} 个任务（{hanging} 个首次处理卡住 {hang_ms / 1000:g}s，重试正常），"
+        f"每个 {work_ms:g} ms，并发 {concurrency}，执行器 {executor} ==="
+    )
+    logging.getLogger("task_manager").setLevel(logging.CRITICAL)
+    factory = functools.partial(HangingProcessor, hang_ms, work_ms)
+    for label, task_timeout in (("不限制（原实现）", 3600), (f"看门狗 {timeout:g}s", timeout)):
+        broker = BenchBroker()
+        queue = BenchTaskQueue(broker)
+        queue.retry_base_delay = 0.1
+        for i in range(tasks):
+            task = create_ocr_omr_task(i, f"minio://smart-exam/sheets/{i}.jpg", 1, i, 1)
+            task.timeout_seconds = task_timeout
+            task.payload["hang"] = bool(hanging) and i % (tasks // hanging) == 0
+            queue.publish_task(task)
+
+        start = time.perf_counter()
+        queue.consume_tasks(
+            TaskType.OCR_OMR, factory().process_task, concurrency=concurrency,
+            executor=executor, processor_factory=factory
+        )
+        elapsed = time.perf_counter() - start
+        stats = queue.durations.snapshot().get(TaskType.OCR_OMR.value, {})
+        print(
+            f"  {label:<10}: 全部完成 {elapsed:5.2f}s, 吞吐 {tasks / elapsed:6.1f} 个/秒, "
+            f"超时 {stats.get('timeouts', 0)} 次, 耗时 p95 <= {stats.get('p95')}s, 最长 {stats.get('max')}s"
+        )
+        print(f"  {'':<10}  耗时直方图: {stats.get('buckets')}")
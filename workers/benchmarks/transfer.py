@@ -0,0 +1,87 @@
+# workers/benchmarks/transfer.py - 对象传输：临时文件 vs 内存中下载、解码、编码、上传
+
+import logging
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.common import LocalObjectStore
+from object_store import CropUploader
+
+
+def _process_write_bytes() -> int:
+    """本进程通过 write() 系统调用写出的字节数（含 tmpfs），取自 /proc/self/io 的 wchar"""
+    with open("/proc/self/io") as f:
+        for line in f:
+            if line.startswith("wchar:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _legacy_ingest_transfer(store: LocalObjectStore, file_uri: str, tmp_dir: str) -> int:
+    """改造前：fget_object 落盘 → cv2.imread → 每张切图 cv2.imwrite → fput_object，返回产生的临时文件数"""
+    local_path = os.path.join(tmp_dir, file_uri.split('/')[-1])
+    store.fget_object("smart-exam", file_uri.split('/')[-1], local_path)
+    image = cv2.imread(local_path)
+    height = image.shape[0]
+    for i in range(10):
+        crop_path = os.path.join(tmp_dir, f"ingest_question_{i + 1}.jpg")
+        cv2.imwrite(crop_path, image[int(height * 0.1) + i * height * 8 // 100:int(height * 0.1) + (i + 1) * height * 8 // 100])
+        store.fput_object("smart-exam", f"ingest/ingest_question_{i + 1}.jpg", crop_path)
+    os.remove(local_path)
+    return 11
+
+
+def bench_transfer(tasks: int):
+    from ingest_worker import IngestProcessor
+    from object_store import load_image
+
+    logging.getLogger("ingest_worker").setLevel(logging.WARNING)
+    logging.getLogger("object_store").setLevel(logging.WARNING)
+    store = LocalObjectStore()
+    rng = np.random.default_rng(0)
+    page = cv2.GaussianBlur(rng.integers(0, 255, size=(1600, 1200, 3), dtype=np.uint8), (9, 9), 0)
+    uris = []
+    for i in range(tasks):
+        # 每页内容不同（每道题区域写上页码），用于检查切图是否互相覆盖
+        sheet = page.copy()
+        for q in range(10):
+            cv2.putText(sheet, f"{i}-{q}", (40, 200 + q * 128), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+        ok, buffer = cv2.imencode(".jpg", sheet, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        store.objects[("smart-exam", f"page_{i}.jpg")] = buffer.tobytes()
+        uris.append(f"/uploads/page_{i}.jpg")
+    print(f"=== 对象传输基准: {tasks} 个拆题任务（每页 1200x1600，10 张切图） ===")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        written = _process_write_bytes()
+        start = time.perf_counter()
+        files = sum(_legacy_ingest_transfer(store, uri, tmp) for uri in uris)
+        seconds = time.perf_counter() - start
+        written = _process_write_bytes() - written
+        legacy_crops = sum(1 for _, name in store.objects if name.startswith("ingest/"))
+        print(
+            f"  临时文件（改造前）: 每任务写入 {written / tasks / 1024:.0f} KiB / {files // tasks} 个文件, "
+            f"{seconds / tasks * 1000:.1f} ms/任务, 切图对象 {legacy_crops} 个（同名互相覆盖）"
+        )
+
+    # 只用到 minio_client，不连接数据库和真实 MinIO
+    processor = IngestProcessor.__new__(IngestProcessor)
+    processor.minio_client = store
+    processor.crop_uploader = CropUploader(store)
+    layout_info = {"detected_regions": []}
+    written = _process_write_bytes()
+    start = time.perf_counter()
+    crop_uris = set()
+    for uri in uris:
+        image = load_image(store, uri)
+        crop_uris.update(q["crop_uri"] for q in processor.segment_questions(image, layout_info))
+    seconds = time.perf_counter() - start
+    written = _process_write_bytes() - written
+    print(
+        f"  内存传输:           每任务写入 {written / tasks / 1024:.0f} KiB / 0 个文件, "
+        f"{seconds / tasks * 1000:.1f} ms/任务, 切图对象 {len(crop_uris)} 个（内容寻址）"
+    )
+    processor.crop_uploader.close()
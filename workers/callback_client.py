@@ -0,0 +1,203 @@
+# workers/callback_client.py - Worker 到后端的结果回调：持久连接和批量发送
+"""
+所有回调共用一个 requests.Session（连接池，HTTP keep-alive），不再每次回调建立新的 TCP 连接。
+
+多个任务线程同时完成时，回调合并为一次请求发往批量端点 /internal/ocr-omr/callback/batch，
+后端在同一个事务中处理整批答题卡。待发送的回调达到 batch_size 条或最早的一条等待超过 flush_interval 秒时发出；
+调用方等待自己那一条的结果（send 返回 True/False），失败的任务照常进入重试，后端按 task_id 去重。
+
+batch_size 默认不超过本进程同时处理的任务数（进程池模式下每个子进程同一时刻只处理一个任务，即不合并），
+凑不满一批的回调最多等待 flush_interval 秒。后端没有批量端点（404/405）时退回逐条发送。
+"""
+
+import os
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND_URL = "http://backend:8000"
+CALLBACK_PATH = "/internal/ocr-omr/callback"
+BATCH_CALLBACK_PATH = "/internal/ocr-omr/callback/batch"
+
+# 后端返回的这些状态表示结果已入库（duplicate 为重复回调，之前已处理）
+DELIVERED = ("success", "duplicate")
+
+
+def _tasks_in_flight() -> int:
+    """本进程同时处理的任务数"""
+    if os.getenv("WORKER_EXECUTOR", "thread") == "process":
+        return 1
+    return int(os.getenv("WORKER_CONCURRENCY", "1"))
+
+
+class CallbackClient:
+    """结果回调客户端（线程安全），统计信息按进程累计"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        timeout: float = 30.0,
+        session: Optional[requests.Session] = None,
+        concurrency: Optional[int] = None
+    ):
+        # 本进程同时处理的任务数：决定默认批量大小和连接池大小
+        concurrency = concurrency or _tasks_in_flight()
+        self.base_url = (base_url or os.getenv("BACKEND_URL", DEFAULT_BACKEND_URL)).rstrip("/")
+        self.batch_size = batch_size or min(int(os.getenv("CALLBACK_BATCH_SIZE", "20")), concurrency)
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else float(os.getenv("CALLBACK_FLUSH_INTERVAL", "0.02"))
+        )
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(4, concurrency))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.batch_supported = True
+        # 待发送的 (回调内容, Future)，以及最早一条的入队时间
+        self._pending: List[Tuple[Dict[str, Any], Future]] = []
+        self._first_at = 0.0
+        self._cond = threading.Condition()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        # 统计信息
+        self.sent = 0
+        self.failed = 0
+        self.requests = 0
+
+    def send(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> bool:
+        """发送一条回调并等待结果；timeout 为等待秒数（默认 self.timeout）"""
+        if self.batch_size <= 1:
+            return self._post_one(payload, timeout)
+        future = self.submit(payload)
+        try:
+            return future.result(timeout=timeout if timeout is not None else self.timeout)
+        except Exception as e:
+            logger.error(f"等待回调结果超时: {e}")
+            return False
+
+    def submit(self, payload: Dict[str, Any]) -> Future:
+        """回调加入待发送批次，返回结果的 Future（True 表示后端已处理）"""
+        future: Future = Future()
+        batch = None
+        with self._cond:
+            if self._closed:
+                future.set_result(False)
+                return future
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append((payload, future))
+            if len(self._pending) >= self.batch_size:
+                batch, self._pending = self._pending, []
+            else:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name="callback-flusher", daemon=True)
+                    self._flusher.start()
+                self._cond.notify()
+        if batch:
+            # 凑满一批：在当前线程直接发送
+            self._flush(batch)
+        return future
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                wait = self._first_at + self.flush_interval - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                batch, self._pending = self._pending, []
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[Dict[str, Any], Future]]):
+        payloads = [payload for payload, _ in batch]
+        results = None
+        if self.batch_supported and len(batch) > 1:
+            results = self._post_batch(payloads)
+        if results is None:
+            results = [self._post_one(payload) for payload in payloads]
+        for (_, future), ok in zip(batch, results):
+            future.set_result(ok)
+
+    def _post_batch(self, payloads: List[Dict[str, Any]]) -> Optional[List[bool]]:
+        """发送一批回调；后端不支持批量端点时返回 None"""
+        try:
+            response = self.session.post(
+                self.base_url + BATCH_CALLBACK_PATH,
+                json={"results": payloads},
+                timeout=self.timeout
+            )
+            with self._cond:
+                self.requests += 1
+            if response.status_code in (404, 405):
+                logger.warning("后端不支持批量回调，改为逐条发送")
+                self.batch_supported = False
+                return None
+            if response.status_code != 200:
+                logger.error(f"批量回调发送失败，状态码: {response.status_code}")
+                results = [False] * len(payloads)
+            else:
+                items = response.json().get("results", [])
+                results = [item.get("status") in DELIVERED for item in items]
+                results += [False] * (len(payloads) - len(results))
+                for payload, item in zip(payloads, items):
+                    if item.get("status") not in DELIVERED:
+                        logger.error(f"回调处理失败，任务 {payload.get('task_id')}: {item.get('message')}")
+        except Exception as e:
+            logger.error(f"发送批量回调失败: {e}")
+            results = [False] * len(payloads)
+
+        with self._cond:
+            self.sent += results.count(True)
+            self.failed += results.count(False)
+        logger.info(f"批量回调 {len(payloads)} 条，成功 {results.count(True)} 条")
+        return results
+
+    def _post_one(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> bool:
+        ok = False
+        try:
+            response = self.session.post(
+                self.base_url + CALLBACK_PATH,
+                json=payload,
+                timeout=timeout if timeout is not None else self.timeout
+            )
+            ok = response.status_code == 200
+            if ok:
+                logger.info(f"回调发送成功，任务 {payload.get('task_id')}")
+            else:
+                logger.error(f"回调发送失败，状态码: {response.status_code}")
+        except Exception as e:
+            logger.error(f"发送回调失败: {e}")
+        with self._cond:
+            self.requests += 1
+            self.sent += ok
+            self.failed += not ok
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"sent": self.sent, "failed": self.failed, "requests": self.requests}
+
+    def close(self):
+        """发出剩余的回调并关闭连接"""
+        with self._cond:
+            self._closed = True
+            batch, self._pending = self._pending, []
+            self._cond.notify_all()
+        if batch:
+            self._flush(batch)
+        self.session.close()
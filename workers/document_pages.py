@@ -0,0 +1,176 @@
+# workers/document_pages.py - 多页文档（PDF、多页 TIFF）按页惰性解码和逐页并行处理
+"""
+扫描件可能是单张图片，也可能是几十页的 PDF 或多页 TIFF。整份文档一次解码成图像会占用
+页数 × 单页大小的内存（300dpi 的 A4 彩色页约 26MB），这里改为逐页解码：
+
+    for number, result, error in map_pages(iter_pages(data), handler):
+        ...  # 每页处理完立即保存
+
+iter_pages 每次只解码一页（PDF 按 DOCUMENT_DPI 光栅化，TIFF 用 Pillow 逐帧解码），map_pages 最多同时处理
+PAGE_CONCURRENCY 页，有空位时才解码下一页，内存中的页面图像数与文档页数无关。
+原始文件字节仍整体读入内存（压缩后的扫描件通常只有每页几百 KB）。
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Container, Iterator, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from task_watchdog import with_current_deadline
+
+# PDF 光栅化
+try:
+    import pypdfium2 as pdfium
+    HAS_PDFIUM = True
+except ImportError:
+    HAS_PDFIUM = False
+    pdfium = None
+
+logger = logging.getLogger(__name__)
+
+# PDF 光栅化分辨率；TIFF 按扫描时的分辨率解码
+DOCUMENT_DPI = int(os.getenv("DOCUMENT_DPI", "200"))
+# 每个任务同时处理的页数（同时在内存中的页面图像数）
+PAGE_CONCURRENCY = int(os.getenv("PAGE_CONCURRENCY", "2"))
+
+IMAGE = "image"
+PDF = "pdf"
+TIFF = "tiff"
+
+TIFF_MAGIC = (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+")
+
+# pdfium 不是线程安全的：同一进程内所有 PDF 的打开、光栅化和关闭串行执行
+_pdfium_lock = threading.Lock()
+
+
+class Page(NamedTuple):
+    # 页码从 1 开始
+    number: int
+    image: np.ndarray
+    # 文档总页数
+    total: Optional[int] = None
+
+
+def document_format(data: bytes) -> str:
+    """按文件头判断文档格式：pdf、tiff，其余按单张图片处理"""
+    if b"%PDF-" in data[:1024]:
+        return PDF
+    if data[:4] in TIFF_MAGIC:
+        return TIFF
+    return IMAGE
+
+
+def iter_pages(data: bytes, dpi: Optional[int] = None, skip: Container[int] = (),
+               flags: int = cv2.IMREAD_COLOR) -> Iterator[Page]:
+    """
+    按页解码文档，每次迭代只解码一页
+
+    dpi: PDF 光栅化分辨率（默认 DOCUMENT_DPI）
+    skip: 不需要解码的页码（如重试时已保存结果的页）
+    """
+    kind = document_format(data)
+    if kind == PDF:
+        yield from _iter_pdf_pages(data, dpi or DOCUMENT_DPI, skip)
+    elif kind == TIFF:
+        yield from _iter_tiff_pages(data, skip, flags)
+    elif 1 not in skip:
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+        if image is None:
+            raise ValueError("无法解码图像文件")
+        yield Page(1, image, 1)
+
+
+def _iter_pdf_pages(data: bytes, dpi: int, skip: Container[int]) -> Iterator[Page]:
+    if not HAS_PDFIUM:
+        raise RuntimeError("处理 PDF 需要安装 pypdfium2")
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(data)
+        total = len(pdf)
+    logger.info(f"PDF 共 {total} 页，按 {dpi}dpi 逐页光栅化")
+    try:
+        for index in range(total):
+            if index + 1 in skip:
+                continue
+            with _pdfium_lock:
+                page = pdf[index]
+                try:
+                    bitmap = page.render(scale=dpi / 72)
+                    # 复制出 pdfium 的缓冲区，随后释放位图
+                    image = bitmap.to_numpy().copy()
+                    bitmap.close()
+                finally:
+                    page.close()
+            yield Page(index + 1, image, total)
+    finally:
+        with _pdfium_lock:
+            pdf.close()
+
+
+def _iter_tiff_pages(data: bytes, skip: Container[int], flags: int) -> Iterator[Page]:
+    # requirements.txt 固定的 opencv-python 4.8 的 imdecodemulti 只能一次解码全部页，这里用 Pillow 逐帧解码
+    try:
+        tiff = Image.open(io.BytesIO(data))
+        total = getattr(tiff, "n_frames", 1)
+    except (OSError, SyntaxError) as e:
+        raise ValueError("无法解码 TIFF 文件") from e
+    with tiff:
+        for index in range(total):
+            if index + 1 in skip:
+                continue
+            try:
+                tiff.seek(index)
+                image = _pil_to_cv2(tiff, flags)
+            except (OSError, EOFError, SyntaxError) as e:
+                raise ValueError(f"无法解码 TIFF 第 {index + 1} 页") from e
+            yield Page(index + 1, image, total)
+            image = None
+
+
+def _pil_to_cv2(image: Image.Image, flags: int) -> np.ndarray:
+    """Pillow 图像转为与 cv2.imdecode 相同的数组：IMREAD_GRAYSCALE 为单通道，其余为 BGR 三通道"""
+    if flags == cv2.IMREAD_GRAYSCALE:
+        return np.array(image.convert("L"))
+    return cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+def map_pages(
+    pages: Iterator[Page],
+    handler: Callable[[Page], Any],
+    concurrency: Optional[int] = None
+) -> Iterator[Tuple[int, Any, Optional[BaseException]]]:
+    """
+    逐页并行处理，按完成顺序产出 (页码, 结果, 异常)；某一页失败不影响其他页
+
+    同时处理的页数不超过 concurrency（默认 PAGE_CONCURRENCY），有页面处理完才解码下一页；
+    handler 在线程池中执行，沿用调用线程的任务截止时间（check_deadline 照常生效）
+    """
+    concurrency = concurrency or PAGE_CONCURRENCY
+    handler = with_current_deadline(handler)
+    pages = iter(pages)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="page")
+    pending = {}
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < concurrency:
+                page = next(pages, None)
+                if page is None:
+                    exhausted = True
+                    break
+                pending[executor.submit(handler, page)] = page.number
+                page = None
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                number = pending.pop(future)
+                error = future.exception()
+                yield number, None if error else future.result(), error
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
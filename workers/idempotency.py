@@ -0,0 +1,236 @@
+# workers/idempotency.py - 按 task_id 幂等执行任务（task_executions 表，见 migrations/add_task_executions.sql）
+"""
+broker 重连后的重新投递、延迟重试、死信回放都会让同一个 task_id 被再次处理。处理器开始计算前先认领任务：
+
+- 没有记录、上次失败或上次认领已过期（Worker 崩溃）：认领成功，正常处理
+- 已完成：不再计算，直接确认消息（处理器可实现 replay_completed 补发回调）
+- 另一个 Worker 正在处理（认领未过期）：抛出 TaskDeferred，消息在认领到期后重新投递再看结果，
+  不计入重试次数（否则认领期间的重复投递会耗尽 max_retries 进入死信队列）
+
+结果写入和 completed 状态在同一个事务中提交（complete 使用结果事务的 cursor），
+不会出现结果已写入但状态未更新、重复投递又写一遍的情况。多页文档每页的结果写入时用 complete_page
+记录该页（task_pages 表），任务中途失败重试时只处理没有记录的页。
+
+    class Processor:
+        def __init__(self):
+            self.db_pool = get_pool()
+            self.idempotency = IdempotencyStore(self.db_pool)
+
+        @idempotent
+        def process_task(self, task):
+            ...
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                ...  # 写入结果
+                self.idempotency.complete(cur, task, result)
+                conn.commit()
+"""
+
+import functools
+import json
+import os
+import threading
+import logging
+from typing import Any, Dict, NamedTuple, Optional
+
+from task_manager import TaskDeferred
+
+logger = logging.getLogger(__name__)
+
+CLAIMED = "claimed"
+COMPLETED = "completed"
+IN_PROGRESS = "in_progress"
+
+# 每认领多少次清理一次过期记录
+CLEANUP_EVERY = 1000
+
+
+class Claim(NamedTuple):
+    status: str
+    # 已完成任务的结果（complete 时保存）和首次处理耗时
+    result: Optional[Any] = None
+    duration_ms: Optional[int] = None
+    # 另一个 Worker 正在处理时，其认领的剩余秒数
+    lease_seconds: Optional[float] = None
+
+
+class IdempotencyStore:
+    """task_executions 表上的任务认领和完成记录，统计信息按进程累计"""
+
+    def __init__(self, db_pool, ttl: Optional[float] = None):
+        self.db_pool = db_pool
+        # 完成记录的保留秒数，超过后同一 task_id 会重新处理（默认 7 天，覆盖重试和死信回放的时间窗口）
+        self.ttl = ttl if ttl is not None else float(os.getenv("TASK_IDEMPOTENCY_TTL", str(7 * 24 * 3600)))
+        self._lock = threading.Lock()
+        # 统计信息
+        self.claims = 0
+        self.duplicates_skipped = 0
+        self.duplicates_in_flight = 0
+        self.saved_seconds = 0.0
+
+    def claim(self, task) -> Claim:
+        """认领任务；认领有效期为任务的 timeout_seconds（看门狗保证任务不会运行更久）"""
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                INSERT INTO task_executions (task_id, task_type, status, attempts, started_at, lease_until, expires_at)
+                VALUES (%s, %s, 'running', 1, NOW(), NOW() + %s * INTERVAL '1 second', NOW() + %s * INTERVAL '1 second')
+                ON CONFLICT (task_id) DO UPDATE
+                SET status = 'running',
+                    attempts = task_executions.attempts + 1,
+                    started_at = NOW(),
+                    lease_until = EXCLUDED.lease_until,
+                    expires_at = EXCLUDED.expires_at
+                WHERE task_executions.status = 'failed'
+                   OR (task_executions.status = 'running' AND task_executions.lease_until < NOW())
+                RETURNING attempts
+                """,
+                (task.task_id, task.task_type.value, task.timeout_seconds, self.ttl)
+            )
+            row = cur.fetchone()
+            if row is None:
+                cur.execute(
+                    """
+                    UPDATE task_executions SET duplicate_deliveries = duplicate_deliveries + 1
+                    WHERE task_id = %s
+                    RETURNING status, result_json, duration_ms, GREATEST(EXTRACT(EPOCH FROM lease_until - NOW()), 0)
+                    """,
+                    (task.task_id,)
+                )
+                existing = cur.fetchone()
+            conn.commit()
+            cur.close()
+
+        with self._lock:
+            self.claims += 1
+            cleanup = self.claims % CLEANUP_EVERY == 0
+        if cleanup:
+            self.cleanup()
+
+        if row is not None:
+            if row[0] > 1:
+                logger.info(f"任务 {task.task_id} 第 {row[0]} 次认领")
+            return Claim(CLAIMED)
+        if existing is not None and existing[0] == "completed":
+            result, duration_ms = existing[1], existing[2]
+            if isinstance(result, str):
+                result = json.loads(result)
+            with self._lock:
+                self.duplicates_skipped += 1
+                self.saved_seconds += (duration_ms or 0) / 1000
+            logger.info(f"任务 {task.task_id} 已完成，跳过重复投递（节省约 {(duration_ms or 0) / 1000:.1f}s）")
+            return Claim(COMPLETED, result, duration_ms)
+        # 另一个 Worker 正在处理（或记录恰好被清理）
+        with self._lock:
+            self.duplicates_in_flight += 1
+        lease_seconds = float(existing[3]) if existing is not None else None
+        logger.warning(f"任务 {task.task_id} 正在其他 Worker 上处理，认领到期后再重新投递")
+        return Claim(IN_PROGRESS, lease_seconds=lease_seconds)
+
+    def complete(self, cur, task, result: Optional[Any] = None):
+        """在结果事务内把任务标记为完成（调用方随后 commit）"""
+        cur.execute(
+            """
+            UPDATE task_executions
+            SET status = 'completed',
+                finished_at = NOW(),
+                duration_ms = (EXTRACT(EPOCH FROM NOW() - started_at) * 1000)::int,
+                result_json = %s,
+                expires_at = NOW() + %s * INTERVAL '1 second'
+            WHERE task_id = %s
+            """,
+            (json.dumps(result) if result is not None else None, self.ttl, task.task_id)
+        )
+
+    def completed_pages(self, task) -> Dict[int, Any]:
+        """多页文档任务已保存的页：{页码: complete_page 保存的结果}"""
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT page_no, result_json FROM task_pages WHERE task_id = %s", (task.task_id,))
+            rows = cur.fetchall()
+            cur.close()
+        return {
+            page_no: json.loads(result) if isinstance(result, str) else result
+            for page_no, result in rows
+        }
+
+    def complete_page(self, cur, task, page_no: int, result: Optional[Any] = None):
+        """在该页结果的事务内记录页面已完成（调用方随后 commit）；任务重试时跳过这些页"""
+        cur.execute(
+            """
+            INSERT INTO task_pages (task_id, page_no, result_json) VALUES (%s, %s, %s)
+            ON CONFLICT (task_id, page_no) DO UPDATE SET result_json = EXCLUDED.result_json, completed_at = NOW()
+            """,
+            (task.task_id, page_no, json.dumps(result) if result is not None else None)
+        )
+
+    def release(self, task):
+        """处理失败：释放认领，下一次投递（重试）可以立即重新认领；已完成的记录不受影响"""
+        try:
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "UPDATE task_executions SET status = 'failed' WHERE task_id = %s AND status = 'running'",
+                    (task.task_id,)
+                )
+                conn.commit()
+                cur.close()
+        except Exception as e:
+            # 释放失败时认领在 lease_until 后自然过期
+            logger.warning(f"释放任务 {task.task_id} 的认领失败: {e}")
+
+    def cleanup(self) -> int:
+        """删除过期的记录"""
+        try:
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute("DELETE FROM task_executions WHERE expires_at < NOW()")
+                deleted = cur.rowcount
+                conn.commit()
+                cur.close()
+        except Exception as e:
+            logger.warning(f"清理过期的任务记录失败: {e}")
+            return 0
+        if deleted:
+            logger.info(f"已清理 {deleted} 条过期的任务记录")
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "claims": self.claims,
+                "duplicates_skipped": self.duplicates_skipped,
+                "duplicates_in_flight": self.duplicates_in_flight,
+                "saved_seconds": round(self.saved_seconds, 1)
+            }
+
+
+def idempotent(process_task):
+    """
+    处理器 process_task 的装饰器：按 task_id 认领后再处理，处理器需要有 idempotency 属性（IdempotencyStore）。
+    已完成的任务返回 True（确认消息）；处理器定义了 replay_completed(task, result) 时改为返回它的结果，
+    用于补发上次没有送达的回调。另一个 Worker 正在处理时抛出 TaskDeferred，消息在其认领到期后重新投递
+    """
+    @functools.wraps(process_task)
+    def wrapper(self, task):
+        store = self.idempotency
+        try:
+            claim = store.claim(task)
+        except Exception as e:
+            logger.error(f"认领任务 {task.task_id} 失败: {e}")
+            return False
+        if claim.status == COMPLETED:
+            replay = getattr(self, "replay_completed", None)
+            return replay(task, claim.result) if replay else True
+        if claim.status == IN_PROGRESS:
+            raise TaskDeferred(claim.lease_seconds, "正在其他 Worker 上处理")
+
+        success = False
+        try:
+            success = process_task(self, task)
+            return success
+        finally:
+            if not success:
+                store.release(task)
+    return wrapper
@@ -1,17 +1,21 @@
 
 # workers/ingest_worker.py - 拆题入库处理器
 import os
-import cv2
+import signal
 import numpy as np
 import json
-import psycopg2
-import requests
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import logging
 from minio import Minio
 from minio.error import S3Error
 from task_manager import TaskQueue, TaskType, TaskMessage, TaskStatus
+from db_pool import get_pool
+from idempotency import IdempotencyStore, idempotent
+from document_pages import IMAGE, Page, document_format, iter_pages, map_pages
+from object_store import CropUploader, read_object
+from page_layout import ImagePyramid, detect_layout
+from task_watchdog import check_deadline
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -21,14 +25,10 @@ class IngestProcessor:
     """拆题入库处理器：拆题分割、OCR、候选知识点（NLP）生成"""
     
     def __init__(self):
-        # 数据库连接
-        self.db_config = {
-            'host': 'postgres',
-            'port': 5432,
-            'database': 'examdb',
-            'user': 'exam',
-            'password': 'exam'
-        }
+        # 数据库连接：进程内共享的连接池，DSN 读取 POSTGRES_URL
+        self.db_pool = get_pool()
+        # 按 task_id 幂等执行：重复投递的任务不再重新拆题
+        self.idempotency = IdempotencyStore(self.db_pool)
         
         # MinIO 配置
         self.minio_client = Minio(
@@ -44,48 +44,44 @@ class IngestProcessor:
                 self.minio_client.make_bucket("smart-exam")
         except S3Error as e:
             logger.error(f"MinIO bucket 操作失败: {e}")
+        
+        # 切图并行编码、并发上传（同时上传数由 CROP_UPLOAD_CONCURRENCY 限制）
+        self.crop_uploader = CropUploader(self.minio_client)
     
-    def download_file_from_minio(self, file_uri: str) -> str:
-        """从 MinIO 下载文件到本地"""
+    def load_document_from_minio(self, file_uri: str) -> bytes:
+        """从 MinIO 读取原始文件（单张图片、PDF 或多页 TIFF），由 iter_pages 按页解码"""
         try:
-            bucket_name = "smart-exam"
-            object_name = file_uri.split('/')[-1]
-            local_path = f"/tmp/{object_name}"
-            
-            self.minio_client.fget_object(bucket_name, object_name, local_path)
-            logger.info(f"文件已下载到: {local_path}")
-            return local_path
+            return read_object(self.minio_client, file_uri)
         except Exception as e:
             logger.error(f"下载文件失败: {e}")
             raise
     
     def analyze_layout(self, image: np.ndarray) -> Dict[str, Any]:
-        """版面布局分析"""
+        """版面布局分析：纸张边界和方向在下采样的粗略层上检测，不在全分辨率上做二值化"""
         try:
             height, width = image.shape[:2]
             
-            # 转换为灰度图
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            page = detect_layout(ImagePyramid(image))
+            bounds = page["paper_bounds"]
+            x, y, w, h = bounds["x"], bounds["y"], bounds["width"], bounds["height"]
             
-            # 二值化
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # 模拟版面分析结果
+            # 模拟版面分析结果（区域按纸张边界划分）
             layout_info = {
                 "page_size": {"width": width, "height": height},
-                "orientation": "portrait" if height > width else "landscape",
+                "paper_bounds": bounds,
+                "orientation": page["orientation"],
                 "detected_regions": [
                     {
                         "type": "header",
-                        "bbox": {"x": 0, "y": 0, "width": width, "height": int(height * 0.1)}
+                        "bbox": {"x": x, "y": y, "width": w, "height": int(h * 0.1)}
                     },
                     {
                         "type": "content", 
-                        "bbox": {"x": 0, "y": int(height * 0.1), "width": width, "height": int(height * 0.8)}
+                        "bbox": {"x": x, "y": y + int(h * 0.1), "width": w, "height": int(h * 0.8)}
                     },
                     {
                         "type": "footer",
-                        "bbox": {"x": 0, "y": int(height * 0.9), "width": width, "height": int(height * 0.1)}
+                        "bbox": {"x": x, "y": y + int(h * 0.9), "width": w, "height": int(h * 0.1)}
                     }
                 ],
                 "analyzed_at": datetime.utcnow().isoformat()
@@ -119,30 +115,14 @@ class IngestProcessor:
             # 分割题目
             question_height = content_region["height"] // questions_per_page
             questions = []
+            crops = []
             
             for i in range(questions_per_page):
                 y_start = content_region["y"] + i * question_height
                 y_end = min(y_start + question_height, content_region["y"] + content_region["height"])
                 
                 # 提取题目区域
-                question_image = image[y_start:y_end, content_region["x"]:content_region["x"] + content_region["width"]]
-                
-                # 保存题目图片
-                crop_filename = f"ingest_question_{i+1}.jpg"
-                crop_path = f"/tmp/{crop_filename}"
-                cv2.imwrite(crop_path, question_image)
-                
-                # 上传到MinIO
-                crop_uri = None
-                try:
-                    self.minio_client.fput_object(
-                        "smart-exam",
-                        f"ingest/{crop_filename}",
-                        crop_path
-                    )
-                    crop_uri = f"minio://smart-exam/ingest/{crop_filename}"
-                except Exception as e:
-                    logger.warning(f"上传题目图片失败: {e}")
+                crops.append(image[y_start:y_end, content_region["x"]:content_region["x"] + content_region["width"]])
                 
                 questions.append({
                     "seq": i + 1,
@@ -152,9 +132,19 @@ class IngestProcessor:
                         "width": content_region["width"],
                         "height": y_end - y_start
                     },
-                    "crop_uri": crop_uri
+                    "crop_uri": None
                 })
             
+            # 所有切图并行编码、并发上传，全部结束后返回；按内容寻址，不同会话的切图不会互相覆盖
+            # 上传失败的切图 crop_uri 为 None，其余切图照常入库
+            uploaded = self.crop_uploader.upload_all(crops, "ingest")
+            for question, result in zip(questions, uploaded):
+                if result:
+                    question["crop_uri"] = result[0]
+            
+            failed = uploaded.count(None)
+            if failed:
+                logger.warning(f"{failed} 张题目切图上传失败")
             logger.info(f"题目分割完成，共分割 {len(questions)} 道题")
             return questions
             
@@ -252,48 +242,75 @@ class IngestProcessor:
             logger.error(f"知识点分类失败: {e}")
             return []
     
-    def save_ingest_items(self, session_id: int, questions_data: List[Dict[str, Any]]) -> bool:
-        """保存拆题结果到数据库"""
-        try:
-            conn = psycopg2.connect(**self.db_config)
-            cur = conn.cursor()
-            
-            for question_data in questions_data:
-                seq = question_data["seq"]
-                crop_uri = question_data.get("crop_uri")
-                ocr_data = question_data.get("ocr_result", {})
-                candidate_kps = question_data.get("candidate_kps", [])
-                
-                # 计算综合置信度
-                avg_confidence = sum([kp["confidence"] for kp in candidate_kps]) / len(candidate_kps) if candidate_kps else 0.5
-                
-                # 插入拆题项目
-                cur.execute(
-                    """
-                    INSERT INTO ingest_items 
-                    (session_id, seq, crop_uri, ocr_json, candidate_type, candidate_kps_json, confidence, review_status)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, 'pending')
-                    """,
-                    (
-                        session_id,
-                        seq,
-                        crop_uri,
-                        json.dumps(ocr_data),
-                        ocr_data.get("type", "single"),
-                        json.dumps(candidate_kps),
-                        avg_confidence
-                    )
-                )
-            
-            # 更新会话状态
+    def _insert_ingest_items(
+        self,
+        cur,
+        session_id: int,
+        questions_data: List[Dict[str, Any]],
+        seq_offset: int = 0,
+        page_no: Optional[int] = None
+    ):
+        """插入拆题项目；多页文档的 seq 在整份文档内连续编号（seq_offset 为之前各页的题数），ocr_json 记录页码"""
+        for question_data in questions_data:
+            seq = seq_offset + question_data["seq"]
+            crop_uri = question_data.get("crop_uri")
+            ocr_data = question_data.get("ocr_result", {})
+            candidate_kps = question_data.get("candidate_kps", [])
+        
+            # 计算综合置信度
+            avg_confidence = sum([kp["confidence"] for kp in candidate_kps]) / len(candidate_kps) if candidate_kps else 0.5
+        
+            # 题干和选项只存一份（question_text），ocr_json 只保留位置框等结构化信息
+            question_text = ocr_data.get("stem", "")
+            for label, option in (ocr_data.get("options") or {}).items():
+                question_text += f"\n{label}. {option}"
+            ocr_json = {"bbox": question_data.get("bbox")}
+            if page_no is not None:
+                ocr_json["page"] = page_no
+        
+            # 插入拆题项目
             cur.execute(
-                "UPDATE ingest_sessions SET status = 'awaiting_review' WHERE id = %s",
-                (session_id,)
+                """
+                INSERT INTO ingest_items 
+                (session_id, seq, crop_uri, ocr_json, question_text, candidate_type, candidate_kps_json, confidence, review_status)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'pending')
+                """,
+                (
+                    session_id,
+                    seq,
+                    crop_uri,
+                    json.dumps(ocr_json),
+                    question_text,
+                    ocr_data.get("type", "single"),
+                    # 候选知识点只存 [kp_id, confidence]，详情从 knowledge_points 表关联
+                    json.dumps([[kp["id"], round(kp["confidence"], 2)] for kp in candidate_kps]),
+                    avg_confidence
+                )
             )
-            
-            conn.commit()
-            cur.close()
-            conn.close()
+    
+    def _finish_session(self, cur, session_id: int, task: Optional[TaskMessage], result: Dict[str, Any]):
+        # 更新会话状态
+        cur.execute(
+            "UPDATE ingest_sessions SET status = 'awaiting_review' WHERE id = %s",
+            (session_id,)
+        )
+        if task is not None:
+            self.idempotency.complete(cur, task, result)
+    
+    def save_ingest_items(
+        self,
+        session_id: int,
+        questions_data: List[Dict[str, Any]],
+        task: Optional[TaskMessage] = None
+    ) -> bool:
+        """保存拆题结果到数据库（与 task 的完成状态同一事务提交，重复投递不会重复插入拆题项目）"""
+        try:
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                self._insert_ingest_items(cur, session_id, questions_data)
+                self._finish_session(cur, session_id, task, {"questions": len(questions_data)})
+                conn.commit()
+                cur.close()
             
             logger.info(f"会话 {session_id} 的拆题结果已保存，共 {len(questions_data)} 道题")
             return True
@@ -302,8 +319,103 @@ class IngestProcessor:
             logger.error(f"保存拆题结果失败: {e}")
             return False
     
+    def save_ingest_page(
+        self,
+        session_id: int,
+        task: TaskMessage,
+        page_no: int,
+        seq_offset: int,
+        questions_data: List[Dict[str, Any]]
+    ) -> bool:
+        """多页文档：保存一页的拆题项目，并记录该页已完成（同一事务），任务重试时不会重复插入"""
+        try:
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                self._insert_ingest_items(cur, session_id, questions_data, seq_offset, page_no)
+                self.idempotency.complete_page(cur, task, page_no, {"questions": len(questions_data)})
+                conn.commit()
+                cur.close()
+            
+            logger.info(f"会话 {session_id} 第 {page_no} 页的拆题结果已保存，共 {len(questions_data)} 道题")
+            return True
+            
+        except Exception as e:
+            logger.error(f"保存第 {page_no} 页拆题结果失败: {e}")
+            return False
+    
+    def process_page(self, page: Page) -> List[Dict[str, Any]]:
+        """拆分一页：版面分析、题目分割、OCR 提取和知识点分类"""
+        # 1. 版面布局分析
+        layout_info = self.analyze_layout(page.image)
+        
+        # 2. 题目分割；每个阶段开始前检查是否已超过任务截止时间
+        check_deadline("题目分割")
+        questions = self.segment_questions(page.image, layout_info)
+        
+        # 3. OCR提取和知识点分类
+        questions_data = []
+        for question in questions:
+            check_deadline("题目OCR")
+            # OCR提取
+            ocr_result = self.extract_question_text(question)
+            
+            # 知识点分类
+            candidate_kps = self.classify_knowledge_points(ocr_result)
+            
+            questions_data.append({
+                "seq": question["seq"],
+                "bbox": question["bbox"],
+                "crop_uri": question.get("crop_uri"),
+                "ocr_result": ocr_result,
+                "candidate_kps": candidate_kps
+            })
+        return questions_data
+    
+    def process_document(self, session_id: int, task: TaskMessage, data: bytes) -> bool:
+        """
+        多页文档（PDF、多页 TIFF）：逐页解码，最多 PAGE_CONCURRENCY 页并行拆分；
+        拆题项目的 seq 在整份文档内连续，因此按页码顺序逐页保存（先完成的后续页暂存拆分结果，不保留页面图像）。
+        某页失败时任务失败，重试从第一个未保存的页继续
+        """
+        saved = self.idempotency.completed_pages(task)
+        next_page = 1
+        seq_offset = 0
+        while next_page in saved:
+            seq_offset += saved[next_page]["questions"]
+            next_page += 1
+        if saved:
+            logger.info(f"任务 {task.task_id} 已保存 {next_page - 1} 页，从第 {next_page} 页继续")
+        
+        finished: Dict[int, List[Dict[str, Any]]] = {}
+        for number, questions_data, error in map_pages(
+            iter_pages(data, skip=range(1, next_page)), self.process_page
+        ):
+            if error is not None:
+                logger.error(f"第 {number} 页拆分失败: {error}")
+                return False
+            finished[number] = questions_data
+            while next_page in finished:
+                questions_data = finished.pop(next_page)
+                if not self.save_ingest_page(session_id, task, next_page, seq_offset, questions_data):
+                    return False
+                seq_offset += len(questions_data)
+                next_page += 1
+        
+        if next_page == 1:
+            raise ValueError("文档中没有可拆分的页面")
+        
+        # 所有页已保存：更新会话状态并标记任务完成
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            self._finish_session(cur, session_id, task, {"questions": seq_offset, "pages": next_page - 1})
+            conn.commit()
+            cur.close()
+        logger.info(f"会话 {session_id} 的拆题结果已保存，共 {next_page - 1} 页 {seq_offset} 道题")
+        return True
+    
+    @idempotent
     def process_task(self, task: TaskMessage) -> bool:
-        """处理拆题入库任务"""
+        """处理拆题入库任务：单张图片直接拆分；PDF 和多页 TIFF 逐页拆分并逐页保存"""
         try:
             logger.info(f"开始处理拆题入库任务 {task.task_id}")
             
@@ -311,43 +423,17 @@ class IngestProcessor:
             file_uri = task.payload["file_uri"]
             uploader_id = task.payload["uploader_id"]
             
-            # 下载文件
-            local_file_path = self.download_file_from_minio(file_uri)
-            
-            # 读取图像
-            image = cv2.imread(local_file_path)
-            if image is None:
-                raise ValueError("无法读取图像文件")
-            
-            # 1. 版面布局分析
-            layout_info = self.analyze_layout(image)
+            # 读取文件（内存中下载，按页解码）
+            data = self.load_document_from_minio(file_uri)
             
-            # 2. 题目分割
-            questions = self.segment_questions(image, layout_info)
-            
-            # 3. OCR提取和知识点分类
-            questions_data = []
-            for question in questions:
-                # OCR提取
-                ocr_result = self.extract_question_text(question)
-                
-                # 知识点分类
-                candidate_kps = self.classify_knowledge_points(ocr_result)
+            if document_format(data) == IMAGE:
+                questions_data = self.process_page(next(iter_pages(data)))
                 
-                questions_data.append({
-                    "seq": question["seq"],
-                    "bbox": question["bbox"],
-                    "crop_uri": question.get("crop_uri"),
-                    "ocr_result": ocr_result,
-                    "candidate_kps": candidate_kps
-                })
-            
-            # 4. 保存结果到数据库
-            save_success = self.save_ingest_items(session_id, questions_data)
-            
-            # 清理临时文件
-            if os.path.exists(local_file_path):
-                os.remove(local_file_path)
+                # 4. 保存结果到数据库
+                check_deadline("保存结果")
+                save_success = self.save_ingest_items(session_id, questions_data, task)
+            else:
+                save_success = self.process_document(session_id, task, data)
             
             if save_success:
                 logger.info(f"拆题入库任务 {task.task_id} 处理成功")
@@ -366,12 +452,16 @@ def main():
     
     processor = IngestProcessor()
     task_queue = TaskQueue()
+    # SIGTERM（监督器缩容、容器停止）：不再接收新任务，进行中的任务完成并确认后退出
+    signal.signal(signal.SIGTERM, lambda signum, frame: task_queue.request_stop())
     
     try:
         # 开始消费任务
+        # 并发度、预取数和执行器类型由 WORKER_CONCURRENCY / WORKER_PREFETCH / WORKER_EXECUTOR 配置
         task_queue.consume_tasks(
             TaskType.INGEST,
-            processor.process_task
+            processor.process_task,
+            processor_factory=IngestProcessor
         )
     except KeyboardInterrupt:
         logger.info("收到停止信号，正在关闭...")
@@ -379,6 +469,8 @@ def main():
         logger.error(f"Worker运行出错: {e}")
     finally:
         task_queue.close()
+        processor.crop_uploader.close()
+        processor.db_pool.close()
         logger.info("拆题入库 Worker 已停止")
 
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+# workers/local_postgres.py - 进程内的 PostgreSQL 替身：pytest 用例和 benchmark_workers.py 使用，Worker 运行时不导入
+"""
+按语句前缀模拟判分、幂等认领（task_executions / task_pages）和拆题入库用到的 SQL，
+通过 ConnectionPool(dsn="local://", connect=db.connect) 接入，统计连接数、语句数和提交次数。
+"""
+
+import threading
+import time
+from collections import defaultdict
+
+from psycopg2 import extensions
+
+
+class LocalDatabase:
+    """
+    进程内的 PostgreSQL 替身：connect 模拟 TCP + 认证握手耗时，
+    按语句前缀返回判分流程需要的结果，并统计建立的连接数；task_executions 表保存在内存中（不区分事务）
+    """
+
+    def __init__(self, questions: int, connect_ms: float = 5):
+        self.questions = questions
+        self.connect_seconds = connect_ms / 1000
+        self.connects = 0
+        self.statements = 0
+        self.commits = 0
+        self.answer_key_queries = 0
+        self.version_queries = 0
+        self.answer_key_versions = defaultdict(lambda: 1)
+        self.papers = 1
+        self.task_executions = {}
+        self.task_pages = {}
+        self.ingest_items = []
+        self.answer_updates = 0
+        self._lock = threading.Lock()
+
+    def task_execution(self, statement, params):
+        """task_executions 表上的认领、完成、释放语句，返回结果行"""
+        now = time.monotonic()
+        with self._lock:
+            if statement.startswith("INSERT INTO task_executions"):
+                task_id, _, timeout, _ = params
+                row = self.task_executions.get(task_id)
+                if row and not (row["status"] == "failed" or (row["status"] == "running" and row["lease"] < now)):
+                    return []
+                row = self.task_executions[task_id] = {
+                    "status": "running", "attempts": (row["attempts"] if row else 0) + 1, "started": now,
+                    "lease": now + timeout, "duplicates": row["duplicates"] if row else 0, "result": None, "ms": None
+                }
+                return [(row["attempts"],)]
+            if statement.startswith("UPDATE task_executions SET duplicate_deliveries"):
+                row = self.task_executions.get(params[0])
+                if row is None:
+                    return []
+                row["duplicates"] += 1
+                return [(row["status"], row["result"], row["ms"], max(row["lease"] - now, 0))]
+            if statement.startswith("UPDATE task_executions SET status = 'completed'"):
+                row = self.task_executions[params[2]]
+                row.update(status="completed", result=params[0], ms=int((now - row["started"]) * 1000))
+            elif statement.startswith("UPDATE task_executions SET status = 'failed'"):
+                row = self.task_executions.get(params[0])
+                if row and row["status"] == "running":
+                    row["status"] = "failed"
+            return []
+
+    def task_page(self, statement, params):
+        """task_pages 表上的逐页完成记录，返回结果行"""
+        with self._lock:
+            if statement.startswith("INSERT INTO task_pages"):
+                task_id, page_no, result = params
+                self.task_pages[(task_id, page_no)] = result
+                return []
+            return [(page_no, result) for (task_id, page_no), result in self.task_pages.items() if task_id == params[0]]
+
+    def connect(self, dsn):
+        time.sleep(self.connect_seconds)
+        with self._lock:
+            self.connects += 1
+        return LocalPgConnection(self)
+
+
+class LocalPgConnection:
+    def __init__(self, db: LocalDatabase):
+        self.db = db
+        self.closed = 0
+        self.encoding = "UTF8"
+        self._status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return LocalPgCursor(self)
+
+    def get_transaction_status(self):
+        return self._status
+
+    def commit(self):
+        self.db.commits += 1
+        self._status = extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self._status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class LocalPgCursor:
+    def __init__(self, conn: LocalPgConnection):
+        self.conn = conn
+        self.connection = conn
+        self.rows = []
+        self.rowcount = -1
+
+    def mogrify(self, template, args):
+        return (template % tuple(repr(arg) for arg in args)).encode()
+
+    def execute(self, sql, params=None):
+        self.conn._status = extensions.TRANSACTION_STATUS_INTRANS
+        self.conn.db.statements += 1
+        statement = " ".join((sql.decode() if isinstance(sql, bytes) else sql).split())
+        if statement.startswith("SELECT paper_id"):
+            self.rows = [(params[0] % self.conn.db.papers + 1,)]
+        elif statement.startswith("SELECT version"):
+            self.conn.db.version_queries += 1
+            self.rows = [(self.conn.db.answer_key_versions[params[0]],)]
+        elif statement.startswith("SELECT pq.question_id"):
+            self.conn.db.answer_key_queries += 1
+            self.rows = [(i + 1, 2.0, "single", '{"correct": "A"}') for i in range(self.conn.db.questions)]
+        elif statement.startswith("UPDATE answers AS a"):
+            # RETURNING a.sheet_id：每个 VALUES 行对应一条已更新的作答
+            self.rows = [(int(row.split(",")[0].lstrip("(").split("::")[0]),) for row in statement.split("VALUES ")[1].split("),(")]
+            with self.conn.db._lock:
+                self.conn.db.answer_updates += len(self.rows)
+        elif "task_executions" in statement:
+            self.rows = self.conn.db.task_execution(statement, params)
+        elif "task_pages" in statement:
+            self.rows = self.conn.db.task_page(statement, params)
+        elif statement.startswith("INSERT INTO ingest_items"):
+            with self.conn.db._lock:
+                self.conn.db.ingest_items.append((params[0], params[1]))
+            self.rows = []
+        else:
+            self.rows = []
+        self.rowcount = len(self.rows) if statement.startswith("SELECT") else 1
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
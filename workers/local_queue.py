@@ -0,0 +1,559 @@
+# workers/local_queue.py - 不需要 RabbitMQ 的任务队列后端：进程内队列和 SQLite 持久队列
+"""
+TaskQueue 按 URL 选择后端（TASK_QUEUE_URL，未设置时使用 RABBIT_URL）：
+
+- amqp://...                 RabbitMQ（pika）
+- memory://<名称>            进程内队列，同一进程中名称相同的 TaskQueue 共享队列，用于测试和离线压测
+- sqlite:///<路径>           SQLite 持久队列，多个 Worker 进程共享同一个数据库文件，适合不部署 broker 的单机小规模部署
+
+LocalConnection 实现 TaskQueue 用到的 pika BlockingConnection/BlockingChannel 接口子集（声明、发布、消费、
+ack/nack、basic_get、定时回调），TaskQueue 的优先级通道、延迟重试、死信队列和看门狗逻辑不需要区分后端：
+
+- 声明了 x-max-priority 的队列按消息优先级出队，同优先级先进先出
+- 带 expiration 的消息发往声明了 x-dead-letter-routing-key 的队列（延迟重试队列）时，直接存入目标队列，
+  到期后才可被取出；效果与 RabbitMQ 的消息过期后死信回工作队列相同，延迟队列本身的消息数始终为 0
+- nack(requeue=False) 的消息按所在队列的 x-dead-letter-routing-key 转入死信队列，没有配置时丢弃
+- 消息被取出时带有认领期限（消费者的 x-consumer-timeout，basic_get 为 DEFAULT_LEASE 秒）。SQLite 队列中
+  认领过期的消息（Worker 崩溃或卡住）可被其他进程重新取出并标记 redelivered，原认领者的 ack/nack 随之失效；
+  连接关闭时未确认的消息立即退回队列
+"""
+
+import heapq
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import pika
+from pika.exceptions import ChannelClosedByBroker
+
+logger = logging.getLogger(__name__)
+
+LOCAL_SCHEMES = ("memory://", "sqlite://")
+
+# basic_get 取出的消息的认领期限（秒）
+DEFAULT_LEASE = 1800
+
+# SQLite 队列在没有新消息时的轮询间隔（秒）
+POLL_INTERVAL = float(os.getenv("LOCAL_QUEUE_POLL_INTERVAL", "0.05"))
+
+# 保存到队列中的消息属性
+PROPERTY_FIELDS = ("delivery_mode", "priority", "message_id", "timestamp", "expiration", "headers")
+
+
+class Message(NamedTuple):
+    id: int
+    body: bytes
+    properties: pika.BasicProperties
+    redelivered: bool
+
+
+def _dump_properties(properties: Optional[pika.BasicProperties]) -> Optional[str]:
+    if properties is None:
+        return None
+    return json.dumps({field: getattr(properties, field) for field in PROPERTY_FIELDS if getattr(properties, field) is not None})
+
+
+def _load_properties(data: Optional[str]) -> pika.BasicProperties:
+    return pika.BasicProperties(**json.loads(data)) if data else pika.BasicProperties()
+
+
+def _routing(arguments: Optional[Dict[str, Any]], properties: Optional[pika.BasicProperties]):
+    """按队列参数和消息属性计算 (优先级, 延迟秒数, 过期后的目标队列)"""
+    arguments = arguments or {}
+    max_priority = arguments.get("x-max-priority")
+    priority = min(getattr(properties, "priority", None) or 0, max_priority) if max_priority else 0
+    expiration = getattr(properties, "expiration", None)
+    target = arguments.get("x-dead-letter-routing-key")
+    if expiration is not None and target:
+        return priority, int(expiration) / 1000, target
+    return priority, 0.0, None
+
+
+class MemoryStore:
+    """进程内的队列存储（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._arguments: Dict[str, Optional[Dict[str, Any]]] = {}
+        # 每个队列可取出的消息堆 (-优先级, id)，以及未到期的消息堆 (可取出时间, id)
+        self._ready: Dict[str, list] = {}
+        self._delayed: Dict[str, list] = {}
+        # id -> [队列, 优先级, 消息体, 属性, redelivered]
+        self._messages: Dict[int, list] = {}
+        self._claimed = set()
+        self._ids = itertools.count(1)
+        self._listeners: List[Callable[[], None]] = []
+
+    def subscribe(self, listener: Callable[[], None]):
+        """有新消息时通知（同一进程中等待消息的连接）"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _notify(self):
+        for listener in list(self._listeners):
+            listener()
+
+    def declare(self, queue: str, arguments: Optional[Dict[str, Any]] = None, passive: bool = False) -> bool:
+        """声明队列；passive 时只检查队列是否存在"""
+        with self._lock:
+            if queue in self._arguments:
+                return True
+            if passive:
+                return False
+            self._arguments[queue] = arguments
+            self._ready[queue] = []
+            self._delayed[queue] = []
+            return True
+
+    def _promote(self, queue: str, now: float):
+        delayed = self._delayed[queue]
+        while delayed and delayed[0][0] <= now:
+            _, message_id = heapq.heappop(delayed)
+            heapq.heappush(self._ready[queue], (-self._messages[message_id][1], message_id))
+
+    def count(self, queue: str) -> int:
+        with self._lock:
+            self._promote(queue, time.time())
+            return len(self._ready[queue])
+
+    def pending(self, queue: str) -> int:
+        """队列中可取出和未到期的消息数（不含已取出未确认的消息）"""
+        with self._lock:
+            return len(self._ready[queue]) + len(self._delayed[queue])
+
+    def push(self, queue: str, body: bytes, properties: Optional[pika.BasicProperties] = None):
+        with self._lock:
+            if queue not in self._arguments:
+                return False
+            priority, delay, target = _routing(self._arguments[queue], properties)
+            if target in self._arguments:
+                queue = target
+                priority = _routing(self._arguments.get(target), properties)[0]
+            message_id = next(self._ids)
+            self._messages[message_id] = [queue, priority, body, properties, False]
+            if target in self._arguments and delay > 0:
+                heapq.heappush(self._delayed[queue], (time.time() + delay, message_id))
+            else:
+                heapq.heappush(self._ready[queue], (-priority, message_id))
+        self._notify()
+        return True
+
+    def claim(self, queue: str, owner: str, lease: float) -> Optional[Message]:
+        """取出队首消息（进程内的连接关闭时退回，不需要认领期限）"""
+        with self._lock:
+            self._promote(queue, time.time())
+            ready = self._ready[queue]
+            if not ready:
+                return None
+            _, message_id = heapq.heappop(ready)
+            self._claimed.add(message_id)
+            _, _, body, properties, redelivered = self._messages[message_id]
+            return Message(message_id, body, properties, redelivered)
+
+    def ack(self, message_id: int, owner: str) -> bool:
+        with self._lock:
+            if message_id not in self._claimed:
+                return False
+            self._claimed.discard(message_id)
+            del self._messages[message_id]
+            return True
+
+    def nack(self, message_id: int, owner: str, requeue: bool) -> bool:
+        with self._lock:
+            if message_id not in self._claimed:
+                return False
+            self._claimed.discard(message_id)
+            message = self._messages[message_id]
+            if requeue:
+                # 保留原 id，退回后排在同优先级的前面
+                message[4] = True
+                heapq.heappush(self._ready[message[0]], (-message[1], message_id))
+            else:
+                target = (self._arguments.get(message[0]) or {}).get("x-dead-letter-routing-key")
+                del self._messages[message_id]
+                if target in self._arguments:
+                    new_id = next(self._ids)
+                    self._messages[new_id] = [target, 0, message[2], message[3], False]
+                    heapq.heappush(self._ready[target], (0, new_id))
+        self._notify()
+        return True
+
+    def close(self):
+        pass
+
+
+class SQLiteStore:
+    """SQLite 持久队列存储；每个连接（线程）独占一个 sqlite3 连接，多个进程通过同一个数据库文件共享队列"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS queue_declarations (
+      name TEXT PRIMARY KEY,
+      arguments TEXT
+    );
+    CREATE TABLE IF NOT EXISTS queue_messages (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      queue TEXT NOT NULL,
+      priority INTEGER NOT NULL DEFAULT 0,
+      body BLOB NOT NULL,
+      properties TEXT,
+      ready_at REAL NOT NULL,
+      redelivered INTEGER NOT NULL DEFAULT 0,
+      claimed_by TEXT,
+      lease_until REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_queue_messages_claim ON queue_messages(queue, priority DESC, id);
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # autocommit：每条语句单独提交，认领用一条 UPDATE ... RETURNING 原子完成
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._arguments: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Callable[[], None]):
+        # 其他进程发布的消息通过轮询发现
+        pass
+
+    def unsubscribe(self, listener: Callable[[], None]):
+        pass
+
+    def _queue_arguments(self, queue: str):
+        """队列参数；队列未声明时返回 False"""
+        if queue not in self._arguments:
+            row = self.conn.execute("SELECT arguments FROM queue_declarations WHERE name = ?", (queue,)).fetchone()
+            if row is None:
+                return False
+            self._arguments[queue] = json.loads(row[0]) if row[0] else None
+        return self._arguments[queue]
+
+    def declare(self, queue: str, arguments: Optional[Dict[str, Any]] = None, passive: bool = False) -> bool:
+        with self._lock:
+            if passive:
+                return self.conn.execute("SELECT 1 FROM queue_declarations WHERE name = ?", (queue,)).fetchone() is not None
+            self.conn.execute(
+                "INSERT INTO queue_declarations (name, arguments) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET arguments = excluded.arguments",
+                (queue, json.dumps(arguments) if arguments else None)
+            )
+            self._arguments[queue] = arguments
+            return True
+
+    def count(self, queue: str) -> int:
+        with self._lock:
+            now = time.time()
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM queue_messages WHERE queue = ? AND ready_at <= ? "
+                "AND (lease_until IS NULL OR lease_until < ?)",
+                (queue, now, now)
+            ).fetchone()[0]
+
+    def push(self, queue: str, body: bytes, properties: Optional[pika.BasicProperties] = None) -> bool:
+        with self._lock:
+            arguments = self._queue_arguments(queue)
+            if arguments is False:
+                return False
+            priority, delay, target = _routing(arguments, properties)
+            if target is not None and self._queue_arguments(target) is not False:
+                queue = target
+                priority = _routing(self._queue_arguments(target), properties)[0]
+            else:
+                delay = 0.0
+            self.conn.execute(
+                "INSERT INTO queue_messages (queue, priority, body, properties, ready_at) VALUES (?, ?, ?, ?, ?)",
+                (queue, priority, body, _dump_properties(properties), time.time() + delay)
+            )
+            return True
+
+    def claim(self, queue: str, owner: str, lease: float) -> Optional[Message]:
+        """认领队首消息：未被认领或认领已过期的消息中优先级最高、最早发布的一条（认领过期的标记为 redelivered）"""
+        with self._lock:
+            now = time.time()
+            row = self.conn.execute(
+                """
+                UPDATE queue_messages
+                SET claimed_by = ?,
+                    lease_until = ?,
+                    redelivered = CASE WHEN claimed_by IS NULL THEN redelivered ELSE 1 END
+                WHERE id = (
+                    SELECT id FROM queue_messages
+                    WHERE queue = ? AND ready_at <= ? AND (lease_until IS NULL OR lease_until < ?)
+                    ORDER BY priority DESC, id
+                    LIMIT 1
+                )
+                RETURNING id, body, properties, redelivered
+                """,
+                (owner, now + lease, queue, now, now)
+            ).fetchone()
+        if row is None:
+            return None
+        return Message(row[0], bytes(row[1]), _load_properties(row[2]), bool(row[3]))
+
+    def ack(self, message_id: int, owner: str) -> bool:
+        with self._lock:
+            cur = self.conn.execute("DELETE FROM queue_messages WHERE id = ? AND claimed_by = ?", (message_id, owner))
+            return cur.rowcount > 0
+
+    def nack(self, message_id: int, owner: str, requeue: bool) -> bool:
+        with self._lock:
+            if requeue:
+                cur = self.conn.execute(
+                    "UPDATE queue_messages SET claimed_by = NULL, lease_until = NULL, redelivered = 1 "
+                    "WHERE id = ? AND claimed_by = ?",
+                    (message_id, owner)
+                )
+                return cur.rowcount > 0
+            row = self.conn.execute(
+                "SELECT queue FROM queue_messages WHERE id = ? AND claimed_by = ?", (message_id, owner)
+            ).fetchone()
+            if row is None:
+                return False
+            target = (self._queue_arguments(row[0]) or {}).get("x-dead-letter-routing-key")
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if target and self._queue_arguments(target) is not False:
+                    # 转入死信队列末尾
+                    self.conn.execute(
+                        "INSERT INTO queue_messages (queue, priority, body, properties, ready_at) "
+                        "SELECT ?, 0, body, properties, ? FROM queue_messages WHERE id = ?",
+                        (target, time.time(), message_id)
+                    )
+                self.conn.execute("DELETE FROM queue_messages WHERE id = ?", (message_id,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            return True
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_memory_stores: Dict[str, MemoryStore] = {}
+_memory_lock = threading.Lock()
+
+
+def open_store(url: str):
+    """按 URL 打开队列存储"""
+    if url.startswith("memory://"):
+        name = url[len("memory://"):] or "default"
+        with _memory_lock:
+            if name not in _memory_stores:
+                _memory_stores[name] = MemoryStore()
+            return _memory_stores[name]
+    if url.startswith("sqlite://"):
+        path = url[len("sqlite://"):]
+        # sqlite:///相对路径 与 SQLAlchemy 一致；sqlite:////绝对路径
+        path = path[1:] if path.startswith("/") else path
+        if not path:
+            raise ValueError("SQLite 队列需要数据库文件路径，如 sqlite:///queue.db")
+        return SQLiteStore(path)
+    raise ValueError(f"不支持的队列地址: {url}")
+
+
+class LocalConnection:
+    """
+    本地队列后端的连接，同时充当 channel（BlockingConnection/BlockingChannel 接口子集）
+
+    消费回调、定时回调和 add_callback_threadsafe 注册的回调都在 start_consuming 所在线程内执行，
+    与 pika BlockingConnection 的线程模型一致；连接本身不是线程安全的，跨线程只能使用 add_callback_threadsafe
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.store = open_store(url)
+        # 认领标识：SQLite 队列中只有认领者能确认消息
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_open = True
+        self.is_closed = False
+        self.prefetch = 0
+        # [(队列, 回调, prefetch, 认领期限)]，每个消费者未确认的消息数
+        self.consumers = []
+        self._in_flight: Dict[int, int] = {}
+        # delivery_tag -> (消息 id, 消费者序号)
+        self.unacked: Dict[int, tuple] = {}
+        self._next_tag = 1
+        self._callbacks = deque()
+        self._timers = []
+        self._wake = threading.Condition()
+        self._consuming = False
+        self.store.subscribe(self._notify)
+
+    def _notify(self):
+        with self._wake:
+            self._wake.notify()
+
+    # connection 接口
+    def channel(self):
+        return self
+
+    def sleep(self, duration: float):
+        deadline = time.monotonic() + duration
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.process_data_events(time_limit=remaining)
+
+    def call_later(self, delay: float, callback: Callable[[], None]):
+        self._timers.append((time.monotonic() + delay, callback))
+
+    def add_callback_threadsafe(self, callback: Callable[[], None]):
+        with self._wake:
+            self._callbacks.append(callback)
+            self._wake.notify()
+
+    def _run_timers(self):
+        now = time.monotonic()
+        due = [timer for timer in self._timers if timer[0] <= now]
+        self._timers = [timer for timer in self._timers if timer[0] > now]
+        for _, callback in due:
+            callback()
+
+    def _run_callbacks(self):
+        while True:
+            with self._wake:
+                if not self._callbacks:
+                    return
+                callback = self._callbacks.popleft()
+            callback()
+
+    def process_data_events(self, time_limit: float = 0):
+        self._run_callbacks()
+        self._run_timers()
+        if time_limit:
+            with self._wake:
+                if not self._callbacks:
+                    self._wake.wait(time_limit)
+            self._run_callbacks()
+            self._run_timers()
+
+    def close(self):
+        if self.is_closed:
+            return
+        # 与 broker 一致：连接关闭时未确认的消息退回队列
+        for message_id, _ in list(self.unacked.values()):
+            try:
+                self.store.nack(message_id, self.owner, requeue=True)
+            except Exception as e:
+                logger.warning(f"退回未确认的消息失败（认领过期后自动退回）: {e}")
+        self.unacked.clear()
+        self.store.unsubscribe(self._notify)
+        if isinstance(self.store, SQLiteStore):
+            self.store.close()
+        self.is_open = False
+        self.is_closed = True
+
+    # channel 接口
+    def queue_declare(self, queue: str, durable: bool = False, arguments=None, passive: bool = False):
+        if not self.store.declare(queue, arguments, passive=passive):
+            raise ChannelClosedByBroker(404, f"NOT_FOUND - no queue '{queue}'")
+        return SimpleNamespace(method=SimpleNamespace(queue=queue, message_count=self.store.count(queue)))
+
+    def basic_qos(self, prefetch_count: int = 0):
+        self.prefetch = prefetch_count
+
+    def basic_consume(self, queue: str, on_message_callback, arguments=None):
+        timeout_ms = (arguments or {}).get("x-consumer-timeout")
+        lease = timeout_ms / 1000 if timeout_ms else DEFAULT_LEASE
+        # 与 RabbitMQ 一致，basic_qos 的 prefetch 作用于之后创建的消费者
+        self._in_flight[len(self.consumers)] = 0
+        self.consumers.append((queue, on_message_callback, self.prefetch, lease))
+
+    def basic_publish(self, exchange: str, routing_key: str, body, properties=None, mandatory: bool = False):
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        if not self.store.push(routing_key, body, properties) and mandatory:
+            raise ChannelClosedByBroker(312, f"NO_ROUTE - no queue '{routing_key}'")
+
+    def _pop_unacked(self, delivery_tag: int):
+        entry = self.unacked.pop(delivery_tag, None)
+        if entry is None:
+            return None
+        if entry[1] is not None:
+            self._in_flight[entry[1]] -= 1
+        return entry[0]
+
+    def basic_ack(self, delivery_tag: int):
+        message_id = self._pop_unacked(delivery_tag)
+        if message_id is not None and not self.store.ack(message_id, self.owner):
+            logger.warning(f"消息 {message_id} 的认领已过期，确认无效（已被重新投递）")
+
+    def basic_nack(self, delivery_tag: int, requeue: bool = True):
+        message_id = self._pop_unacked(delivery_tag)
+        if message_id is not None and not self.store.nack(message_id, self.owner, requeue):
+            logger.warning(f"消息 {message_id} 的认领已过期，拒绝无效（已被重新投递）")
+
+    def basic_reject(self, delivery_tag: int, requeue: bool = True):
+        self.basic_nack(delivery_tag, requeue=requeue)
+
+    def _deliver(self, index: int) -> bool:
+        queue, callback, prefetch, lease = self.consumers[index]
+        if prefetch and self._in_flight[index] >= prefetch:
+            return False
+        message = self.store.claim(queue, self.owner, lease)
+        if message is None:
+            return False
+        tag = self._next_tag
+        self._next_tag += 1
+        self.unacked[tag] = (message.id, index)
+        self._in_flight[index] += 1
+        method = SimpleNamespace(delivery_tag=tag, redelivered=message.redelivered, routing_key=queue)
+        callback(self, method, message.properties, message.body)
+        return True
+
+    def basic_get(self, queue: str, auto_ack: bool = False):
+        message = self.store.claim(queue, self.owner, DEFAULT_LEASE)
+        if message is None:
+            return None, None, None
+        tag = self._next_tag
+        self._next_tag += 1
+        self.unacked[tag] = (message.id, None)
+        if auto_ack:
+            self.basic_ack(tag)
+        method = SimpleNamespace(delivery_tag=tag, redelivered=message.redelivered, routing_key=queue)
+        return method, message.properties, message.body
+
+    def start_consuming(self):
+        self._consuming = True
+        while self._consuming:
+            self._run_callbacks()
+            self._run_timers()
+            # 各消费者轮流取消息，直到都取不到（没有消息或达到 prefetch）
+            delivered = True
+            while delivered and self._consuming:
+                delivered = False
+                for index in range(len(self.consumers)):
+                    delivered = self._deliver(index) or delivered
+            if not self._consuming:
+                break
+            wait = POLL_INTERVAL
+            if self._timers:
+                wait = min(wait, max(min(due for due, _ in self._timers) - time.monotonic(), 0))
+            with self._wake:
+                if not self._callbacks:
+                    self._wake.wait(wait)
+        # 取消消费者，下次 start_consuming 前重新注册
+        self.consumers.clear()
+        self._in_flight.clear()
+        self._timers.clear()
+
+    def stop_consuming(self):
+        self._consuming = False
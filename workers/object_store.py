@@ -0,0 +1,161 @@
+# workers/object_store.py - Worker 与 MinIO 之间的内存传输（不落本地磁盘）
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKET = "smart-exam"
+JPEG_QUALITY = 90
+# 每个进程同时进行的切图上传数
+CROP_UPLOAD_CONCURRENCY = int(os.getenv("CROP_UPLOAD_CONCURRENCY", "8"))
+
+
+def parse_object_uri(file_uri: str, bucket: str = DEFAULT_BUCKET) -> Tuple[str, str]:
+    """
+    解析对象 URI，返回 (bucket, 对象名)
+
+    minio://bucket/path/name.jpg 使用完整路径；其他形式（如 /uploads/name.pdf）沿用只取文件名的约定
+    """
+    if file_uri.startswith("minio://"):
+        uri_bucket, _, object_name = file_uri[len("minio://"):].partition('/')
+        if uri_bucket and object_name:
+            return uri_bucket, object_name
+    return bucket, file_uri.split('/')[-1]
+
+
+def read_object(minio_client, file_uri: str, bucket: str = DEFAULT_BUCKET) -> bytes:
+    """把对象流式读入内存"""
+    response = minio_client.get_object(*parse_object_uri(file_uri, bucket))
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def load_image(minio_client, file_uri: str, bucket: str = DEFAULT_BUCKET,
+               flags: int = cv2.IMREAD_COLOR) -> np.ndarray:
+    """从 MinIO 读取并在内存中解码图像"""
+    data = read_object(minio_client, file_uri, bucket)
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image is None:
+        raise ValueError(f"无法解码图像文件: {file_uri}")
+    logger.info(f"已读取图像 {file_uri}（{len(data)} 字节）")
+    return image
+
+
+def encode_jpeg(image: np.ndarray, quality: int = JPEG_QUALITY) -> bytes:
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("图像编码失败")
+    return buffer.tobytes()
+
+
+def content_addressed_name(data: bytes, prefix: str, extension: str = ".jpg") -> str:
+    """按内容的 SHA-256 命名：不同会话/任务之间不会互相覆盖，相同内容重复上传结果一致"""
+    digest = hashlib.sha256(data).hexdigest()
+    return f"{prefix}/{digest[:2]}/{digest}{extension}"
+
+
+def put_bytes(minio_client, data: bytes, object_name: str, bucket: str = DEFAULT_BUCKET,
+              content_type: str = "application/octet-stream") -> str:
+    """从内存缓冲区上传对象，返回 minio:// URI"""
+    minio_client.put_object(bucket, object_name, io.BytesIO(data), length=len(data), content_type=content_type)
+    return f"minio://{bucket}/{object_name}"
+
+
+def upload_image(minio_client, image: np.ndarray, prefix: str, bucket: str = DEFAULT_BUCKET,
+                 quality: int = JPEG_QUALITY) -> Tuple[str, int]:
+    """JPEG 编码后按内容寻址上传，返回 (URI, 字节数)"""
+    data = encode_jpeg(image, quality)
+    object_name = content_addressed_name(data, prefix)
+    return put_bytes(minio_client, data, object_name, bucket, content_type="image/jpeg"), len(data)
+
+
+class CropUploader:
+    """
+    切图并行编码和上传（线程安全，同一进程内的任务线程共享）
+
+    JPEG 编码在编码线程池中执行（cv2.imencode 释放 GIL），每张切图编码完成后立即提交上传；
+    上传线程池大小即同时进行的上传数上限（max_in_flight），所有任务线程共用这一上限。
+    """
+
+    def __init__(self, minio_client, bucket: str = DEFAULT_BUCKET, quality: int = JPEG_QUALITY,
+                 encode_workers: Optional[int] = None, max_in_flight: Optional[int] = None):
+        self.minio_client = minio_client
+        self.bucket = bucket
+        self.quality = quality
+        self.encode_workers = encode_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or CROP_UPLOAD_CONCURRENCY
+        self._pools: Optional[Tuple[ThreadPoolExecutor, ThreadPoolExecutor]] = None
+        self._lock = threading.Lock()
+
+    def _executors(self) -> Tuple[ThreadPoolExecutor, ThreadPoolExecutor]:
+        # 首次使用时创建（进程池模式下在子进程中创建）
+        with self._lock:
+            if self._pools is None:
+                self._pools = (
+                    ThreadPoolExecutor(max_workers=self.encode_workers, thread_name_prefix="crop-encode"),
+                    ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="crop-upload"),
+                )
+            return self._pools
+
+    def submit(self, image: np.ndarray, prefix: str) -> Future:
+        """提交一张切图，返回 (URI, 字节数) 的 Future"""
+        encode_pool, upload_pool = self._executors()
+        result: Future = Future()
+
+        def upload(data: bytes):
+            object_name = content_addressed_name(data, prefix)
+            uri = put_bytes(self.minio_client, data, object_name, self.bucket, content_type="image/jpeg")
+            return uri, len(data)
+
+        def on_uploaded(uploaded: Future):
+            if uploaded.exception() is not None:
+                result.set_exception(uploaded.exception())
+            else:
+                result.set_result(uploaded.result())
+
+        def on_encoded(encoded: Future):
+            if encoded.exception() is not None:
+                result.set_exception(encoded.exception())
+                return
+            try:
+                upload_pool.submit(upload, encoded.result()).add_done_callback(on_uploaded)
+            except RuntimeError as e:
+                # 上传线程池已关闭
+                result.set_exception(e)
+
+        encode_pool.submit(encode_jpeg, image, self.quality).add_done_callback(on_encoded)
+        return result
+
+    def upload_all(self, images: List[np.ndarray], prefix: str) -> List[Optional[Tuple[str, int]]]:
+        """
+        编码并上传一组切图，全部结束后按输入顺序返回 (URI, 字节数)
+
+        单张切图编码或上传失败不影响其他切图，对应位置为 None
+        """
+        futures = [self.submit(image, prefix) for image in images]
+        results: List[Optional[Tuple[str, int]]] = []
+        for index, future in enumerate(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.warning(f"第 {index + 1} 张切图上传失败: {e}")
+                results.append(None)
+        return results
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, None
+        if pools:
+            for pool in pools:
+                pool.shutdown(wait=True)
@@ -1,17 +1,26 @@
 
 # workers/ocr_worker.py - OCR/OMR 识别处理器
 import os
+import signal
 import cv2
 import numpy as np
 import json
-import psycopg2
-import requests
+import time
 from typing import Dict, Any, List, Tuple, Optional
 from datetime import datetime
 import logging
 from minio import Minio
 from minio.error import S3Error
 from task_manager import TaskQueue, TaskType, TaskMessage, TaskStatus
+from callback_client import CallbackClient
+from db_pool import get_pool
+from idempotency import IdempotencyStore, idempotent
+from document_pages import IMAGE, Page, document_format, iter_pages, map_pages
+from object_store import read_object
+from omr_engine import compile_layout, read_bubbles
+from page_layout import ImagePyramid, PaperTemplate, detect_layout, page_layout_json
+from sheet_qr import SheetQRReader
+from task_watchdog import check_deadline, remaining_time
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -21,14 +30,19 @@ class OCROMRProcessor:
     """OCR/OMR 处理器：版面定位、仿射校正、OMR/OCR、题块切片"""
     
     def __init__(self):
-        # 数据库连接
-        self.db_config = {
-            'host': 'postgres',
-            'port': 5432,
-            'database': 'examdb',
-            'user': 'exam',
-            'password': 'exam'
-        }
+        # 数据库连接：进程内共享的连接池，DSN 读取 POSTGRES_URL
+        self.db_pool = get_pool()
+        # 按 task_id 幂等执行：重复投递的任务不再重新识别
+        self.idempotency = IdempotencyStore(self.db_pool)
+        # 结果回调：持久连接，同时完成的任务合并为一次批量回调
+        self.callbacks = CallbackClient()
+        
+        # 答题卡二维码识别
+        self.qr_reader = SheetQRReader()
+        
+        # 试卷校正模板缓存：(paper_id, 页码) -> (模板, 读取时间)；模板含定位标记期望位置和预先编译的气泡坐标
+        self.layout_ttl = float(os.getenv("OMR_LAYOUT_TTL", "300"))
+        self._templates: Dict[Tuple[Optional[int], int], Tuple[PaperTemplate, float]] = {}
         
         # MinIO 配置
         self.minio_client = Minio(
@@ -45,114 +59,125 @@ class OCROMRProcessor:
         except S3Error as e:
             logger.error(f"MinIO bucket 操作失败: {e}")
     
-    def download_file_from_minio(self, file_uri: str) -> str:
-        """从 MinIO 下载文件到本地"""
+    def load_document_from_minio(self, file_uri: str) -> bytes:
+        """从 MinIO 读取原始文件（单张图片、PDF 或多页 TIFF），由 iter_pages 按页解码"""
         try:
-            # 解析文件路径
-            bucket_name = "smart-exam"
-            object_name = file_uri.split('/')[-1]
-            local_path = f"/tmp/{object_name}"
-            
-            # 下载文件
-            self.minio_client.fget_object(bucket_name, object_name, local_path)
-            logger.info(f"文件已下载到: {local_path}")
-            return local_path
+            return read_object(self.minio_client, file_uri)
         except Exception as e:
             logger.error(f"下载文件失败: {e}")
             raise
     
-    def detect_paper_layout(self, image: np.ndarray) -> Dict[str, Any]:
-        """版面检测和定位"""
+    def detect_paper_layout(self, pyramid: ImagePyramid, template: PaperTemplate) -> Dict[str, Any]:
+        """版面检测和定位：在金字塔粗略层上找纸张边界、方向和定位标记，再在全分辨率小窗口内精修"""
         try:
-            # 转换为灰度图
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # 二值化
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            layout_info = detect_layout(pyramid)
             
-            # 查找轮廓
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # 识别答题卡二维码（先在模板约定的区域内解码）
+            layout_info["qr_codes"] = self._detect_qr_codes(pyramid, layout_info["page_corners"], template.qr_region)
+            layout_info["detected_at"] = datetime.utcnow().isoformat()
             
-            # 找到最大的矩形轮廓（试卷边界）
-            largest_contour = max(contours, key=cv2.contourArea)
-            
-            # 获取边界框
-            x, y, w, h = cv2.boundingRect(largest_contour)
-            
-            # 检测QR码区域（简化实现）
-            qr_regions = self._detect_qr_codes(gray)
-            
-            layout_info = {
-                "paper_bounds": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
-                "qr_codes": qr_regions,
-                "detected_at": datetime.utcnow().isoformat()
-            }
-            
-            logger.info("版面检测完成")
+            logger.info(
+                f"版面检测完成（第 {layout_info['pyramid_level']} 层，"
+                f"定位标记 {len(layout_info['fiducials'])} 个，二维码 {len(layout_info['qr_codes'])} 个）"
+            )
             return layout_info
             
         except Exception as e:
             logger.error(f"版面检测失败: {e}")
             return {"error": str(e)}
     
-    def _detect_qr_codes(self, gray_image: np.ndarray) -> List[Dict[str, int]]:
-        """检测QR码区域（简化实现）"""
-        # 这里应该使用专门的QR码检测库，为了MVP先返回模拟结果
-        height, width = gray_image.shape
-        return [
-            {
-                "x": int(width * 0.8),
-                "y": int(height * 0.05),
-                "width": int(width * 0.15),
-                "height": int(height * 0.1),
-                "content": 123456
-            }
-        ]
+    def _detect_qr_codes(self, pyramid: ImagePyramid, page_corners: List[List[float]],
+                         region: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """解码答题卡二维码：先在 qr_schema 约定的区域内，失败再搜索整页"""
+        qr_code = self.qr_reader.read(pyramid, page_corners, region)
+        if qr_code is None:
+            logger.warning("未能识别答题卡二维码")
+            return []
+        logger.info(f"二维码识别完成（{qr_code['source']}，{qr_code['decode_ms']} ms）: {qr_code['content']}")
+        return [qr_code]
+    
+    def identify_sheet(self, task: TaskMessage, layout_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        由二维码确定答题卡所属的试卷、学生和页码；任务未携带 paper_id 时以二维码为准，
+        两者不一致时保留任务中的 paper_id 并记录警告
+        """
+        qr_codes = layout_info.get("qr_codes") or []
+        if not qr_codes:
+            return None
+        identity = dict(qr_codes[0]["content"])
+        paper_id = task.payload.get("paper_id")
+        if paper_id is not None and int(paper_id) != identity["paper_id"]:
+            logger.warning(f"答题卡二维码中的试卷 {identity['paper_id']} 与任务中的试卷 {paper_id} 不一致")
+            identity["mismatch"] = True
+        return identity
     
-    def correct_affine_transformation(self, image: np.ndarray, layout_info: Dict[str, Any]) -> np.ndarray:
-        """仿射变换校正"""
+    def correct_affine_transformation(
+        self, pyramid: ImagePyramid, layout_info: Dict[str, Any], template: PaperTemplate
+    ) -> np.ndarray:
+        """透视校正：按定位标记把扫描件变换到模板的标准尺寸，输出灰度图"""
         try:
-            # 获取试卷边界
-            bounds = layout_info["paper_bounds"]
-            x, y, w, h = bounds["x"], bounds["y"], bounds["width"], bounds["height"]
-            
-            # 裁剪试卷区域
-            cropped = image[y:y+h, x:x+w]
-            
-            # 简化的校正：调整大小到标准尺寸
-            standard_height, standard_width = 1200, 800
-            corrected = cv2.resize(cropped, (standard_width, standard_height))
+            corrected, method = template.warp(pyramid, layout_info)
+            layout_info["alignment"] = method
             
-            logger.info("仿射变换校正完成")
+            logger.info(f"透视校正完成（{method}）")
             return corrected
             
         except Exception as e:
-            logger.error(f"仿射变换校正失败: {e}")
-            return image
+            logger.error(f"透视校正失败，按纸张边界缩放: {e}")
+            height, width = pyramid.shape
+            bounds = layout_info.get("paper_bounds") or {"x": 0, "y": 0, "width": width, "height": height}
+            layout_info["alignment"] = "bounds_resize"
+            return pyramid.resize_region(bounds["x"], bounds["y"], bounds["width"], bounds["height"], template.page_size)
     
-    def extract_omr_data(self, image: np.ndarray) -> Dict[str, Any]:
-        """OMR光学标记识别"""
+    def load_paper_template(self, paper_id: Optional[int], page: int = 1) -> PaperTemplate:
+        """
+        读取试卷版面（layout_json）和二维码配置（qr_schema）并构建第 page 页的校正模板，按 OMR_LAYOUT_TTL 秒缓存；
+        多页试卷的各页版面见 page_layout_json
+        """
+        cached = self._templates.get((paper_id, page))
+        if cached and time.monotonic() - cached[1] < self.layout_ttl:
+            return cached[0]
+        
+        layout_json = qr_schema = None
+        if paper_id is not None:
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT layout_json, qr_schema FROM papers WHERE id = %s", (paper_id,))
+                row = cur.fetchone()
+                cur.close()
+            layout_json, qr_schema = row if row else (None, None)
+            if isinstance(layout_json, str):
+                layout_json = json.loads(layout_json)
+            if isinstance(qr_schema, str):
+                qr_schema = json.loads(qr_schema)
+        
+        template = PaperTemplate(page_layout_json(layout_json, page), qr_schema)
+        self._templates[(paper_id, page)] = (template, time.monotonic())
+        return template
+    
+    def extract_omr_data(self, image: np.ndarray, template: PaperTemplate) -> Dict[str, Any]:
+        """OMR光学标记识别：在校正后的图像上按模板预先编译的固定气泡坐标取样"""
         try:
             # 转换为灰度图
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # 模拟OMR检测结果
-            omr_results = {
-                "student_id": "202301001",
-                "answers": {
-                    "1": {"marked": ["A"], "confidence": 0.95},
-                    "2": {"marked": ["B"], "confidence": 0.88},
-                    "3": {"marked": ["C"], "confidence": 0.92},
-                    "4": {"marked": ["A", "C"], "confidence": 0.76},  # 多选题
-                    "5": {"marked": ["B"], "confidence": 0.94}
-                },
-                "quality_issues": [
-                    {"question": 4, "issue": "MULTI_MARK", "severity": "medium"}
-                ],
-                "processed_at": datetime.utcnow().isoformat()
-            }
-            
-            logger.info(f"OMR识别完成，检测到 {len(omr_results['answers'])} 道题的答案")
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+            
+            layout = template.bubbles
+            if layout is not None and gray.shape[:2] != (template.page_size[1], template.page_size[0]):
+                layout = compile_layout(template.layout_json, gray.shape)
+            if layout is None:
+                logger.warning("试卷版面没有 OMR 气泡配置，跳过涂卡识别")
+                return {
+                    "answers": {},
+                    "quality_issues": [{"question": None, "issue": "NO_LAYOUT", "severity": "high"}],
+                    "processed_at": datetime.utcnow().isoformat()
+                }
+            
+            omr_results = read_bubbles(gray, layout)
+            
+            logger.info(
+                f"OMR识别完成，检测到 {len(omr_results['answers'])} 道题的答案，"
+                f"阈值 {omr_results['threshold']}，异常 {len(omr_results['quality_issues'])} 处"
+            )
             return omr_results
             
         except Exception as e:
@@ -191,42 +216,78 @@ class OCROMRProcessor:
             logger.error(f"OCR识别失败: {e}")
             return {"error": str(e)}
     
-    def update_database(self, task: TaskMessage, results: Dict[str, Any]) -> bool:
-        """更新数据库结果"""
-        try:
-            conn = psycopg2.connect(**self.db_config)
-            cur = conn.cursor()
-            
-            sheet_id = task.payload["sheet_id"]
-            
-            # 更新答题卡状态
+    def _save_answers(self, cur, sheet_id: int, omr_answers: Dict[str, Any]):
+        """识别结果写入 answers 表（同一道题重复写入时覆盖）"""
+        for q_num, answer_data in omr_answers.items():
             cur.execute(
-                "UPDATE answer_sheets SET status = %s WHERE id = %s",
-                ("processed", sheet_id)
+                """
+                INSERT INTO answers (sheet_id, question_id, raw_omr, raw_ocr, 
+                                   parsed_json, is_objective, error_flag)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (sheet_id, question_id) 
+                DO UPDATE SET raw_omr = %s, parsed_json = %s
+                """,
+                (
+                    sheet_id, int(q_num), json.dumps(answer_data),
+                    None, json.dumps(answer_data["marked"]),
+                    True, False,
+                    json.dumps(answer_data), json.dumps(answer_data["marked"])
+                )
             )
-            
-            # 插入识别结果到answers表
-            if "omr_results" in results and "answers" in results["omr_results"]:
-                for q_num, answer_data in results["omr_results"]["answers"].items():
-                    cur.execute(
-                        """
-                        INSERT INTO answers (sheet_id, question_id, raw_omr, raw_ocr, 
-                                           parsed_json, is_objective, error_flag)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        ON CONFLICT (sheet_id, question_id) 
-                        DO UPDATE SET raw_omr = %s, parsed_json = %s
-                        """,
-                        (
-                            sheet_id, int(q_num), json.dumps(answer_data),
-                            None, json.dumps(answer_data["marked"]),
-                            True, False,
-                            json.dumps(answer_data), json.dumps(answer_data["marked"])
-                        )
+    
+    def save_page(self, task: TaskMessage, page_results: Dict[str, Any]) -> bool:
+        """多页文档：一页识别完成后立即写入该页的答案，并记录该页已完成（同一事务）"""
+        try:
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                omr_answers = (page_results.get("omr_results") or {}).get("answers") or {}
+                self._save_answers(cur, task.payload["sheet_id"], omr_answers)
+                self.idempotency.complete_page(cur, task, page_results["page"], page_results)
+                conn.commit()
+                cur.close()
+            logger.info(f"答题卡 {task.payload['sheet_id']} 第 {page_results['page']} 页已保存")
+            return True
+        except Exception as e:
+            logger.error(f"保存第 {page_results.get('page')} 页识别结果失败: {e}")
+            return False
+    
+    def update_database(self, task: TaskMessage, results: Dict[str, Any], save_answers: bool = True) -> bool:
+        """更新数据库结果；多页文档的答案已逐页写入（save_answers=False），这里只更新答题卡状态"""
+        try:
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+            
+                sheet_id = task.payload["sheet_id"]
+            
+                # 更新答题卡状态；上传时缺少的试卷、学生信息由二维码补齐，已有的不覆盖
+                identity = results.get("sheet_identity") or {}
+                qr_codes = (results.get("layout_info") or {}).get("qr_codes") or []
+                student_id = str(identity.get("student_id") or "")
+                cur.execute(
+                    """
+                    UPDATE answer_sheets
+                    SET status = %s,
+                        paper_id = COALESCE(paper_id, %s),
+                        student_id = COALESCE(student_id, %s),
+                        qr_token = COALESCE(qr_token, %s)
+                    WHERE id = %s
+                    """,
+                    (
+                        "processed", identity.get("paper_id"),
+                        int(student_id) if student_id.isdigit() else None,
+                        qr_codes[0]["raw"][:120] if qr_codes else None,
+                        sheet_id
                     )
+                )
+            
+                # 插入识别结果到answers表
+                if save_answers and "omr_results" in results and "answers" in results["omr_results"]:
+                    self._save_answers(cur, sheet_id, results["omr_results"]["answers"])
             
-            conn.commit()
-            cur.close()
-            conn.close()
+                # 完成状态与识别结果同一事务提交；保存结果用于补发回调
+                self.idempotency.complete(cur, task, results)
+                conn.commit()
+                cur.close()
             
             logger.info(f"数据库更新完成，答题卡 {sheet_id}")
             return True
@@ -238,73 +299,121 @@ class OCROMRProcessor:
     def send_callback(self, task: TaskMessage, results: Dict[str, Any]) -> bool:
         """发送处理结果回调"""
         try:
-            callback_url = "http://backend:8000/internal/ocr-omr/callback"
-            
+            # answers 为后端 OCROMRResult 的格式：每道客观题的涂卡结果
+            omr_answers = (results.get("omr_results") or {}).get("answers") or {}
             payload = {
                 "task_id": task.task_id,
                 "sheet_id": task.payload["sheet_id"],
                 "status": "completed" if "error" not in results else "failed",
+                "answers": [
+                    {
+                        "question_id": int(q_num),
+                        "answer": "".join(answer_data.get("marked", [])),
+                        "confidence": answer_data.get("confidence", 0.0)
+                    }
+                    for q_num, answer_data in omr_answers.items()
+                ],
+                "processing_time": results.get("processing_time_ms"),
                 "results": results,
                 "processed_at": datetime.utcnow().isoformat()
             }
             
-            response = requests.post(
-                callback_url,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"回调发送成功，任务 {task.task_id}")
-                return True
-            else:
-                logger.error(f"回调发送失败，状态码: {response.status_code}")
-                return False
+            return self.callbacks.send(payload, timeout=remaining_time(30))
                 
         except Exception as e:
             logger.error(f"发送回调失败: {e}")
             return False
     
+    def replay_completed(self, task: TaskMessage, results: Optional[Dict[str, Any]]) -> bool:
+        """重复投递的已完成任务：不再识别，用保存的结果补发回调（后端按 task_id 去重）"""
+        return self.send_callback(task, results or {})
+    
+    def process_page(self, task: TaskMessage, page: Page) -> Dict[str, Any]:
+        """识别一页：版面检测、二维码、透视校正、OMR 和 OCR"""
+        results = {"page": page.number}
+        paper_id = task.payload.get("paper_id")
+        
+        # 1. 版面检测和二维码识别
+        # 灰度图和下采样金字塔只计算一次，版面检测、校正和二维码识别共用
+        pyramid = ImagePyramid(page.image)
+        template = self.load_paper_template(paper_id, page.number)
+        layout_info = self.detect_paper_layout(pyramid, template)
+        results["layout_info"] = layout_info
+        
+        identity = self.identify_sheet(task, layout_info)
+        results["sheet_identity"] = identity
+        if identity and (paper_id is None or identity["page"] != page.number):
+            # 上传时没有指定试卷，或扫描顺序与试卷页码不同：按二维码中的试卷和页码加载模板
+            template = self.load_paper_template(paper_id if paper_id is not None else identity["paper_id"], identity["page"])
+        
+        # 2. 透视校正（按试卷模板）；每个阶段开始前检查是否已超过任务截止时间
+        check_deadline("透视校正")
+        corrected_image = self.correct_affine_transformation(pyramid, layout_info, template)
+        
+        # 3. OMR识别
+        check_deadline("OMR识别")
+        results["omr_results"] = self.extract_omr_data(corrected_image, template)
+        
+        # 4. OCR识别
+        check_deadline("OCR识别")
+        results["ocr_results"] = self.extract_ocr_data(corrected_image)
+        return results
+    
+    def process_document(self, task: TaskMessage, data: bytes) -> Optional[Dict[str, Any]]:
+        """
+        多页文档（PDF、多页 TIFF）：逐页解码，最多 PAGE_CONCURRENCY 页并行识别，每页完成后立即保存；
+        有页面失败时返回 None（任务重试时只处理未保存的页）
+        """
+        saved = self.idempotency.completed_pages(task)
+        if saved:
+            logger.info(f"任务 {task.task_id} 已保存 {len(saved)} 页，继续处理其余页")
+        pages = dict(saved)
+        failed = []
+        for number, page_results, error in map_pages(
+            iter_pages(data, skip=saved), lambda page: self.process_page(task, page)
+        ):
+            if error is not None:
+                logger.error(f"第 {number} 页识别失败: {error}")
+                failed.append(number)
+            elif self.save_page(task, page_results):
+                pages[number] = page_results
+            else:
+                failed.append(number)
+        if failed:
+            logger.error(f"任务 {task.task_id} 有 {len(failed)} 页未完成: {sorted(failed)}")
+            return None
+        if not pages:
+            raise ValueError("文档中没有可识别的页面")
+        return merge_page_results([pages[number] for number in sorted(pages)])
+    
+    @idempotent
     def process_task(self, task: TaskMessage) -> bool:
-        """处理OCR/OMR任务"""
+        """处理OCR/OMR任务：单张图片直接识别；PDF 和多页 TIFF 逐页识别并逐页保存"""
         try:
             logger.info(f"开始处理OCR/OMR任务 {task.task_id}")
+            started = time.perf_counter()
             
-            # 下载文件
-            local_file_path = self.download_file_from_minio(task.payload["file_uri"])
-            
-            # 读取图像
-            image = cv2.imread(local_file_path)
-            if image is None:
-                raise ValueError("无法读取图像文件")
-            
-            results = {}
-            
-            # 1. 版面检测
-            layout_info = self.detect_paper_layout(image)
-            results["layout_info"] = layout_info
+            # 读取文件（内存中下载，按页解码）
+            data = self.load_document_from_minio(task.payload["file_uri"])
+            single_image = document_format(data) == IMAGE
             
-            # 2. 仿射校正
-            corrected_image = self.correct_affine_transformation(image, layout_info)
-            
-            # 3. OMR识别
-            omr_results = self.extract_omr_data(corrected_image)
-            results["omr_results"] = omr_results
+            if single_image:
+                results = self.process_page(task, next(iter_pages(data)))
+                del results["page"]
+            else:
+                results = self.process_document(task, data)
+                if results is None:
+                    return False
             
-            # 4. OCR识别
-            ocr_results = self.extract_ocr_data(corrected_image)
-            results["ocr_results"] = ocr_results
+            results["processing_time_ms"] = int((time.perf_counter() - started) * 1000)
             
-            # 5. 更新数据库
-            db_success = self.update_database(task, results)
+            # 5. 更新数据库（多页文档的答案已逐页写入）
+            check_deadline("更新数据库")
+            db_success = self.update_database(task, results, save_answers=single_image)
             
             # 6. 发送回调
             callback_success = self.send_callback(task, results)
             
-            # 清理临时文件
-            if os.path.exists(local_file_path):
-                os.remove(local_file_path)
-            
             success = db_success and callback_success
             logger.info(f"OCR/OMR任务 {task.task_id} 处理{'成功' if success else '失败'}")
             return success
@@ -313,18 +422,51 @@ class OCROMRProcessor:
             logger.error(f"处理OCR/OMR任务失败: {e}")
             return False
 
+
+def merge_page_results(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并多页的识别结果：答案按题号合并，版面和二维码信息取第一页，pages 保留每页的摘要"""
+    answers: Dict[str, Any] = {}
+    quality_issues: List[Dict[str, Any]] = []
+    subjective_answers: Dict[str, Any] = {}
+    fill_answers: Dict[str, Any] = {}
+    for page in pages:
+        omr_results = page.get("omr_results") or {}
+        answers.update(omr_results.get("answers") or {})
+        quality_issues.extend({**issue, "page": page["page"]} for issue in omr_results.get("quality_issues") or [])
+        ocr_results = page.get("ocr_results") or {}
+        subjective_answers.update(ocr_results.get("subjective_answers") or {})
+        fill_answers.update(ocr_results.get("fill_answers") or {})
+    return {
+        "layout_info": pages[0].get("layout_info"),
+        "sheet_identity": next((page["sheet_identity"] for page in pages if page.get("sheet_identity")), None),
+        "omr_results": {"answers": answers, "quality_issues": quality_issues},
+        "ocr_results": {"subjective_answers": subjective_answers, "fill_answers": fill_answers},
+        "pages": [
+            {
+                "page": page["page"],
+                "sheet_identity": page.get("sheet_identity"),
+                "alignment": (page.get("layout_info") or {}).get("alignment")
+            }
+            for page in pages
+        ]
+    }
+
 def main():
     """OCR/OMR Worker 主函数"""
     logger.info("启动 OCR/OMR Worker")
     
     processor = OCROMRProcessor()
     task_queue = TaskQueue()
+    # SIGTERM（监督器缩容、容器停止）：不再接收新任务，进行中的任务完成并确认后退出
+    signal.signal(signal.SIGTERM, lambda signum, frame: task_queue.request_stop())
     
     try:
         # 开始消费任务
+        # 并发度、预取数和执行器类型由 WORKER_CONCURRENCY / WORKER_PREFETCH / WORKER_EXECUTOR 配置
         task_queue.consume_tasks(
             TaskType.OCR_OMR,
-            processor.process_task
+            processor.process_task,
+            processor_factory=OCROMRProcessor
         )
     except KeyboardInterrupt:
         logger.info("收到停止信号，正在关闭...")
@@ -332,6 +474,8 @@ def main():
         logger.error(f"Worker运行出错: {e}")
     finally:
         task_queue.close()
+        processor.callbacks.close()
+        processor.db_pool.close()
         logger.info("OCR/OMR Worker 已停止")
 
 if __name__ == "__main__":
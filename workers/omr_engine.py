@@ -0,0 +1,186 @@
+# workers/omr_engine.py - 基于试卷版面的 OMR 涂卡识别
+"""
+气泡坐标来自 papers.layout_json 中的 omr 配置，坐标单位与 page_size 一致，识别时按校正后的图像尺寸缩放：
+
+    {
+      "page_size": [800, 1200],
+      "fiducials": {"size": 24, "centers": {"tl": [28, 28], "tr": [772, 28], "br": [772, 1172], "bl": [28, 1172]}},
+      "omr": {
+        "bubble_size": [24, 16],
+        "sample_inset": 0.2,
+        "blocks": [
+          {"first_question": 1, "count": 25, "type": "single", "options": "ABCD",
+           "origin": [80, 300], "option_pitch": 36, "question_pitch": 28}
+        ],
+        "questions": [
+          {"question": 101, "type": "multiple", "options": {"A": [500, 300], "B": [536, 300]}}
+        ]
+      }
+    }
+
+blocks 描述按网格排列的题组（origin 为第一题第一个选项气泡的左上角，选项横向排列、题目纵向排列），
+questions 逐题给出气泡左上角坐标，两者可以混用。
+fiducials 为可选的四角实心方块定位标记（中心坐标和边长），版面检测据此定位和校正纸张。
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_PAGE_SIZE = (800, 1200)
+DEFAULT_BUBBLE_SIZE = (24, 16)
+DEFAULT_FIDUCIALS = {"size": 24, "centers": {"tl": [28, 28], "tr": [772, 28], "br": [772, 1172], "bl": [28, 1172]}}
+# 采样时气泡四周各向内收缩的比例，避开印刷的气泡边框
+DEFAULT_SAMPLE_INSET = 0.2
+# 涂黑与未涂气泡的填充率至少相差这么多才认为存在涂卡，避免整张空白卡被 Otsu 强行分成两类
+MIN_CONTRAST = 0.2
+MAX_THRESHOLD = 0.8
+# 填充率距阈值达到该值时置信度为 1
+CONFIDENCE_SCALE = 0.25
+# 只允许选一个选项的题型
+SINGLE_MARK_TYPES = ('single', 'judge')
+
+
+class BubbleLayout:
+    """编译后的气泡版面：所有气泡的采样矩形以 (题目数, 最大选项数) 的矩阵存放，便于整体向量化计算"""
+
+    def __init__(self, questions: List[str], types: List[str], options: List[List[str]],
+                 boxes: np.ndarray, mask: np.ndarray):
+        self.questions = questions
+        self.types = types
+        self.options = options
+        # boxes: (Q, K, 4) 的 x0, y0, x1, y1（积分图坐标，右下角为开区间）
+        self.boxes = boxes
+        self.mask = mask
+        self.single_mark = np.array([t in SINGLE_MARK_TYPES for t in types], dtype=bool)
+        areas = (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1])
+        self.areas = np.where(mask, np.maximum(areas, 1), 1).astype(np.float64)
+
+    def __len__(self):
+        return len(self.questions)
+
+
+def _expand_layout(omr: Dict[str, Any]) -> List[Tuple[str, str, List[Tuple[str, float, float]]]]:
+    """把 blocks 和 questions 展开为 [(题号, 题型, [(选项, x, y), ...]), ...]"""
+    entries = []
+    for block in omr.get("blocks", []):
+        x0, y0 = block["origin"]
+        options = block.get("options", "ABCD")
+        for i in range(block["count"]):
+            y = y0 + i * block["question_pitch"]
+            bubbles = [(label, x0 + j * block["option_pitch"], y) for j, label in enumerate(options)]
+            entries.append((str(block["first_question"] + i), block.get("type", "single"), bubbles))
+    for question in omr.get("questions", []):
+        bubbles = [(label, xy[0], xy[1]) for label, xy in question["options"].items()]
+        entries.append((str(question["question"]), question.get("type", "single"), bubbles))
+    return entries
+
+
+def compile_layout(layout_json: Dict[str, Any], image_shape: Tuple[int, int]) -> Optional[BubbleLayout]:
+    """按图像尺寸编译版面中的气泡坐标，版面没有 omr 配置时返回 None"""
+    omr = (layout_json or {}).get("omr")
+    if not omr:
+        return None
+    entries = _expand_layout(omr)
+    if not entries:
+        return None
+
+    height, width = image_shape[:2]
+    page_width, page_height = layout_json.get("page_size") or DEFAULT_PAGE_SIZE
+    scale_x, scale_y = width / page_width, height / page_height
+    bubble_w, bubble_h = omr.get("bubble_size") or DEFAULT_BUBBLE_SIZE
+    inset = omr.get("sample_inset", DEFAULT_SAMPLE_INSET)
+
+    max_options = max(len(bubbles) for _, _, bubbles in entries)
+    boxes = np.zeros((len(entries), max_options, 4), dtype=np.int64)
+    mask = np.zeros((len(entries), max_options), dtype=bool)
+    for q, (_, _, bubbles) in enumerate(entries):
+        for k, (_, x, y) in enumerate(bubbles):
+            boxes[q, k] = (
+                (x + bubble_w * inset) * scale_x, (y + bubble_h * inset) * scale_y,
+                (x + bubble_w * (1 - inset)) * scale_x, (y + bubble_h * (1 - inset)) * scale_y
+            )
+            mask[q, k] = True
+    boxes[..., 0::2] = np.clip(boxes[..., 0::2], 0, width)
+    boxes[..., 1::2] = np.clip(boxes[..., 1::2], 0, height)
+
+    return BubbleLayout(
+        questions=[question for question, _, _ in entries],
+        types=[q_type for _, q_type, _ in entries],
+        options=[[label for label, _, _ in bubbles] for _, _, bubbles in entries],
+        boxes=boxes,
+        mask=mask
+    )
+
+
+def bubble_fill_ratios(gray: np.ndarray, layout: BubbleLayout) -> np.ndarray:
+    """一次积分图 + 向量化索引求出所有气泡的填充率（0 为纯白，1 为纯黑），返回 (Q, K) 矩阵"""
+    integral = cv2.integral(255 - gray, sdepth=cv2.CV_64F)
+    x0, y0, x1, y1 = (layout.boxes[..., i] for i in range(4))
+    sums = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+    return np.where(layout.mask, sums / (255.0 * layout.areas), 0.0)
+
+
+def sheet_threshold(fills: np.ndarray) -> float:
+    """
+    按整张答题卡的填充率分布求阈值（一维 Otsu），适应不同扫描亮度和铅笔深浅
+
+    空白气泡占多数，取 25 分位作为底色；阈值至少比底色高 MIN_CONTRAST，
+    这样整张未作答或全部涂满的答题卡不会被强行分成两类
+    """
+    background = float(np.percentile(fills, 25))
+    hist, edges = np.histogram(fills, bins=64, range=(0.0, 1.0))
+    weights = hist.astype(np.float64)
+    centers = (edges[:-1] + edges[1:]) / 2
+    w0 = np.cumsum(weights)
+    w1 = w0[-1] - w0
+    m0 = np.cumsum(weights * centers)
+    mean0 = m0 / np.maximum(w0, 1)
+    mean1 = (m0[-1] - m0) / np.maximum(w1, 1)
+    between = w0 * w1 * (mean0 - mean1) ** 2
+    otsu = float(edges[int(np.argmax(between)) + 1])
+    return min(max(otsu, background + MIN_CONTRAST), MAX_THRESHOLD)
+
+
+def read_bubbles(gray: np.ndarray, layout: BubbleLayout) -> Dict[str, Any]:
+    """识别所有题目的涂卡结果，输出与 OCR Worker 一致的 answers / quality_issues 结构"""
+    fills = bubble_fill_ratios(gray, layout)
+    threshold = sheet_threshold(fills[layout.mask])
+
+    marked = (fills >= threshold) & layout.mask
+    counts = marked.sum(axis=1)
+    margins = np.where(layout.mask, np.abs(fills - threshold), np.inf).min(axis=1)
+    confidences = np.clip(margins / CONFIDENCE_SCALE, 0.0, 1.0)
+    multi_mark = layout.single_mark & (counts > 1)
+    blank = counts == 0
+
+    # 先整体转换为 Python 列表，避免逐个元素做 numpy 标量转换
+    marked_rows = marked.tolist()
+    fill_rows = np.round(fills, 3).tolist()
+    confidence_list = np.round(confidences, 2).tolist()
+    answers = {}
+    for q, question in enumerate(layout.questions):
+        options = layout.options[q]
+        answers[question] = {
+            "marked": [label for label, is_marked in zip(options, marked_rows[q]) if is_marked],
+            "confidence": confidence_list[q],
+            "fill": fill_rows[q][:len(options)]
+        }
+
+    quality_issues = []
+    for q in np.flatnonzero(multi_mark | blank).tolist():
+        question = layout.questions[q]
+        quality_issues.append({
+            "question": int(question) if question.isdigit() else question,
+            "issue": "MULTI_MARK" if multi_mark[q] else "BLANK",
+            "severity": "medium" if multi_mark[q] else "low"
+        })
+
+    return {
+        "answers": answers,
+        "quality_issues": quality_issues,
+        "threshold": round(threshold, 3),
+        "processed_at": datetime.utcnow().isoformat()
+    }
@@ -1,63 +1,39 @@
 
 # workers/omr_worker.py - 自动判分处理器
 import json
-import psycopg2
+import signal
 import requests
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import logging
 from task_manager import TaskQueue, TaskType, TaskMessage, TaskStatus
+from db_pool import get_pool
+from answer_key_cache import AnswerKeyCache
+from idempotency import IdempotencyStore, idempotent
+from psycopg2.extras import execute_values
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 批量写入判分结果时每条 UPDATE ... FROM (VALUES ...) 携带的最大行数
+GRADE_PAGE_SIZE = 1000
+
 class AutoGradeProcessor:
     """自动判分处理器：客观题判分、日志回写"""
     
     def __init__(self):
-        # 数据库连接
-        self.db_config = {
-            'host': 'postgres',
-            'port': 5432,
-            'database': 'examdb',
-            'user': 'exam',
-            'password': 'exam'
-        }
+        # 数据库连接：进程内共享的连接池，DSN 读取 POSTGRES_URL
+        self.db_pool = get_pool()
+        # 标准答案缓存：按 paper_id 缓存，试卷或题目答案变更时由数据库通知失效
+        self.answer_keys = AnswerKeyCache(self.db_pool)
+        # 按 task_id 幂等执行：重复投递的任务不再重新判分
+        self.idempotency = IdempotencyStore(self.db_pool)
     
     def get_paper_answers(self, paper_id: int) -> Dict[str, Any]:
-        """获取试卷的标准答案"""
+        """获取试卷的标准答案（同一试卷只在缓存失效后重新查询）"""
         try:
-            conn = psycopg2.connect(**self.db_config)
-            cur = conn.cursor()
-            
-            # 查询试卷的题目和答案
-            cur.execute(
-                """
-                SELECT pq.question_id, pq.score, q.type, q.answer_json
-                FROM paper_questions pq
-                JOIN questions q ON pq.question_id = q.id
-                WHERE pq.paper_id = %s
-                ORDER BY pq.seq
-                """,
-                (paper_id,)
-            )
-            
-            paper_answers = {}
-            for row in cur:
-                question_id, score, q_type, answer_json = row
-                paper_answers[str(question_id)] = {
-                    "type": q_type,
-                    "score": float(score),
-                    "correct_answer": json.loads(answer_json) if answer_json else {},
-                    "is_objective": q_type in ['single', 'multiple', 'judge', 'fill']
-                }
-            
-            cur.close()
-            conn.close()
-            
-            logger.info(f"获取试卷 {paper_id} 的 {len(paper_answers)} 道题的标准答案")
-            return paper_answers
+            return self.answer_keys.get(paper_id)
             
         except Exception as e:
             logger.error(f"获取试卷答案失败: {e}")
@@ -118,6 +94,70 @@ class AutoGradeProcessor:
             "reason": "WRONG_ANSWER"
         }
     
+    def grade_answers(self, answers: List[Dict[str, Any]]) -> List[Tuple[int, bool, float]]:
+        """对一张答题卡的作答判分，返回 (question_id, is_correct, score) 列表"""
+        grades = []
+        for answer in answers:
+            student_data = answer.get("parsed_json", [])
+            
+            # 简化的判分逻辑（仅作示例）
+            is_correct = len(student_data) == 1 and student_data[0] == "A"
+            score = 10.0 if is_correct else 0.0
+            grades.append((int(answer["question_id"]), is_correct, score))
+        return grades
+    
+    def save_grades(
+        self,
+        sheet_grades: Dict[int, List[Tuple[int, bool, float]]],
+        task: Optional[TaskMessage] = None
+    ) -> Dict[int, int]:
+        """
+        写入一张或一批答题卡的判分结果
+        
+        所有题目得分通过一条 UPDATE ... FROM (VALUES ...) 写入（超过 GRADE_PAGE_SIZE 行时分页），
+        与 answer_sheets 状态更新（以及 task 的完成状态）在同一事务中提交，任一步失败整体回滚。
+        
+        Returns:
+            每张答题卡实际更新的题目数
+        """
+        rows = [
+            (sheet_id, question_id, is_correct, score)
+            for sheet_id, grades in sheet_grades.items()
+            for question_id, is_correct, score in grades
+        ]
+        updated = {sheet_id: 0 for sheet_id in sheet_grades}
+        with self.db_pool.connection() as conn:
+            cur = conn.cursor()
+            if rows:
+                returned = execute_values(
+                    cur,
+                    """
+                    UPDATE answers AS a
+                    SET is_correct = v.is_correct, score = v.score
+                    FROM (VALUES %s) AS v(sheet_id, question_id, is_correct, score)
+                    WHERE a.sheet_id = v.sheet_id AND a.question_id = v.question_id
+                    RETURNING a.sheet_id
+                    """,
+                    rows,
+                    template="(%s::bigint, %s::bigint, %s::boolean, %s::numeric)",
+                    page_size=GRADE_PAGE_SIZE,
+                    fetch=True
+                )
+                for (sheet_id,) in returned:
+                    updated[sheet_id] += 1
+            
+            # 更新答题卡状态
+            cur.execute(
+                "UPDATE answer_sheets SET status = 'graded' WHERE id = ANY(%s)",
+                (list(sheet_grades),)
+            )
+            if task is not None:
+                self.idempotency.complete(cur, task, {"updated": {str(k): v for k, v in updated.items()}})
+            conn.commit()
+            cur.close()
+        return updated
+    
+    @idempotent
     def process_task(self, task: TaskMessage) -> bool:
         """处理自动判分任务"""
         try:
@@ -127,12 +167,11 @@ class AutoGradeProcessor:
             answers = task.payload.get("answers", [])
             
             # 获取试卷ID
-            conn = psycopg2.connect(**self.db_config)
-            cur = conn.cursor()
-            cur.execute("SELECT paper_id FROM answer_sheets WHERE id = %s", (sheet_id,))
-            paper_row = cur.fetchone()
-            cur.close()
-            conn.close()
+            with self.db_pool.connection() as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT paper_id FROM answer_sheets WHERE id = %s", (sheet_id,))
+                paper_row = cur.fetchone()
+                cur.close()
             
             if not paper_row:
                 logger.error(f"未找到答题卡 {sheet_id}")
@@ -146,9 +185,6 @@ class AutoGradeProcessor:
                 logger.error(f"未找到试卷 {paper_id} 的标准答案")
                 return False
             
-            # 判分结果
-            grading_count = 0
-            
             # 模拟判分过程（MVP简化版）
             if not answers:
                 # 如果没有传入答案，创建模拟数据
@@ -158,51 +194,8 @@ class AutoGradeProcessor:
                     {"question_id": 3, "parsed_json": ["C"]}
                 ]
             
-            for answer in answers:
-                question_id = str(answer["question_id"])
-                student_data = answer.get("parsed_json", [])
-                
-                # 简化的判分逻辑（仅作示例）
-                is_correct = len(student_data) == 1 and student_data[0] == "A"
-                score = 10.0 if is_correct else 0.0
-                
-                # 更新数据库
-                try:
-                    conn = psycopg2.connect(**self.db_config)
-                    cur = conn.cursor()
-                    
-                    cur.execute(
-                        """
-                        UPDATE answers 
-                        SET is_correct = %s, score = %s
-                        WHERE sheet_id = %s AND question_id = %s
-                        """,
-                        (is_correct, score, sheet_id, int(question_id))
-                    )
-                    
-                    if cur.rowcount > 0:
-                        grading_count += 1
-                    
-                    conn.commit()
-                    cur.close()
-                    conn.close()
-                    
-                except Exception as e:
-                    logger.error(f"更新题目 {question_id} 得分失败: {e}")
-            
-            # 更新答题卡状态
-            try:
-                conn = psycopg2.connect(**self.db_config)
-                cur = conn.cursor()
-                cur.execute(
-                    "UPDATE answer_sheets SET status = 'graded' WHERE id = %s",
-                    (sheet_id,)
-                )
-                conn.commit()
-                cur.close()
-                conn.close()
-            except Exception as e:
-                logger.error(f"更新答题卡状态失败: {e}")
+            # 所有题目得分与答题卡状态在同一事务中写入
+            grading_count = self.save_grades({sheet_id: self.grade_answers(answers)}, task)[sheet_id]
             
             logger.info(f"答题卡 {sheet_id} 判分完成，共处理 {grading_count} 道题")
             return True
@@ -217,12 +210,16 @@ def main():
     
     processor = AutoGradeProcessor()
     task_queue = TaskQueue()
+    # SIGTERM（监督器缩容、容器停止）：不再接收新任务，进行中的任务完成并确认后退出
+    signal.signal(signal.SIGTERM, lambda signum, frame: task_queue.request_stop())
     
     try:
         # 开始消费任务
+        # 并发度、预取数和执行器类型由 WORKER_CONCURRENCY / WORKER_PREFETCH / WORKER_EXECUTOR 配置
         task_queue.consume_tasks(
             TaskType.AUTO_GRADE,
-            processor.process_task
+            processor.process_task,
+            processor_factory=AutoGradeProcessor
         )
     except KeyboardInterrupt:
         logger.info("收到停止信号，正在关闭...")
@@ -230,6 +227,7 @@ def main():
         logger.error(f"Worker运行出错: {e}")
     finally:
         task_queue.close()
+        processor.db_pool.close()
         logger.info("自动判分 Worker 已停止")
 
 if __name__ == "__main__":
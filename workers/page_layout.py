@@ -0,0 +1,310 @@
+# workers/page_layout.py - 答题卡版面定位：图像金字塔上由粗到精地检测纸张边界和定位标记
+"""
+300dpi 扫描件通常在 2500x3500 像素以上，直接在全分辨率上做 Otsu 和 findContours 代价很高。
+这里先把灰度图逐级下采样到长边不超过 coarse_max_side 的粗略层，在粗略层上找纸张边界、方向和四角定位标记，
+再只在全分辨率的小窗口中精修角点和标记中心。
+
+ImagePyramid 在版面检测、校正和二维码识别各阶段之间共享，灰度转换和下采样只做一次。
+
+校正按试卷模板（PaperTemplate）进行：用检测到的定位标记和模板中的期望位置求单应矩阵，
+warpPerspective 到模板的标准尺寸，OMR 直接在预先编译好的固定气泡坐标上取样。
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from omr_engine import DEFAULT_PAGE_SIZE, BubbleLayout, compile_layout
+
+# 粗略层的最大边长
+COARSE_MAX_SIDE = 1000
+# 纸张轮廓面积至少占图像的比例，否则认为扫描件没有背景、整幅图像就是纸张
+MIN_PAGE_AREA_RATIO = 0.2
+# 定位标记相对纸张短边的尺寸范围
+FIDUCIAL_MIN_RATIO = 0.01
+FIDUCIAL_MAX_RATIO = 0.08
+# 定位标记中心到对应纸张角点的最大距离（相对纸张对角线）
+FIDUCIAL_MAX_CORNER_DISTANCE = 0.2
+# 定位标记围成的四边形与纸张四边形的面积比，和模板中的比值相差超过该比例时认为标记检测有误
+FIDUCIAL_AREA_TOLERANCE = 0.15
+CORNER_NAMES = ("tl", "tr", "br", "bl")
+
+
+class ImagePyramid:
+    """灰度图像金字塔：level 0 为全分辨率，逐级 pyrDown，按需计算并缓存"""
+
+    def __init__(self, image: np.ndarray, coarse_max_side: int = COARSE_MAX_SIDE):
+        self.image = image
+        self.gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        self.coarse_max_side = coarse_max_side
+        self._levels = [self.gray]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.gray.shape[:2]
+
+    def level(self, index: int) -> np.ndarray:
+        while len(self._levels) <= index:
+            self._levels.append(cv2.pyrDown(self._levels[-1]))
+        return self._levels[index]
+
+    def level_for(self, max_side: int) -> int:
+        """长边不超过 max_side 的第一层"""
+        index = 0
+        height, width = self.shape
+        while max(height, width) > max_side:
+            height, width = (height + 1) // 2, (width + 1) // 2
+            index += 1
+        return index
+
+    @property
+    def coarse_index(self) -> int:
+        return self.level_for(self.coarse_max_side)
+
+    @property
+    def coarse(self) -> np.ndarray:
+        return self.level(self.coarse_index)
+
+    def scale(self, index: int) -> Tuple[float, float]:
+        """第 index 层坐标乘以该比例得到全分辨率坐标 (sx, sy)"""
+        level = self.level(index)
+        return self.shape[1] / level.shape[1], self.shape[0] / level.shape[0]
+
+    def region_level(self, w: float, h: float, size: Tuple[int, int]) -> int:
+        """全分辨率尺寸为 w x h 的区域缩放到 size=(宽, 高) 时，仍不小于目标尺寸的最粗一层"""
+        index = 0
+        while True:
+            sx, sy = self.scale(index + 1)
+            if w / sx < size[0] or h / sy < size[1]:
+                return index
+            index += 1
+
+    def resize_region(self, x: int, y: int, w: int, h: int, size: Tuple[int, int]) -> np.ndarray:
+        """
+        把全分辨率区域 (x, y, w, h) 缩放到 size=(宽, 高)
+
+        从 region_level 选出的层裁剪：该层已经过 pyrDown 的高斯平滑且缩放比例不超过 2，
+        双线性插值即可避免混叠，不必在全分辨率上做 INTER_AREA
+        """
+        index = self.region_level(w, h, size)
+        sx, sy = self.scale(index)
+        level = self.level(index)
+        x0, y0 = int(x / sx), int(y / sy)
+        x1, y1 = max(int(np.ceil((x + w) / sx)), x0 + 1), max(int(np.ceil((y + h) / sy)), y0 + 1)
+        return cv2.resize(level[y0:y1, x0:x1], size, interpolation=cv2.INTER_LINEAR)
+
+    def window(self, cx: float, cy: float, half: int) -> Tuple[np.ndarray, int, int]:
+        """以 (cx, cy) 为中心、边长 2*half 的全分辨率窗口，返回 (窗口, 左上角 x, 左上角 y)"""
+        height, width = self.shape
+        x0, y0 = max(int(cx) - half, 0), max(int(cy) - half, 0)
+        x1, y1 = min(int(cx) + half, width), min(int(cy) + half, height)
+        return self.gray[y0:y1, x0:x1], x0, y0
+
+
+def _order_corners(points: np.ndarray) -> np.ndarray:
+    """按 左上、右上、右下、左下 排序四个角点"""
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([
+        points[np.argmin(sums)], points[np.argmin(diffs)],
+        points[np.argmax(sums)], points[np.argmax(diffs)]
+    ], dtype=np.float32)
+
+
+def find_page_corners(pyramid: ImagePyramid) -> np.ndarray:
+    """
+    检测纸张四角（全分辨率坐标，左上、右上、右下、左下）
+
+    粗略层上 Otsu + 最大外轮廓求出四边形，再用 cornerSubPix 在全分辨率的小窗口内精修
+    """
+    index = pyramid.coarse_index
+    coarse = pyramid.level(index)
+    sx, sy = pyramid.scale(index)
+    height, width = pyramid.shape
+
+    _, binary = cv2.threshold(coarse, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    largest = max(contours, key=cv2.contourArea) if contours else None
+    if largest is None or cv2.contourArea(largest) < MIN_PAGE_AREA_RATIO * coarse.size:
+        return np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+
+    approx = cv2.approxPolyDP(largest, 0.02 * cv2.arcLength(largest, True), True)
+    quad = approx.reshape(-1, 2) if len(approx) == 4 else cv2.boxPoints(cv2.minAreaRect(largest))
+    corners = _order_corners(quad.astype(np.float32)) * np.array([sx, sy], dtype=np.float32)
+
+    if index > 0:
+        # 搜索窗口覆盖粗略层的一个像素误差即可
+        half = int(max(sx, sy) * 2) + 2
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.1)
+        refined = corners.reshape(-1, 1, 2).copy()
+        cv2.cornerSubPix(pyramid.gray, refined, (half, half), (-1, -1), criteria)
+        corners = refined.reshape(-1, 2)
+    corners[:, 0] = np.clip(corners[:, 0], 0, width - 1)
+    corners[:, 1] = np.clip(corners[:, 1], 0, height - 1)
+    return corners
+
+
+def _refine_marker(pyramid: ImagePyramid, cx: float, cy: float, size: float) -> Optional[Dict[str, float]]:
+    """在全分辨率窗口内重新二值化，以最大暗色连通区域的质心作为标记中心"""
+    window, x0, y0 = pyramid.window(cx, cy, int(size))
+    if window.size == 0:
+        return None
+    _, binary = cv2.threshold(window, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    contour = max(contours, key=cv2.contourArea)
+    moments = cv2.moments(contour)
+    if moments["m00"] == 0:
+        return None
+    return {
+        "x": round(x0 + moments["m10"] / moments["m00"], 2),
+        "y": round(y0 + moments["m01"] / moments["m00"], 2),
+        "size": round(float(np.sqrt(moments["m00"])), 2)
+    }
+
+
+def find_fiducials(pyramid: ImagePyramid, page_corners: np.ndarray) -> Dict[str, Dict[str, float]]:
+    """
+    检测纸张四角附近的实心方块定位标记，返回 {"tl": {"x", "y", "size"}, ...}（全分辨率坐标）
+
+    粗略层上按方正度、实心度和尺寸筛选暗色轮廓，每个角取距离纸张角点最近的一个，再到全分辨率窗口精修
+    """
+    index = pyramid.coarse_index
+    coarse = pyramid.level(index)
+    sx, sy = pyramid.scale(index)
+    scale = np.array([sx, sy], dtype=np.float32)
+    coarse_corners = page_corners / scale
+
+    page_w = float(np.linalg.norm(coarse_corners[1] - coarse_corners[0]))
+    page_h = float(np.linalg.norm(coarse_corners[3] - coarse_corners[0]))
+    short_side, diagonal = min(page_w, page_h), float(np.hypot(page_w, page_h))
+    min_side, max_side = short_side * FIDUCIAL_MIN_RATIO, short_side * FIDUCIAL_MAX_RATIO
+
+    _, binary = cv2.threshold(coarse, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    best: Dict[str, Tuple[float, np.ndarray, float]] = {}
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if not (min_side <= w <= max_side and min_side <= h <= max_side) or not 0.7 <= w / h <= 1.4:
+            continue
+        # 轮廓面积按边界像素中心计算，实心矩形的面积约为 (w-1)*(h-1)
+        if cv2.contourArea(contour) < 0.75 * (w - 1) * (h - 1):
+            continue
+        center = np.array([x + w / 2, y + h / 2], dtype=np.float32)
+        distances = np.linalg.norm(coarse_corners - center, axis=1)
+        corner = int(np.argmin(distances))
+        if distances[corner] > FIDUCIAL_MAX_CORNER_DISTANCE * diagonal:
+            continue
+        name = CORNER_NAMES[corner]
+        if name not in best or distances[corner] < best[name][0]:
+            best[name] = (float(distances[corner]), center, float(max(w, h)))
+
+    fiducials = {}
+    for name, (_, center, side) in best.items():
+        full = center * scale
+        refined = _refine_marker(pyramid, full[0], full[1], side * max(sx, sy))
+        if refined:
+            fiducials[name] = refined
+    return fiducials
+
+
+def detect_layout(pyramid: ImagePyramid) -> Dict[str, Any]:
+    """纸张边界、方向和定位标记（全分辨率坐标）"""
+    corners = find_page_corners(pyramid)
+    x, y, w, h = cv2.boundingRect(corners.reshape(-1, 1, 2).astype(np.int32))
+    top = float(np.linalg.norm(corners[1] - corners[0]))
+    left = float(np.linalg.norm(corners[3] - corners[0]))
+    return {
+        "paper_bounds": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
+        "page_corners": np.round(corners, 2).tolist(),
+        "orientation": "portrait" if left >= top else "landscape",
+        "fiducials": find_fiducials(pyramid, corners),
+        "pyramid_level": pyramid.coarse_index
+    }
+
+
+def _quad_area(points: np.ndarray) -> float:
+    return float(cv2.contourArea(np.asarray(points, dtype=np.float32).reshape(-1, 1, 2)))
+
+
+def page_layout_json(layout_json: Optional[Dict[str, Any]], page: int = 1) -> Optional[Dict[str, Any]]:
+    """
+    多页试卷中第 page 页的版面：layout_json["pages"][page - 1] 覆盖顶层的公共配置（page_size、fiducials 等）；
+    没有 pages 或页码超出时使用顶层版面
+    """
+    pages = (layout_json or {}).get("pages")
+    if not pages or not 1 <= page <= len(pages):
+        return layout_json
+    base = {key: value for key, value in layout_json.items() if key != "pages"}
+    return {**base, **pages[page - 1]}
+
+
+class PaperTemplate:
+    """
+    试卷校正模板：标准页面尺寸、定位标记的期望中心、二维码区域和按标准尺寸预先编译的气泡坐标
+
+    由 layout_json 和 qr_schema 构建，按 paper_id 缓存；版面坐标以像素边缘为原点，检测到的质心以像素中心为原点，
+    求变换时统一减去半个像素
+    """
+
+    def __init__(self, layout_json: Optional[Dict[str, Any]], qr_schema: Optional[Dict[str, Any]] = None):
+        self.layout_json = layout_json or {}
+        # 二维码在页面中的位置（相对页面宽高的比例），未知时由 sheet_qr 使用默认位置
+        self.qr_region: Optional[Dict[str, float]] = (qr_schema or {}).get("region")
+        width, height = self.layout_json.get("page_size") or DEFAULT_PAGE_SIZE
+        self.page_size = (int(width), int(height))
+        centers = (self.layout_json.get("fiducials") or {}).get("centers") or {}
+        self.fiducials = {
+            name: (float(centers[name][0]) - 0.5, float(centers[name][1]) - 0.5)
+            for name in CORNER_NAMES if name in centers
+        }
+        self.page_corners = np.array(
+            [[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32
+        ) - 0.5
+        self.bubbles: Optional[BubbleLayout] = compile_layout(self.layout_json, (self.page_size[1], self.page_size[0]))
+        self._fiducial_area_ratio = (
+            _quad_area([self.fiducials[name] for name in CORNER_NAMES]) / _quad_area(self.page_corners)
+            if len(self.fiducials) == 4 else None
+        )
+
+    def transform(self, layout_info: Dict[str, Any]) -> Tuple[np.ndarray, str]:
+        """
+        全分辨率扫描坐标 -> 模板坐标的单应矩阵，返回 (3x3 矩阵, 使用的方法)
+
+        四个定位标记齐全且几何合理时求透视变换；缺一个时用其余三个求仿射变换；否则退回纸张四角
+        """
+        detected = layout_info.get("fiducials") or {}
+        names = [name for name in CORNER_NAMES if name in detected and name in self.fiducials]
+        source = np.array([[detected[name]["x"], detected[name]["y"]] for name in names], dtype=np.float32)
+        target = np.array([self.fiducials[name] for name in names], dtype=np.float32)
+        page_corners = np.array(layout_info["page_corners"], dtype=np.float32)
+
+        if len(names) == 4 and self._fiducial_area_ratio:
+            ratio = _quad_area(source) / max(_quad_area(page_corners), 1.0)
+            if abs(ratio / self._fiducial_area_ratio - 1) <= FIDUCIAL_AREA_TOLERANCE:
+                return cv2.getPerspectiveTransform(source, target), "fiducials"
+        if len(names) == 3:
+            affine = cv2.getAffineTransform(source, target)
+            return np.vstack([affine, [0, 0, 1]]), "fiducials_affine"
+        return cv2.getPerspectiveTransform(page_corners, self.page_corners), "page_corners"
+
+    def warp(self, pyramid: ImagePyramid, layout_info: Dict[str, Any]) -> Tuple[np.ndarray, str]:
+        """
+        把扫描件透视校正到模板的标准尺寸，返回 (校正后的灰度图, 使用的方法)
+
+        从金字塔中仍不小于标准尺寸的最粗一层取样，矩阵相应地左乘该层到全分辨率的缩放
+        """
+        matrix, method = self.transform(layout_info)
+        bounds = layout_info["paper_bounds"]
+        index = pyramid.region_level(bounds["width"], bounds["height"], self.page_size)
+        sx, sy = pyramid.scale(index)
+        # 该层像素中心 i 对应全分辨率坐标 (i + 0.5) * s - 0.5
+        to_full = np.array([[sx, 0, 0.5 * sx - 0.5], [0, sy, 0.5 * sy - 0.5], [0, 0, 1]])
+        warped = cv2.warpPerspective(
+            pyramid.level(index), matrix @ to_full, self.page_size,
+            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE
+        )
+        return warped, method
@@ -0,0 +1,140 @@
+# workers/sheet_qr.py - 答题卡二维码识别：先在 qr_schema 约定的区域内解码，失败再搜索整页
+"""
+二维码内容由 backend/app/services/pdf_generator.py 的 generate_answer_sheet_qr 生成，
+格式定义在 shared/qr_payload.py（后端和 worker 共用）：
+
+    sx1?p=<paper_id>&pg=<页码>&s=<学生标识>
+
+qr_schema.region 给出二维码在页面中的位置（相对页面宽高的比例）。识别时把该区域按纸张四角映射到扫描件上，
+适当外扩后从金字塔中分辨率够用的一层裁剪解码；区域内解不出来（试卷未知、模板变更、区域被遮挡）时再在整页上搜索。
+"""
+
+import os
+import sys
+import threading
+import time
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from page_layout import ImagePyramid
+
+try:
+    from shared.qr_payload import QR_REGION, parse_qr_payload
+except ImportError:
+    # 在 workers 目录下直接运行时仓库根目录不在 sys.path 中（容器内由 PYTHONPATH=/app 提供）
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from shared.qr_payload import QR_REGION, parse_qr_payload
+
+logger = logging.getLogger(__name__)
+
+# qr_schema 没有给出 region 时按默认位置查找
+DEFAULT_QR_REGION = QR_REGION
+# 区域向四周外扩的比例，容纳版面检测和打印位置的误差
+ROI_MARGIN = 0.25
+# 区域在所选金字塔层上的最小边长（像素），保证每个码元至少约 3 个像素
+ROI_MIN_SIDE = 200
+# 整页搜索先在长边不超过 FULL_PAGE_MAX_SIDE 的层上进行，失败再试高一级分辨率（长边不超过 FULL_PAGE_LIMIT），
+# 不在 300dpi 以上的全分辨率图像上搜索（单次超过 0.5 秒）
+FULL_PAGE_MAX_SIDE = 1200
+FULL_PAGE_LIMIT = 2400
+
+
+class SheetQRReader:
+    """二维码读取器：cv2.QRCodeDetector 不是线程安全的，每个任务线程各用一个"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # 统计信息
+        self.roi_hits = 0
+        self.full_page_hits = 0
+        self.failures = 0
+
+    def _detector(self) -> cv2.QRCodeDetector:
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = self._local.detector = cv2.QRCodeDetector()
+        return detector
+
+    def _decode(self, image: np.ndarray) -> Tuple[str, Optional[np.ndarray]]:
+        try:
+            text, points, _ = self._detector().detectAndDecode(image)
+        except cv2.error:
+            return "", None
+        return text, points
+
+    def _roi(self, pyramid: ImagePyramid, page_corners, region: Dict[str, float]) -> Tuple[int, int, int, int]:
+        """把页面比例坐标的区域映射到全分辨率扫描件上，返回外扩后的 (x0, y0, x1, y1)"""
+        unit = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float32)
+        to_scan = cv2.getPerspectiveTransform(unit, np.asarray(page_corners, dtype=np.float32))
+        x, y, w, h = region["x"], region["y"], region["width"], region["height"]
+        corners = np.array([[[x - w * ROI_MARGIN, y - h * ROI_MARGIN], [x + w * (1 + ROI_MARGIN), y - h * ROI_MARGIN],
+                             [x + w * (1 + ROI_MARGIN), y + h * (1 + ROI_MARGIN)],
+                             [x - w * ROI_MARGIN, y + h * (1 + ROI_MARGIN)]]], dtype=np.float32)
+        mapped = cv2.perspectiveTransform(corners, to_scan)[0]
+        height, width = pyramid.shape
+        x0, y0 = np.clip(np.floor(mapped.min(axis=0)), 0, [width, height]).astype(int)
+        x1, y1 = np.clip(np.ceil(mapped.max(axis=0)), 0, [width, height]).astype(int)
+        return int(x0), int(y0), int(x1), int(y1)
+
+    def read(self, pyramid: ImagePyramid, page_corners=None,
+             region: Optional[Dict[str, float]] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取答题卡二维码，返回 {"x", "y", "width", "height", "content", "raw", "source", "decode_ms"}（全分辨率坐标），
+        解不出来时返回 None
+        """
+        start = time.perf_counter()
+        height, width = pyramid.shape
+        if page_corners is None:
+            page_corners = [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]]
+
+        x0, y0, x1, y1 = self._roi(pyramid, page_corners, region or DEFAULT_QR_REGION)
+        source, text, points, index, offset = "roi", "", None, 0, (0, 0)
+        if x1 - x0 > 0 and y1 - y0 > 0:
+            index = 0
+            while True:
+                sx, sy = pyramid.scale(index + 1)
+                if min((x1 - x0) / sx, (y1 - y0) / sy) < ROI_MIN_SIDE:
+                    break
+                index += 1
+            sx, sy = pyramid.scale(index)
+            lx0, ly0 = int(x0 / sx), int(y0 / sy)
+            roi = pyramid.level(index)[ly0:int(np.ceil(y1 / sy)), lx0:int(np.ceil(x1 / sx))]
+            text, points = self._decode(roi)
+            offset = (lx0, ly0)
+
+        if not text:
+            source, index, offset = "full_page", pyramid.level_for(FULL_PAGE_MAX_SIDE), (0, 0)
+            text, points = self._decode(pyramid.level(index))
+            if not text and index > 0 and max(pyramid.level(index - 1).shape) <= FULL_PAGE_LIMIT:
+                index -= 1
+                text, points = self._decode(pyramid.level(index))
+
+        content = parse_qr_payload(text)
+        decode_ms = round((time.perf_counter() - start) * 1000, 2)
+        with self._lock:
+            if content is None:
+                self.failures += 1
+            elif source == "roi":
+                self.roi_hits += 1
+            else:
+                self.full_page_hits += 1
+        if content is None:
+            if text:
+                logger.warning(f"二维码内容无法解析: {text[:60]}")
+            return None
+
+        sx, sy = pyramid.scale(index)
+        quad = (points.reshape(-1, 2) + np.array(offset)) * np.array([sx, sy])
+        qx0, qy0 = quad.min(axis=0)
+        qx1, qy1 = quad.max(axis=0)
+        return {
+            "x": int(qx0), "y": int(qy0), "width": int(qx1 - qx0), "height": int(qy1 - qy0),
+            "content": content,
+            "raw": text,
+            "source": source,
+            "decode_ms": decode_ms
+        }
@@ -0,0 +1,193 @@
+# workers/synthetic_sheets.py - 合成答题卡：pytest 用例和 benchmark_workers.py 使用，Worker 运行时不导入
+"""
+按版面 JSON 生成合成答题卡（随机作答、涂卡深浅和噪声），再模拟扫描（旋转、透视、深色背景）和打印二维码，
+识别结果可以和生成时的真实值逐项比对；另外生成多页 TIFF / PDF 扫描件用于逐页解码。
+"""
+
+import io
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from document_pages import pdfium
+from omr_engine import DEFAULT_BUBBLE_SIZE, DEFAULT_FIDUCIALS, DEFAULT_PAGE_SIZE, _expand_layout
+from sheet_qr import DEFAULT_QR_REGION
+
+
+def make_grid_layout(question_count: int = 100, columns: int = 4, options: str = "ABCD",
+                     q_type: str = "single") -> Dict[str, Any]:
+    """生成按列排列的网格版面（800x1200 页面），用于合成答题卡"""
+    per_column = -(-question_count // columns)
+    column_width = (DEFAULT_PAGE_SIZE[0] - 80) // columns
+    question_pitch = min(28, (DEFAULT_PAGE_SIZE[1] - 340) // max(per_column, 1))
+    blocks = []
+    for c in range(columns):
+        first = c * per_column + 1
+        count = min(per_column, question_count - c * per_column)
+        if count <= 0:
+            break
+        blocks.append({
+            "first_question": first, "count": count, "type": q_type, "options": options,
+            "origin": [40 + c * column_width, 300],
+            "option_pitch": min(36, column_width // (len(options) + 1)),
+            "question_pitch": question_pitch
+        })
+    return {
+        "page_size": list(DEFAULT_PAGE_SIZE),
+        "fiducials": DEFAULT_FIDUCIALS,
+        "omr": {"bubble_size": list(DEFAULT_BUBBLE_SIZE), "blocks": blocks}
+    }
+
+
+def generate_synthetic_sheet(
+    layout_json: Dict[str, Any],
+    marks: Dict[str, List[str]],
+    rng: Optional[np.random.Generator] = None,
+    noise: float = 8.0,
+    darkness: Tuple[float, float] = (0.55, 0.95),
+    erased: Optional[Dict[str, List[str]]] = None
+) -> np.ndarray:
+    """
+    按版面生成合成答题卡灰度图，用于测试和基准
+
+    marks 为每题涂黑的选项，涂卡深浅和覆盖范围随机；erased 中的选项画成擦除后残留的浅痕
+    """
+    rng = rng or np.random.default_rng(0)
+    page_width, page_height = layout_json.get("page_size") or DEFAULT_PAGE_SIZE
+    omr = layout_json["omr"]
+    bubble_w, bubble_h = omr.get("bubble_size") or DEFAULT_BUBBLE_SIZE
+    image = np.full((int(page_height), int(page_width)), 235, dtype=np.uint8)
+    erased = erased or {}
+
+    fiducials = layout_json.get("fiducials")
+    if fiducials:
+        half = fiducials["size"] / 2
+        for cx, cy in fiducials["centers"].values():
+            cv2.rectangle(image, (int(cx - half), int(cy - half)), (int(cx + half) - 1, int(cy + half) - 1), 20, -1)
+
+    for question, _, bubbles in _expand_layout(omr):
+        for label, x, y in bubbles:
+            center = (int(x + bubble_w / 2), int(y + bubble_h / 2))
+            axes = (int(bubble_w / 2), int(bubble_h / 2))
+            cv2.ellipse(image, center, axes, 0, 0, 360, 120, 1, cv2.LINE_AA)
+            if label in marks.get(question, ()):
+                level = int(235 * (1 - rng.uniform(*darkness)))
+                jitter = rng.integers(-2, 3, size=2)
+                fill_axes = (max(axes[0] - int(rng.integers(0, 3)), 1), max(axes[1] - int(rng.integers(0, 2)), 1))
+                cv2.ellipse(image, (center[0] + int(jitter[0]), center[1] + int(jitter[1])),
+                            fill_axes, 0, 0, 360, level, -1, cv2.LINE_AA)
+            elif label in erased.get(question, ()):
+                cv2.ellipse(image, center, (axes[0] - 2, axes[1] - 2), 0, 0, 360, 200, -1, cv2.LINE_AA)
+
+    noisy = image.astype(np.float32) + rng.normal(0, noise, image.shape).astype(np.float32)
+    return cv2.GaussianBlur(np.clip(noisy, 0, 255).astype(np.uint8), (3, 3), 0)
+
+
+def random_marks(
+    layout_json: Dict[str, Any],
+    rng: np.random.Generator,
+    blank_rate: float = 0.03,
+    multi_rate: float = 0.03
+) -> Dict[str, List[str]]:
+    """为合成答题卡随机生成作答：大部分题目单涂，少量空白或多涂"""
+    marks = {}
+    for question, q_type, bubbles in _expand_layout(layout_json["omr"]):
+        labels = [label for label, _, _ in bubbles]
+        roll = rng.random()
+        if roll < blank_rate:
+            marks[question] = []
+        elif roll < blank_rate + multi_rate or q_type == 'multiple':
+            count = int(rng.integers(2, len(labels) + 1))
+            marks[question] = sorted(rng.choice(labels, size=count, replace=False).tolist())
+        else:
+            marks[question] = [labels[int(rng.integers(len(labels)))]]
+    return marks
+
+
+def render_scan(
+    page: np.ndarray,
+    dpi: int = 300,
+    rotation_deg: float = 1.5,
+    rng: Optional[np.random.Generator] = None,
+    margin: float = 0.04,
+    background: int = 70
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把标准尺寸的合成答题卡放到 A4@dpi 的扫描画布上（轻微旋转和透视、深色背景、噪声），用于测试和基准
+
+    Returns:
+        (BGR 扫描图像, 纸张四角在扫描图像中的真实坐标)
+    """
+    rng = rng or np.random.default_rng(0)
+    scan_w, scan_h = int(round(8.27 * dpi)), int(round(11.69 * dpi))
+    page_h, page_w = page.shape[:2]
+
+    paper_w, paper_h = scan_w * (1 - 2 * margin), scan_h * (1 - 2 * margin)
+    center = np.array([scan_w / 2, scan_h / 2])
+    theta = np.deg2rad(rotation_deg)
+    rotation = np.array([[np.cos(theta), -np.sin(theta)], [np.sin(theta), np.cos(theta)]])
+    offsets = np.array([[-paper_w / 2, -paper_h / 2], [paper_w / 2, -paper_h / 2],
+                        [paper_w / 2, paper_h / 2], [-paper_w / 2, paper_h / 2]])
+    jitter = rng.uniform(-0.004, 0.004, size=(4, 2)) * np.array([paper_w, paper_h])
+    target = (offsets @ rotation.T + center + jitter).astype(np.float32)
+    source = np.array([[0, 0], [page_w, 0], [page_w, page_h], [0, page_h]], dtype=np.float32)
+
+    matrix = cv2.getPerspectiveTransform(source, target)
+    gray = cv2.warpPerspective(page, matrix, (scan_w, scan_h), flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=background)
+    noisy = gray.astype(np.float32) + rng.normal(0, 4, gray.shape).astype(np.float32)
+    scan = cv2.cvtColor(np.clip(noisy, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+    return scan, target
+
+
+def render_qr(page: np.ndarray, payload: str, region: Optional[Dict[str, float]] = None) -> np.ndarray:
+    """把二维码画到标准尺寸的合成答题卡上（居中放在 region 内，保留静区），用于测试和基准"""
+    region = region or DEFAULT_QR_REGION
+    code = cv2.QRCodeEncoder.create().encode(payload)
+    height, width = page.shape[:2]
+    side = int(min(region["width"] * width, region["height"] * height))
+    module = max(side // code.shape[0], 1)
+    code = cv2.resize(code, (code.shape[1] * module, code.shape[0] * module), interpolation=cv2.INTER_NEAREST)
+    x = int(region["x"] * width + (region["width"] * width - code.shape[1]) / 2)
+    y = int(region["y"] * height + (region["height"] * height - code.shape[0]) / 2)
+    out = page.copy()
+    # 编码结果为白底黑码，白色码元换成纸张底色
+    paper = int(np.median(page))
+    out[y:y + code.shape[0], x:x + code.shape[1]] = np.where(code > 127, paper, 20).astype(page.dtype)
+    return out
+
+
+def scanned_document(kind: str, pages: int, dpi: int) -> bytes:
+    """生成 pages 页的扫描件：A4 按 dpi 的 JPEG 页面，打包为多页 TIFF 或每页一张图片的 PDF"""
+    rng = np.random.default_rng(0)
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    noise = cv2.GaussianBlur(rng.integers(220, 256, size=(height, width, 3), dtype=np.uint8), (15, 15), 0)
+    images = []
+    for i in range(pages):
+        page = noise.copy()
+        cv2.rectangle(page, (width // 20, height // 20), (width * 19 // 20, height * 19 // 20), (30, 30, 30), 4)
+        for q in range(10):
+            cv2.putText(page, f"{i + 1}-{q + 1}", (width // 10, height // 8 + q * height // 13),
+                        cv2.FONT_HERSHEY_SIMPLEX, dpi / 100, (0, 0, 0), 3)
+        images.append(page)
+    if kind == "tiff":
+        # opencv-python 4.8 没有 imencodemulti，多页 TIFF 用 Pillow 写出（Deflate 压缩）
+        frames = [Image.fromarray(cv2.cvtColor(page, cv2.COLOR_BGR2RGB)) for page in images]
+        buffer = io.BytesIO()
+        frames[0].save(buffer, format="TIFF", save_all=True, append_images=frames[1:],
+                       compression="tiff_adobe_deflate")
+        return buffer.getvalue()
+    pdf = pdfium.PdfDocument.new()
+    for page in images:
+        ok, jpeg = cv2.imencode(".jpg", page, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        image = pdfium.PdfImage.new(pdf)
+        image.load_jpeg(io.BytesIO(jpeg.tobytes()), inline=False)
+        image.set_matrix(pdfium.PdfMatrix().scale(595, 842))
+        pdf_page = pdf.new_page(595, 842)
+        pdf_page.insert_obj(image)
+        pdf_page.gen_content()
+    buffer = io.BytesIO()
+    pdf.save(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,126 @@
+# workers/task_watchdog.py - 任务超时：协作式截止时间和按任务类型统计的耗时直方图
+"""
+TaskQueue.consume_tasks 的看门狗按 TaskMessage.timeout_seconds 检查进行中的任务，超时的任务进入重试流程；
+进程池模式下直接结束执行该任务的子进程，线程池模式下线程无法被强制结束，只能放弃等待。
+
+处理器在阶段之间调用 check_deadline()，超时后抛出 TaskTimeoutError 提前结束；
+阻塞的网络调用用 remaining_time() 限制超时，避免在截止时间之后继续等待：
+
+    check_deadline("OMR识别")
+    requests.post(url, json=payload, timeout=remaining_time(30))
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# 耗时直方图的桶上界（秒）
+DURATION_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+
+_local = threading.local()
+
+
+class TaskTimeoutError(Exception):
+    """任务超过截止时间"""
+
+
+@contextmanager
+def task_deadline(seconds: Optional[float]):
+    """在当前线程内设置任务截止时间（seconds 为空时不限制）"""
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = time.monotonic() + seconds if seconds else None
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def with_current_deadline(fn):
+    """包装 fn：在其他线程中执行时沿用当前线程的任务截止时间（用于任务内部的线程池，如多页文档逐页并行处理）"""
+    deadline = getattr(_local, "deadline", None)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_local, "deadline", None)
+        _local.deadline = deadline
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.deadline = previous
+    return wrapper
+
+
+def remaining_time(cap: Optional[float] = None) -> Optional[float]:
+    """当前任务剩余的秒数（不超过 cap）；没有截止时间时返回 cap，已超时时抛出 TaskTimeoutError"""
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None:
+        return cap
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TaskTimeoutError("任务已超过截止时间")
+    return min(remaining, cap) if cap is not None else remaining
+
+
+def check_deadline(stage: str = ""):
+    """已超过当前任务的截止时间时抛出 TaskTimeoutError"""
+    deadline = getattr(_local, "deadline", None)
+    if deadline is not None and time.monotonic() > deadline:
+        raise TaskTimeoutError(f"任务在{stage or '处理'}前已超过截止时间")
+
+
+class TaskDurationHistogram:
+    """按任务类型统计的任务耗时直方图和超时次数（线程安全），用于调整 timeout_seconds"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def observe(self, task_type: str, seconds: float, timed_out: bool = False):
+        with self._lock:
+            stats = self._stats.get(task_type)
+            if stats is None:
+                stats = self._stats[task_type] = {
+                    "count": 0, "timeouts": 0, "sum": 0.0, "max": 0.0, "counts": [0] * (len(self.buckets) + 1)
+                }
+            stats["count"] += 1
+            stats["timeouts"] += timed_out
+            stats["sum"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["counts"][bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def quantile(self, task_type: str, q: float) -> Optional[float]:
+        """耗时的 q 分位数所在桶的上界（落在最后一个桶时返回观测到的最大值）"""
+        with self._lock:
+            stats = self._stats.get(task_type)
+            if not stats:
+                return None
+            rank = q * stats["count"]
+            seen = 0
+            for bound, count in zip(self.buckets, stats["counts"]):
+                seen += count
+                if seen >= rank:
+                    return float(bound)
+            return stats["max"]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """{任务类型: {"count", "timeouts", "mean", "max", "p95", "buckets": {"<=上界": 次数, ">最大上界": 次数}}}"""
+        with self._lock:
+            task_types = list(self._stats)
+        result = {}
+        for task_type in task_types:
+            with self._lock:
+                stats = dict(self._stats[task_type], counts=list(self._stats[task_type]["counts"]))
+            labels = [f"<={bound:g}s" for bound in self.buckets] + [f">{self.buckets[-1]:g}s"]
+            result[task_type] = {
+                "count": stats["count"],
+                "timeouts": stats["timeouts"],
+                "mean": round(stats["sum"] / stats["count"], 3),
+                "max": round(stats["max"], 3),
+                "p95": self.quantile(task_type, 0.95),
+                "buckets": {label: count for label, count in zip(labels, stats["counts"]) if count}
+            }
+        return result
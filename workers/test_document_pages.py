@@ -0,0 +1,82 @@
+# workers/test_document_pages.py - 多页文档逐页解码与并行处理用例
+
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from document_pages import HAS_PDFIUM, IMAGE, PDF, TIFF, document_format, iter_pages, map_pages
+from synthetic_sheets import scanned_document
+
+KINDS = ["tiff", pytest.param("pdf", marks=pytest.mark.skipif(not HAS_PDFIUM, reason="未安装 pypdfium2"))]
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_iter_pages_decodes_every_page(kind):
+    data = scanned_document(kind, 3, 50)
+    assert document_format(data) == (TIFF if kind == "tiff" else PDF)
+
+    pages = list(iter_pages(data, dpi=50))
+    assert [page.number for page in pages] == [1, 2, 3]
+    assert all(page.image.ndim == 3 and page.image.shape[0] > page.image.shape[1] for page in pages)
+    assert {page.total for page in pages} == {3}
+
+
+def test_iter_pages_tiff_grayscale_and_corrupt():
+    data = scanned_document("tiff", 2, 50)
+    pages = list(iter_pages(data, flags=cv2.IMREAD_GRAYSCALE))
+    assert [page.image.ndim for page in pages] == [2, 2]
+    with pytest.raises(ValueError):
+        list(iter_pages(data[:4] + b"\x00" * 64))
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_iter_pages_skips_saved_pages(kind):
+    pages = iter_pages(scanned_document(kind, 4, 50), dpi=50, skip={1, 3})
+    assert [page.number for page in pages] == [2, 4]
+
+
+def test_iter_pages_single_image():
+    ok, jpeg = cv2.imencode(".jpg", np.full((80, 60, 3), 200, dtype=np.uint8))
+    data = jpeg.tobytes()
+    assert document_format(data) == IMAGE
+    assert [(page.number, page.total) for page in iter_pages(data)] == [(1, 1)]
+    assert list(iter_pages(data, skip={1})) == []
+    with pytest.raises(ValueError):
+        list(iter_pages(b"not an image"))
+
+
+def test_map_pages_isolates_failed_page():
+    pages = iter_pages(scanned_document("tiff", 5, 50))
+
+    def handler(page):
+        if page.number == 2:
+            raise RuntimeError("模拟第 2 页处理失败")
+        return page.number * 10
+
+    results = {number: (result, error) for number, result, error in map_pages(pages, handler, concurrency=2)}
+    assert sorted(results) == [1, 2, 3, 4, 5]
+    assert isinstance(results[2][1], RuntimeError)
+    assert {number: result for number, (result, error) in results.items() if error is None} == {
+        1: 10, 3: 30, 4: 40, 5: 50
+    }
+
+
+def test_map_pages_limits_concurrency():
+    pages = iter_pages(scanned_document("tiff", 6, 50))
+    lock = threading.Lock()
+    running = peak = 0
+
+    def handler(page):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    assert len(list(map_pages(pages, handler, concurrency=3))) == 6
+    assert peak == 3
@@ -0,0 +1,162 @@
+# workers/test_idempotency.py - 按 task_id 幂等执行用例
+# 默认使用进程内 PostgreSQL 替身（按语句前缀模拟，不执行认领 SQL 本身）；设置 TEST_POSTGRES_URL 后
+# 同样的用例还在真实 PostgreSQL 的临时 schema 中执行一遍，覆盖 ON CONFLICT ... WHERE 的认领条件
+
+import os
+import time
+import uuid
+
+import psycopg2
+import pytest
+
+from db_pool import ConnectionPool
+from idempotency import CLAIMED, COMPLETED, IN_PROGRESS, IdempotencyStore, idempotent
+from local_postgres import LocalDatabase
+from task_manager import TaskDeferred, create_auto_grade_task
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "migrations")
+
+
+def _migration_statements(name, skip=()):
+    with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as f:
+        sql = "\n".join(line for line in f if not line.startswith("--"))
+    return [statement for statement in sql.split(";") if statement.strip() and not any(s in statement for s in skip)]
+
+
+@pytest.fixture(params=["local", "postgres"])
+def store(request):
+    if request.param == "local":
+        db = LocalDatabase(questions=0, connect_ms=0)
+        yield IdempotencyStore(ConnectionPool(dsn="local://", connect=db.connect))
+        return
+
+    dsn = os.getenv("TEST_POSTGRES_URL")
+    if not dsn:
+        pytest.skip("未设置 TEST_POSTGRES_URL")
+    schema = f"test_idempotency_{uuid.uuid4().hex[:8]}"
+    admin = psycopg2.connect(dsn)
+    admin.autocommit = True
+    cur = admin.cursor()
+    cur.execute(f"CREATE SCHEMA {schema}")
+    cur.execute(f"SET search_path TO {schema}")
+    # task_callbacks 依赖业务表 answer_sheets，这里只建幂等记录用到的表
+    for statement in (_migration_statements("add_task_executions.sql", skip=("task_callbacks",))
+                      + _migration_statements("add_task_pages.sql")):
+        cur.execute(statement)
+    pool = ConnectionPool(dsn=dsn, connect=lambda dsn: psycopg2.connect(dsn, options=f"-c search_path={schema}"))
+    try:
+        yield IdempotencyStore(pool)
+    finally:
+        pool.close()
+        cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+def _complete(store, task, result):
+    with store.db_pool.connection() as conn:
+        cur = conn.cursor()
+        store.complete(cur, task, result)
+        conn.commit()
+
+
+def test_completed_task_is_not_claimed_again(store):
+    task = create_auto_grade_task(1, [])
+    assert store.claim(task).status == CLAIMED
+    _complete(store, task, {"score": 8})
+
+    claim = store.claim(task)
+    assert claim.status == COMPLETED
+    assert claim.result == {"score": 8}
+    assert store.stats()["duplicates_skipped"] == 1
+
+
+def test_running_task_is_in_progress_until_released(store):
+    task = create_auto_grade_task(2, [])
+    assert store.claim(task).status == CLAIMED
+    claim = store.claim(task)
+    assert claim.status == IN_PROGRESS
+    # 返回另一个 Worker 认领的剩余时间，重复投递的消息在到期后再重新投递
+    assert task.timeout_seconds - 5 < claim.lease_seconds <= task.timeout_seconds
+    assert store.stats()["duplicates_in_flight"] == 1
+
+    store.release(task)
+    assert store.claim(task).status == CLAIMED
+
+
+def test_expired_lease_can_be_reclaimed(store):
+    # 认领有效期为 timeout_seconds：Worker 崩溃后其他 Worker 可以在到期后接手
+    task = create_auto_grade_task(3, [])
+    task.timeout_seconds = 0
+    assert store.claim(task).status == CLAIMED
+    time.sleep(0.01)
+    assert store.claim(task).status == CLAIMED
+
+
+def test_completed_task_is_not_reclaimed_after_lease(store):
+    # 认领条件只对 failed 和租约过期的 running 记录生效，已完成的记录不受 lease_until 影响
+    task = create_auto_grade_task(7, [])
+    task.timeout_seconds = 0
+    assert store.claim(task).status == CLAIMED
+    _complete(store, task, None)
+    time.sleep(0.01)
+    assert store.claim(task).status == COMPLETED
+
+
+def test_completed_pages(store):
+    task = create_auto_grade_task(4, [])
+    assert store.claim(task).status == CLAIMED
+    with store.db_pool.connection() as conn:
+        cur = conn.cursor()
+        store.complete_page(cur, task, 1, {"items": 3})
+        store.complete_page(cur, task, 3, None)
+        conn.commit()
+    assert store.completed_pages(task) == {1: {"items": 3}, 3: None}
+    assert store.completed_pages(create_auto_grade_task(5, [])) == {}
+
+
+def test_idempotent_decorator_releases_on_failure(store):
+    class Processor:
+        def __init__(self):
+            self.idempotency = store
+            self.runs = 0
+            self.fail = True
+
+        @idempotent
+        def process_task(self, task):
+            self.runs += 1
+            if self.fail:
+                raise RuntimeError("模拟处理失败")
+            _complete(store, task, None)
+            return True
+
+    processor = Processor()
+    task = create_auto_grade_task(6, [])
+    with pytest.raises(RuntimeError):
+        processor.process_task(task)
+    processor.fail = False
+    assert processor.process_task(task) is True
+    # 已完成的重复投递直接确认，不再处理
+    assert processor.process_task(task) is True
+    assert processor.runs == 2
+
+
+def test_idempotent_decorator_defers_duplicate_in_flight(store):
+    class Processor:
+        def __init__(self):
+            self.idempotency = store
+            self.runs = 0
+
+        @idempotent
+        def process_task(self, task):
+            self.runs += 1
+            return True
+
+    processor = Processor()
+    task = create_auto_grade_task(8, [])
+    assert store.claim(task).status == CLAIMED
+    # 另一个 Worker 仍持有认领：不处理、不释放认领，交给任务队列按剩余认领时间延迟重新投递
+    with pytest.raises(TaskDeferred) as deferred:
+        processor.process_task(task)
+    assert processor.runs == 0
+    assert 0 < deferred.value.delay <= task.timeout_seconds
+    assert store.claim(task).status == IN_PROGRESS
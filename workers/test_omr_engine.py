@@ -0,0 +1,38 @@
+# workers/test_omr_engine.py - OMR 涂卡识别用例（合成答题卡）
+
+import numpy as np
+
+from omr_engine import compile_layout, read_bubbles
+from synthetic_sheets import generate_synthetic_sheet, make_grid_layout
+
+
+def _read(marks, question_count=8, **kwargs):
+    layout_json = make_grid_layout(question_count, columns=2)
+    gray = generate_synthetic_sheet(layout_json, marks, np.random.default_rng(1), **kwargs)
+    return read_bubbles(gray, compile_layout(layout_json, gray.shape))
+
+
+def test_single_marks_are_read():
+    marks = {str(q): ["ABCD"[q % 4]] for q in range(1, 9)}
+    result = _read(marks)
+    assert {q: answer["marked"] for q, answer in result["answers"].items()} == marks
+    assert result["quality_issues"] == []
+
+
+def test_multi_mark_and_blank_are_flagged():
+    marks = {str(q): ["A"] for q in range(1, 9)}
+    marks["3"] = ["B", "D"]
+    marks["6"] = []
+    result = _read(marks)
+
+    assert result["answers"]["3"]["marked"] == ["B", "D"]
+    assert result["answers"]["6"]["marked"] == []
+    issues = {issue["question"]: issue["issue"] for issue in result["quality_issues"]}
+    assert issues == {3: "MULTI_MARK", 6: "BLANK"}
+
+
+def test_erased_mark_is_not_read():
+    marks = {str(q): ["A"] for q in range(1, 9)}
+    result = _read(marks, erased={"2": ["C"]})
+    assert result["answers"]["2"]["marked"] == ["A"]
+    assert all(issue["question"] != 2 for issue in result["quality_issues"])
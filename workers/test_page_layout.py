@@ -0,0 +1,52 @@
+# workers/test_page_layout.py - 版面检测与透视校正用例（合成扫描件）
+
+import numpy as np
+import pytest
+
+from omr_engine import read_bubbles
+from page_layout import ImagePyramid, PaperTemplate, detect_layout, page_layout_json
+from synthetic_sheets import generate_synthetic_sheet, make_grid_layout, random_marks, render_scan
+
+
+@pytest.fixture(scope="module")
+def layout_json():
+    return make_grid_layout(40)
+
+
+@pytest.mark.parametrize("rotation_deg", [-2.5, 0.0, 2.5])
+def test_warp_aligns_bubbles(layout_json, rotation_deg):
+    rng = np.random.default_rng(int(rotation_deg * 10) + 100)
+    marks = random_marks(layout_json, rng, blank_rate=0, multi_rate=0)
+    page = generate_synthetic_sheet(layout_json, marks, rng)
+    scan, truth = render_scan(page, dpi=200, rotation_deg=rotation_deg, rng=rng)
+
+    pyramid = ImagePyramid(scan)
+    info = detect_layout(pyramid)
+    template = PaperTemplate(layout_json)
+    corrected, method = template.warp(pyramid, info)
+
+    assert method == "fiducials"
+    assert corrected.shape[:2] == (template.page_size[1], template.page_size[0])
+    # 检测到的纸张四角与合成时的真实位置相差不超过 1%
+    corners = np.array(info["page_corners"], dtype=np.float32)
+    assert np.abs(corners - truth).max() < 0.01 * scan.shape[0]
+    result = read_bubbles(corrected, template.bubbles)
+    assert {q: answer["marked"] for q, answer in result["answers"].items()} == marks
+
+
+def test_warp_falls_back_without_fiducials(layout_json):
+    layout_json = {key: value for key, value in layout_json.items() if key != "fiducials"}
+    rng = np.random.default_rng(7)
+    page = generate_synthetic_sheet(layout_json, random_marks(layout_json, rng), rng)
+    scan, _ = render_scan(page, dpi=150, rotation_deg=1.0, rng=rng)
+
+    pyramid = ImagePyramid(scan)
+    _, method = PaperTemplate(layout_json).warp(pyramid, detect_layout(pyramid))
+    assert method != "fiducials"
+
+
+def test_page_layout_json_merges_page_overrides():
+    layout_json = {"page_size": [800, 1200], "pages": [{"omr": {"blocks": []}}, {"page_size": [600, 900]}]}
+    assert page_layout_json(layout_json, 1) == {"page_size": [800, 1200], "omr": {"blocks": []}}
+    assert page_layout_json(layout_json, 2) == {"page_size": [600, 900]}
+    assert page_layout_json(layout_json, 3) is layout_json
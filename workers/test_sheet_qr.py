@@ -0,0 +1,57 @@
+# workers/test_sheet_qr.py - 答题卡二维码识别用例（合成扫描件）
+
+import numpy as np
+import pytest
+
+from page_layout import ImagePyramid, detect_layout
+from sheet_qr import DEFAULT_QR_REGION, SheetQRReader, parse_qr_payload
+from shared.qr_payload import encode_qr_payload
+from synthetic_sheets import generate_synthetic_sheet, make_grid_layout, random_marks, render_qr, render_scan
+
+
+def _scan(payload, region, seed=0):
+    layout_json = make_grid_layout(40)
+    rng = np.random.default_rng(seed)
+    page = generate_synthetic_sheet(layout_json, random_marks(layout_json, rng), rng)
+    scan, _ = render_scan(render_qr(page, payload, region), dpi=200, rotation_deg=1.0, rng=rng)
+    pyramid = ImagePyramid(scan)
+    return pyramid, detect_layout(pyramid)
+
+
+def test_reads_qr_in_region():
+    pyramid, info = _scan(encode_qr_payload(42, "20240001", page=2), DEFAULT_QR_REGION)
+    reader = SheetQRReader()
+    result = reader.read(pyramid, info["page_corners"], DEFAULT_QR_REGION)
+
+    assert result["content"] == {"paper_id": 42, "student_id": "20240001", "page": 2}
+    assert result["source"] == "roi"
+    assert reader.roi_hits == 1
+
+
+def test_falls_back_to_full_page():
+    moved = {"x": 0.05, "y": 0.86, "width": 0.15, "height": 0.1}
+    pyramid, info = _scan(encode_qr_payload(7), moved, seed=1)
+    result = SheetQRReader().read(pyramid, info["page_corners"], DEFAULT_QR_REGION)
+
+    assert result["content"] == {"paper_id": 7, "student_id": None, "page": 1}
+    assert result["source"] == "full_page"
+
+
+def test_returns_none_without_qr():
+    layout_json = make_grid_layout(40)
+    page = generate_synthetic_sheet(layout_json, {}, np.random.default_rng(2))
+    scan, _ = render_scan(page, dpi=150)
+    reader = SheetQRReader()
+    assert reader.read(ImagePyramid(scan)) is None
+    assert reader.failures == 1
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("sx1?p=12&pg=3&s=abc", {"paper_id": 12, "student_id": "abc", "page": 3}),
+    ('{"paper_id": 5, "student_id": "s1"}', {"paper_id": 5, "student_id": "s1", "page": 1}),
+    ("sx1?pg=1", None),
+    ("not a payload", None),
+    ("", None),
+])
+def test_parse_qr_payload(text, expected):
+    assert parse_qr_payload(text) == expected
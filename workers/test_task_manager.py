@@ -0,0 +1,123 @@
+# workers/test_task_manager.py - 任务队列的重试、死信和回放用例（进程内队列后端，无需 RabbitMQ）
+
+import threading
+import uuid
+
+import pytest
+
+from task_manager import TaskClass, TaskDeferred, TaskQueue, TaskType, create_ocr_omr_task, queue_names
+
+# 消费循环的兜底停止时间（秒），用例出错时不会一直阻塞
+CONSUME_DEADLINE = 15
+
+
+@pytest.fixture
+def queue():
+    queue = TaskQueue(f"memory://test-{uuid.uuid4().hex}")
+    queue.retry_base_delay = 0.02
+    queue.retry_max_delay = 0.1
+    yield queue
+    queue.close()
+
+
+def _dlq_count(queue):
+    names = queue_names(TaskType.OCR_OMR)
+    return queue.channel.queue_declare(queue=names["dlq"], durable=True, passive=True).method.message_count
+
+
+def _consume(queue, callback):
+    timer = threading.Timer(CONSUME_DEADLINE, queue.request_stop)
+    timer.start()
+    try:
+        queue.consume_tasks(TaskType.OCR_OMR, callback, concurrency=2)
+    finally:
+        timer.cancel()
+    queue.stop_requested = False
+
+
+def _task(sheet_id, task_class=TaskClass.NORMAL):
+    return create_ocr_omr_task(sheet_id, f"minio://sheets/{sheet_id}.jpg", 1, 1, 1, task_class)
+
+
+def test_failed_task_is_retried_until_success(queue):
+    task = _task(1)
+    attempts = []
+
+    def process(received):
+        attempts.append((received.task_id, received.retry_count))
+        if len(attempts) < 3:
+            return False
+        queue.request_stop()
+        return True
+
+    assert queue.publish_task(task)
+    _consume(queue, process)
+
+    # 重试保留原 task_id，retry_count 逐次递增
+    assert attempts == [(task.task_id, 0), (task.task_id, 1), (task.task_id, 2)]
+    assert _dlq_count(queue) == 0
+
+
+def test_exhausted_retries_go_to_dlq_and_can_be_replayed(queue):
+    task = _task(2, TaskClass.BULK)
+    attempts = []
+
+    def fail(received):
+        attempts.append(received.retry_count)
+        if len(attempts) == task.max_retries + 1:
+            # 最后一次失败后消息进入死信队列
+            threading.Timer(0.2, queue.request_stop).start()
+        return False
+
+    queue.publish_task(task)
+    _consume(queue, fail)
+    assert attempts == list(range(task.max_retries + 1))
+    assert _dlq_count(queue) == 1
+
+    stats = queue.replay_dead_letters(TaskType.OCR_OMR, interval=0)
+    assert stats == {"replayed": 1, "skipped": 0, "remaining": 0}
+
+    replayed = []
+
+    def succeed(received):
+        replayed.append(received)
+        queue.request_stop()
+        return True
+
+    _consume(queue, succeed)
+    # 回放时重置重试次数，保留原 task_id 和批量通道
+    assert [(t.task_id, t.retry_count, t.priority) for t in replayed] == [(task.task_id, 0, task.priority)]
+
+
+def test_exception_in_processor_goes_to_dlq(queue):
+    # 处理器抛出的异常视为无法重试的错误（如消息内容有误），直接进入死信队列
+    attempts = []
+
+    def process(received):
+        attempts.append(received.retry_count)
+        threading.Timer(0.2, queue.request_stop).start()
+        raise RuntimeError("模拟处理器异常")
+
+    queue.publish_task(_task(3))
+    _consume(queue, process)
+    assert attempts == [0]
+    assert _dlq_count(queue) == 1
+
+
+def test_deferred_task_does_not_use_retries(queue):
+    task = _task(4)
+    attempts = []
+
+    def process(received):
+        attempts.append(received.retry_count)
+        if len(attempts) <= task.max_retries + 2:
+            raise TaskDeferred(0, "正在其他 Worker 上处理")
+        queue.request_stop()
+        return True
+
+    assert queue.publish_task(task)
+    _consume(queue, process)
+
+    # 暂缓的投递不计入 retry_count，超过 max_retries 次也不会进入死信队列
+    assert attempts == [0] * (task.max_retries + 3)
+    assert _dlq_count(queue) == 0